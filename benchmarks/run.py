@@ -0,0 +1,527 @@
+# benchmarks/run.py
+"""
+End-to-end benchmarks of the Script Store.
+
+Starts the FastAPI app in this process (uvicorn on a loopback port, in a
+background thread) against a throwaway store, database and environment
+cache, with the stub Poetry from benchmarks/bin on PATH, so no network
+access is needed. Synthetic script packages are uploaded and run through
+the public API and the results are printed as JSON:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --only run_overhead,restore --restore-sizes 100,1000
+
+Run it from the repository root with the project's interpreter (pytest must
+be importable, it runs the packages' tests). SCRIPTS_STORE_* settings can be
+overridden through the environment as usual; the values in effect are
+recorded in the output so results of different commits can be compared.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import sysconfig
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+
+from src.utils.stats import percentile
+
+BENCHMARKS = ("deploy", "run_overhead", "restore", "cron_jitter", "api_latency")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_BIN = os.path.join(REPO_ROOT, "benchmarks", "bin")
+
+PYPROJECT = """\
+[tool.poetry]
+name = "{name}"
+version = "0.1.0"
+description = "Synthetic benchmark script"
+authors = ["Scripts Store <bench@example.com>"]
+
+[tool.poetry.dependencies]
+python = "^3.9"
+
+[build-system]
+requires = ["poetry-core"]
+build-backend = "poetry.core.masonry.api"
+"""
+
+# Prints the time the process started, for the API-to-process overhead
+PROBE_MAIN = "import time\nprint(time.time())\n"
+
+# Keeps one CPU busy for the number of seconds given as parameter
+BUSY_MAIN = """\
+import sys
+import time
+deadline = time.monotonic() + float(sys.argv[1] if len(sys.argv) > 1 else 1)
+while time.monotonic() < deadline:
+    pass
+"""
+
+# Records when a scheduled fire actually started a process
+FIRE_MAIN = """\
+import os
+import time
+path = os.path.join(os.environ["SCRIPTS_STORE_BENCH_FIRES"], {name!r})
+with open(path, "w") as f:
+    f.write(repr(time.time()))
+"""
+
+def configure(workdir: str):
+    """Point the service at a scratch directory; must run before src is imported"""
+    defaults = {
+        "SCRIPTS_STORE_PATH": os.path.join(workdir, "scripts"),
+        "SCRIPTS_STORE_ENVS_PATH": os.path.join(workdir, "envs"),
+        "SCRIPTS_STORE_LOGS_PATH": os.path.join(workdir, "logs"),
+        "SCRIPTS_STORE_DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'scripts.db')}",
+        # Environments are built from this interpreter so the stub Poetry
+        # can expose its packages (pytest) to them
+        "SCRIPTS_STORE_ENV_PYTHON": sys.executable,
+        "SCRIPTS_STORE_EXECUTION_MODE": "local",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    for name in ("SCRIPTS_STORE_PATH", "SCRIPTS_STORE_ENVS_PATH", "SCRIPTS_STORE_LOGS_PATH"):
+        os.makedirs(os.environ[name], exist_ok=True)
+    os.environ["SCRIPTS_STORE_BENCH_SITE_PACKAGES"] = sysconfig.get_paths()["purelib"]
+    os.environ["SCRIPTS_STORE_BENCH_FIRES"] = os.path.join(workdir, "fires")
+    os.makedirs(os.environ["SCRIPTS_STORE_BENCH_FIRES"], exist_ok=True)
+    os.environ["PATH"] = f"{STUB_BIN}{os.pathsep}{os.environ.get('PATH', '')}"
+
+def summarize(values: list) -> dict:
+    """Count, mean and percentiles of a list of seconds"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1]
+    }
+
+def build_package(name: str, main: str) -> bytes:
+    """Zip of a minimal valid script package"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("pyproject.toml", PYPROJECT.format(name=name))
+        archive.writestr("main.py", main)
+        archive.writestr("config/settings.toml", f'name = "{name}"\n')
+        archive.writestr("tests/test_main.py", "def test_package():\n    assert True\n")
+    return buffer.getvalue()
+
+class ApiClient:
+    """Minimal HTTP client for the API; stdlib only so it adds no dependency"""
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+
+    def request(self, method: str, path: str, params: dict = None,
+                body: bytes = None, headers: dict = None, timeout: float = 120):
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        request = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"null")
+
+    def get(self, path: str, **params):
+        return self.request("GET", path, params)
+
+    def post(self, path: str, **params):
+        return self.request("POST", path, params)
+
+    def upload(self, project_name: str, script_name: str, package: bytes, cron_expression: str = None):
+        boundary = uuid.uuid4().hex
+        fields = {"project_name": project_name, "script_name": script_name}
+        if cron_expression:
+            fields["cron_expression"] = cron_expression
+        parts = [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        ]
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{script_name}.zip"\r\n'
+            f'Content-Type: application/zip\r\n\r\n'.encode() + package + b"\r\n"
+        )
+        parts.append(f"--{boundary}--\r\n".encode())
+        return self.request(
+            "POST", "/api/scripts/upload",
+            body=b"".join(parts),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        )
+
+    def wait_deployment(self, deployment_id: str, timeout: float = 300) -> dict:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            _, deployment = self.get(f"/api/deployments/{deployment_id}")
+            if deployment["status"] in ("succeeded", "failed"):
+                return deployment
+            time.sleep(0.02)
+        raise TimeoutError(f"Deployment {deployment_id} did not finish in {timeout}s")
+
+    def deploy(self, project_name: str, script_name: str, main: str, cron_expression: str = None) -> dict:
+        status, deployment = self.upload(
+            project_name, script_name, build_package(script_name, main), cron_expression
+        )
+        if status != 202:
+            raise RuntimeError(f"Upload of {project_name}/{script_name} failed: {status} {deployment}")
+        deployment = self.wait_deployment(deployment["deployment_id"])
+        if deployment["status"] != "succeeded":
+            raise RuntimeError(f"Deployment of {project_name}/{script_name} failed: {deployment['error']}")
+        return deployment
+
+    def run(self, project_name: str, script_name: str, params: str = None, wait: bool = True) -> dict:
+        query = {"project_name": project_name, "wait": str(wait).lower(), "timeout": 120}
+        if params:
+            query["params"] = params
+        status, run = self.post(f"/api/scripts/{script_name}/run", **query)
+        if status != 202:
+            raise RuntimeError(f"Run of {project_name}/{script_name} failed: {status} {run}")
+        return run
+
+class Server:
+    """The app served by uvicorn on a loopback port in a background thread"""
+    def __init__(self, app):
+        import uvicorn
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+        # Signals belong to the benchmark process, not the server thread
+        self.server.install_signal_handlers = lambda: None
+        self.thread = threading.Thread(
+            target=self.server.run, kwargs={"sockets": [self.socket]}, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.socket.getsockname()
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+def wait_for_idle(timeout: float = 300):
+    """Wait until the run manager has no queued or running runs"""
+    from src.static.run_manager import run_manager
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        stats = run_manager.queue_stats()
+        if not stats["queued"] and not stats["running"]:
+            return
+        time.sleep(0.05)
+    raise TimeoutError("Runs did not finish in time")
+
+def bench_deploy(api: ApiClient, args) -> dict:
+    """
+    Upload throughput: distinct packages validated from scratch, then the
+    same packages again, which hit the validation cache.
+    """
+    packages = [
+        (f"deploy-{index}", build_package(f"deploy-{index}", f"print({index})\n"))
+        for index in range(args.deploys)
+    ]
+    results = {}
+    for round_name in ("fresh", "cached"):
+        upload_latency = []
+        deploy_latency = []
+        pending = {}
+        started = time.monotonic()
+        for script_name, package in packages:
+            submitted = time.monotonic()
+            status, deployment = api.upload("bench-deploy", script_name, package)
+            upload_latency.append(time.monotonic() - submitted)
+            if status != 202:
+                raise RuntimeError(f"Upload of {script_name} failed: {status} {deployment}")
+            pending[deployment["deployment_id"]] = submitted
+        failed = 0
+        for deployment_id, submitted in pending.items():
+            deployment = api.wait_deployment(deployment_id)
+            deploy_latency.append(time.monotonic() - submitted)
+            failed += deployment["status"] != "succeeded"
+        elapsed = time.monotonic() - started
+        results[round_name] = {
+            "deployments": len(packages),
+            "failed": failed,
+            "seconds": elapsed,
+            "deployments_per_second": len(packages) / elapsed,
+            "upload_request_seconds": summarize(upload_latency),
+            "upload_to_live_seconds": summarize(deploy_latency)
+        }
+    return results
+
+def bench_run_overhead(api: ApiClient, args) -> dict:
+    """
+    Time from the run request leaving the client to the script process
+    starting, and the full request round trip, with warm environments.
+    """
+    api.deploy("bench-run", "probe", PROBE_MAIN)
+    wait_for_idle()
+    # The first run after a deploy may still build or link the environment
+    first = _probe_once(api)
+    overhead = []
+    round_trip = []
+    for _ in range(args.runs):
+        started, finished, process_started = _probe_once(api)
+        overhead.append(process_started - started)
+        round_trip.append(finished - started)
+    return {
+        "first_run_overhead_seconds": first[2] - first[0],
+        "overhead_seconds": summarize(overhead),
+        "round_trip_seconds": summarize(round_trip)
+    }
+
+def _probe_once(api: ApiClient) -> tuple:
+    started = time.time()
+    run = api.run("bench-run", "probe")
+    finished = time.time()
+    if run["status"] != "success":
+        raise RuntimeError(f"Probe run failed: {run['error']}")
+    return started, finished, float(run["result"]["output"].strip().splitlines()[-1])
+
+def bench_restore(api: ApiClient, args) -> dict:
+    """
+    Scheduler startup: reconciling the jobstore with N scheduled scripts,
+    from an empty jobstore, when nothing changed, after every schedule
+    changed, and after every script was unscheduled.
+    """
+    from src.database.db import SessionLocal
+    from src.service.models.db_model import Script
+    from src.static.scheduler import scheduler
+
+    results = {}
+    for size in args.restore_sizes:
+        project_name = f"bench-restore-{size}"
+        db = SessionLocal()
+        try:
+            db.bulk_save_objects([
+                Script(
+                    script_name=f"script-{index}",
+                    project_name=project_name,
+                    version="1.0.0",
+                    is_active=True,
+                    cron_expression=f"{index % 60} 3 * * *"
+                )
+                for index in range(size)
+            ])
+            db.commit()
+
+            timings = {}
+            timings["initial"] = _timed(scheduler._restore_jobs)
+            timings["unchanged"] = _timed(scheduler._restore_jobs)
+            db.query(Script).filter(Script.project_name == project_name).update(
+                {Script.cron_expression: "30 4 * * *"}, synchronize_session=False
+            )
+            db.commit()
+            timings["rescheduled"] = _timed(scheduler._restore_jobs)
+            db.query(Script).filter(Script.project_name == project_name).update(
+                {Script.is_active: False}, synchronize_session=False
+            )
+            db.commit()
+            timings["removed"] = _timed(scheduler._restore_jobs)
+            db.query(Script).filter(Script.project_name == project_name).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        results[str(size)] = timings
+    return results
+
+def _timed(function) -> float:
+    started = time.monotonic()
+    function()
+    return time.monotonic() - started
+
+def bench_cron_jitter(api: ApiClient, args) -> dict:
+    """
+    Delay from the fire time of a scheduler job to the script process
+    starting, for jobs that fire together while CPU-bound runs occupy
+    the workers. Jobs fire once through APScheduler like cron jobs do.
+    """
+    from src.static.scheduler import execute_scheduled_script, scheduler
+
+    fires_dir = os.environ["SCRIPTS_STORE_BENCH_FIRES"]
+    names = [f"fire-{index}" for index in range(args.jitter_jobs)]
+    for name in names:
+        api.deploy(f"bench-jitter-{name}", name, FIRE_MAIN.format(name=name))
+    api.deploy("bench-load", "busy", BUSY_MAIN)
+    wait_for_idle()
+
+    while not scheduler.is_leader:
+        time.sleep(0.1)
+    for name in os.listdir(fires_dir):
+        os.unlink(os.path.join(fires_dir, name))
+
+    for _ in range(args.load_runs):
+        api.run("bench-load", "busy", params=str(args.load_seconds), wait=False)
+    fire_at = datetime.now() + timedelta(seconds=1)
+    for name in names:
+        scheduler.scheduler.add_job(
+            execute_scheduled_script,
+            trigger="date",
+            run_date=fire_at,
+            args=[name, f"bench-jitter-{name}"],
+            id=f"bench-jitter-{name}",
+            misfire_grace_time=None
+        )
+
+    deadline = time.monotonic() + 120 + args.load_runs * args.load_seconds
+    while len(os.listdir(fires_dir)) < len(names):
+        if time.monotonic() > deadline:
+            raise TimeoutError("Scheduled runs did not start in time")
+        time.sleep(0.05)
+    wait_for_idle()
+
+    fire_timestamp = fire_at.timestamp()
+    lag = []
+    for name in names:
+        with open(os.path.join(fires_dir, name)) as f:
+            lag.append(float(f.read()) - fire_timestamp)
+    return {
+        "jobs": len(names),
+        "load_runs": args.load_runs,
+        "load_seconds": args.load_seconds,
+        "fire_to_start_seconds": summarize(lag)
+    }
+
+def bench_api_latency(api: ApiClient, args) -> dict:
+    """Latency of read endpoints when idle and while CPU-bound scripts run"""
+    api.deploy("bench-load", "busy", BUSY_MAIN)
+    wait_for_idle()
+    endpoints = {
+        "queue": ("/api/queue", {}),
+        "scripts": ("/api/scripts", {}),
+        "status": ("/api/scripts/busy/status", {"project_name": "bench-load"})
+    }
+
+    def sample() -> dict:
+        latency = {name: [] for name in endpoints}
+        for _ in range(args.requests):
+            for name, (path, params) in endpoints.items():
+                started = time.monotonic()
+                status, _ = api.get(path, **params)
+                latency[name].append(time.monotonic() - started)
+                if status != 200:
+                    raise RuntimeError(f"GET {path} returned {status}")
+        return {name: summarize(values) for name, values in latency.items()}
+
+    idle = sample()
+    for _ in range(args.load_runs):
+        api.run("bench-load", "busy", params=str(args.load_seconds), wait=False)
+    loaded = sample()
+    wait_for_idle()
+    return {"load_runs": args.load_runs, "idle": idle, "loaded": loaded}
+
+def metadata() -> dict:
+    """Commit, interpreter and host the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def parse_args(argv: list = None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks of the Script Store")
+    parser.add_argument("--only", default=",".join(BENCHMARKS),
+                        help=f"comma-separated benchmarks to run ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--workdir", help="scratch directory (default: a new temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--deploys", type=int, default=10, help="packages per upload round")
+    parser.add_argument("--runs", type=int, default=50, help="probe runs for the run overhead")
+    parser.add_argument("--restore-sizes", default="100,1000,10000",
+                        help="comma-separated numbers of scheduled scripts to restore")
+    parser.add_argument("--jitter-jobs", type=int, default=10, help="scheduler jobs fired together")
+    parser.add_argument("--load-runs", type=int, default=os.cpu_count() or 2,
+                        help="CPU-bound runs started as background load")
+    parser.add_argument("--load-seconds", type=float, default=3.0, help="duration of each load run")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint for API latency")
+    args = parser.parse_args(argv)
+    args.only = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(args.only) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    args.restore_sizes = [int(size) for size in args.restore_sizes.split(",") if size.strip()]
+    return args
+
+def main(argv: list = None) -> dict:
+    args = parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="scripts-store-bench-")
+    configure(workdir)
+
+    # Settings are read at import time, so the app is imported only now
+    sys.path.insert(0, REPO_ROOT)
+    from src.main import app
+    from src.utils import settings
+
+    report = {
+        "meta": metadata(),
+        "config": {
+            name: value for name, value in vars(settings).items()
+            if name.isupper() and isinstance(value, (int, float, str, bool))
+        },
+        "args": {name: value for name, value in vars(args).items() if name not in ("output", "workdir")},
+        "results": {}
+    }
+    benchmarks = {
+        "deploy": bench_deploy,
+        "run_overhead": bench_run_overhead,
+        "restore": bench_restore,
+        "cron_jitter": bench_cron_jitter,
+        "api_latency": bench_api_latency
+    }
+    try:
+        with Server(app) as server:
+            api = ApiClient(server.base_url)
+            for name in args.only:
+                started = time.monotonic()
+                print(f"running {name}", file=sys.stderr)
+                report["results"][name] = benchmarks[name](api, args)
+                report["results"][name]["benchmark_seconds"] = time.monotonic() - started
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return report
+
+if __name__ == "__main__":
+    main()
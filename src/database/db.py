@@ -1,25 +1,75 @@
 # src/database/db.py
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, make_url, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from src.utils.settings import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, SQLITE_BUSY_TIMEOUT_MS
 
-# Use SQLite for persistence
-SQLALCHEMY_DATABASE_URL = "sqlite:///./scripts.db"
+# SQLite by default; set SCRIPTS_STORE_DATABASE_URL to use e.g. Postgres
+SQLALCHEMY_DATABASE_URL = DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+    # In-memory SQLite gets a SingletonThreadPool, which rejects max_overflow;
+    # only file-backed databases use the sized QueuePool
+    pool_args = {}
+    if make_url(SQLALCHEMY_DATABASE_URL).database not in (None, "", ":memory:"):
+        pool_args = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={
+            "check_same_thread": False,  # Needed for SQLite
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000
+        },
+        **pool_args
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure_sqlite(dbapi_connection, connection_record):
+        """WAL lets readers proceed during writes; busy_timeout makes writers wait instead of failing"""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+else:
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_pre_ping=True
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+def init_db():
+    """
+    Create missing tables and bring existing ones up to date.
+    create_all() skips tables that already exist, so indexes and nullable
+    columns added to a model later are created here explicitly.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing_columns and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(
+                        f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'
+                    ))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 # Dependency for FastAPI
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,10 +1,18 @@
 # src/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from src.database.db import engine, Base
+from src.database.db import init_db
+from src.static.batches import batch_manager
+from src.static.deployer import deployer
+from src.static.prewarmer import prewarmer
 from src.service.router import router
 from src.static.scheduler import scheduler
+from src.static.run_manager import run_manager
+from src.static.log_archive import log_archive
+from src.static.run_recorder import run_recorder
+from src.static.warm_pool import warm_pool
 from src.utils.logger_config import setup_logging
+from src.utils import metrics as prometheus_metrics
 from loguru import logger
 
 app = FastAPI(
@@ -25,12 +33,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Create tables and indexes
+init_db()
 
 # Include router
 app.include_router(router, prefix="/api", tags=["scripts"])
 
+# Queue gauges are read at scrape time rather than summed across processes
+prometheus_metrics.registry.register(prometheus_metrics.QueueCollector(run_manager.queue_stats))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of all API processes (of this one without PROMETHEUS_MULTIPROC_DIR)"""
+    return Response(content=prometheus_metrics.render(), media_type=prometheus_metrics.CONTENT_TYPE)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
@@ -38,6 +54,10 @@ async def startup_event():
     system_logger = logger.bind(log_type="system")
     system_logger.info("Starting Script Store API")
     scheduler.start()
+    log_archive.start()
+    # Build environments of scheduled scripts before their next run
+    if not run_manager.remote:
+        prewarmer.prewarm_scheduled()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -45,6 +65,14 @@ async def shutdown_event():
     system_logger = logger.bind(log_type="system")
     system_logger.info("Shutting down Script Store API")
     scheduler.stop()
+    deployer.shutdown()
+    batch_manager.shutdown()
+    prewarmer.shutdown()
+    run_manager.shutdown()
+    warm_pool.shutdown()
+    run_recorder.stop()
+    log_archive.stop()
+    prometheus_metrics.mark_process_dead()
 
 if __name__ == "__main__":
     import uvicorn
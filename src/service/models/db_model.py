@@ -1,5 +1,5 @@
 # src/service/models/db_model.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Float, Index
 from sqlalchemy.sql import func
 from src.database.db import Base
 
@@ -20,8 +20,17 @@ class Script(Base):
         run_count: Number of times script has been executed
         cron_expression: Schedule for automatic execution
         params: Additional parameters for script execution
+        path: Directory holding this version's files, None once pruned
+        overlap_policy: What a cron fire does while runs are in flight, None for the default
+        misfire_policy: What happens to late cron fires, None for the default
     """
     __tablename__ = "scripts"
+    __table_args__ = (
+        # Active-version lookups used by the router, executor and scheduler
+        Index("ix_scripts_lookup", "project_name", "script_name", "is_active"),
+        # Scheduled script scans at startup
+        Index("ix_scripts_scheduled", "is_active", "cron_expression"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     script_name = Column(String, nullable=False)
@@ -35,9 +44,283 @@ class Script(Base):
     run_count = Column(Integer, default=0)
     cron_expression = Column(String, nullable=True)
     params = Column(Text, nullable=True)
+    path = Column(String, nullable=True)
+    overlap_policy = Column(String, nullable=True)  # allow, skip, queue_one
+    misfire_policy = Column(String, nullable=True)  # run_all, coalesce, skip
 
     class Config:
         orm_mode = True
 
     def __repr__(self):
-        return f"<Script {self.script_name}:{self.version} ({self.project_name})>"
\ No newline at end of file
+        return f"<Script {self.script_name}:{self.version} ({self.project_name})>"
+
+class ScriptRun(Base):
+    """
+    SQLAlchemy model for script_runs table, one row per execution.
+
+    Attributes:
+        id: Primary key
+        run_id: Unique ID of the run
+        script_name: Name of the script
+        project_name: Project the script belongs to
+        version: Script version that was executed
+        trigger: What started the run (manual, cron)
+        status: Outcome of the run (success, failed)
+        exit_code: Exit code of the script process
+        started_at: When the run started
+        finished_at: When the run finished
+        duration_seconds: Wall-clock duration of the run
+        cpu_time_seconds: User plus system CPU time of the script process
+        peak_rss_kb: Peak resident set size of the script process
+        output_bytes: Bytes written to stdout and stderr
+        io_read_bytes: Bytes read from storage by the script process
+        io_write_bytes: Bytes written to storage by the script process
+        timed_out: Whether the run was killed for exceeding its timeout
+    """
+    __tablename__ = "script_runs"
+    __table_args__ = (
+        Index("ix_script_runs_script_started", "project_name", "script_name", "started_at"),
+        Index("ix_script_runs_script_version", "project_name", "script_name", "version", "started_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, unique=True)
+    script_name = Column(String, nullable=False)
+    project_name = Column(String, nullable=False)
+    version = Column(String, nullable=True)
+    trigger = Column(String, nullable=False, default="manual")
+    status = Column(String, nullable=False)
+    exit_code = Column(Integer, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=False)
+    duration_seconds = Column(Float, nullable=False)
+    cpu_time_seconds = Column(Float, nullable=True)
+    peak_rss_kb = Column(Integer, nullable=True)
+    output_bytes = Column(Integer, nullable=True)
+    io_read_bytes = Column(Integer, nullable=True)
+    io_write_bytes = Column(Integer, nullable=True)
+    timed_out = Column(Boolean, nullable=True)
+
+    def __repr__(self):
+        return f"<ScriptRun {self.run_id} {self.script_name}:{self.version} {self.status}>"
+
+
+class QueuedRun(Base):
+    """
+    SQLAlchemy model for run_queue table, the shared queue workers lease runs from.
+
+    Attributes:
+        id: Primary key
+        run_id: Unique ID of the run
+        script_name: Name of the script
+        project_name: Project the script belongs to
+        params: Parameters passed to the script
+        trigger: What started the run (manual, batch, cron)
+        priority: Dispatch priority, lower runs first
+        scheduled_at: Cron fire time of scheduled runs, as epoch seconds
+        status: queued, leased, success, failed or cancelled
+        submitted_at: When the run was queued
+        started_at: When a worker last leased the run
+        finished_at: When the run finished
+        worker_id: Worker holding the lease
+        lease_expires_at: When the lease lapses unless renewed by a heartbeat
+        attempts: Number of times the run was leased
+        result: JSON result returned by the executor
+        error: Error message of a failed run
+    """
+    __tablename__ = "run_queue"
+    __table_args__ = (
+        Index("ix_run_queue_dispatch", "status", "priority", "submitted_at"),
+        Index("ix_run_queue_lease", "status", "lease_expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, unique=True)
+    script_name = Column(String, nullable=False)
+    project_name = Column(String, nullable=False)
+    params = Column(Text, nullable=True)
+    trigger = Column(String, nullable=False, default="manual")
+    priority = Column(Integer, nullable=False, default=0)
+    scheduled_at = Column(Float, nullable=True)
+    status = Column(String, nullable=False, default="queued")
+    submitted_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+
+    def __repr__(self):
+        return f"<QueuedRun {self.run_id} {self.script_name} {self.status}>"
+
+
+class ServiceLease(Base):
+    """
+    SQLAlchemy model for service_leases table, used for leader election.
+
+    Attributes:
+        name: Name of the leased role (e.g. scheduler)
+        holder: Identifier of the process holding the lease
+        acquired_at: When the current holder acquired the lease
+        expires_at: When the lease lapses unless renewed
+    """
+    __tablename__ = "service_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    acquired_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<ServiceLease {self.name} held by {self.holder}>"
+
+
+class Deployment(Base):
+    """
+    SQLAlchemy model for deployments table, one row per uploaded package.
+
+    Attributes:
+        id: Primary key
+        deployment_id: Unique ID returned by the upload endpoint
+        script_name: Name of the script
+        project_name: Project the script belongs to
+        status: queued, running, succeeded or failed
+        package_hash: sha256 of the uploaded zip
+        content_hash: Hash of the extracted package tree, the validation cache key
+        script_path: Version directory the package was extracted to
+        cron_expression: Schedule requested with the upload
+        version: Version registered when the deployment succeeded
+        stages: JSON list of pipeline stages with their status, timing and message
+        error: Message of the stage that failed the deployment
+        created_at: When the package was uploaded
+        started_at: When the pipeline started
+        finished_at: When the pipeline finished
+        duration_seconds: Wall-clock duration of the pipeline
+    """
+    __tablename__ = "deployments"
+    __table_args__ = (
+        Index("ix_deployments_script", "project_name", "script_name", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    deployment_id = Column(String, nullable=False, unique=True)
+    script_name = Column(String, nullable=False)
+    project_name = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")
+    package_hash = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)
+    script_path = Column(String, nullable=True)
+    cron_expression = Column(String, nullable=True)
+    version = Column(String, nullable=True)
+    stages = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<Deployment {self.deployment_id} {self.script_name} {self.status}>"
+
+
+class ValidationResult(Base):
+    """
+    SQLAlchemy model for validation_results table, the cache of passed validations.
+
+    Attributes:
+        id: Primary key
+        content_hash: Hash of the extracted package tree
+        python_version: Python version the package was validated with
+        message: Validation outcome message
+        test_output: Output of the test run
+        created_at: When the package was validated
+        last_used_at: When the result was last reused
+        hits: Number of deployments that reused the result
+    """
+    __tablename__ = "validation_results"
+    __table_args__ = (
+        Index("ix_validation_results_key", "content_hash", "python_version", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String, nullable=False)
+    python_version = Column(String, nullable=False)
+    message = Column(Text, nullable=True)
+    test_output = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=True)
+    hits = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ValidationResult {self.content_hash[:12]} py{self.python_version}>"
+
+
+class Batch(Base):
+    """
+    SQLAlchemy model for batches table, one row per batch run request.
+
+    Attributes:
+        id: Primary key
+        batch_id: Unique ID returned by the batch endpoint
+        status: running, succeeded, failed or cancelled
+        max_parallel: Maximum runs of the batch in flight at once
+        total: Number of runs in the batch
+        runs: JSON list of entries with their run ID, status, timing and error
+        created_at: When the batch was submitted
+        finished_at: When the last run of the batch finished
+        duration_seconds: Wall-clock duration of the batch
+    """
+    __tablename__ = "batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, nullable=False, unique=True)
+    status = Column(String, nullable=False, default="running")
+    max_parallel = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False)
+    runs = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<Batch {self.batch_id} {self.status} ({self.total} runs)>"
+
+
+class RunLog(Base):
+    """
+    SQLAlchemy model for run_logs table, the index of archived run logs.
+
+    Attributes:
+        id: Primary key
+        run_id: Run the log belongs to
+        script_name: Name of the script
+        project_name: Project the script belongs to
+        path: Compressed log file
+        size_bytes: Uncompressed size of the log
+        compressed_bytes: Size of the compressed file
+        line_count: Number of lines in the log
+        blocks: JSON list of gzip blocks as [compressed offset, compressed size,
+            uncompressed offset, uncompressed size, lines before the block, newlines in the block]
+        archived_at: When the log was compressed
+    """
+    __tablename__ = "run_logs"
+    __table_args__ = (
+        # Retention scans per project, oldest first
+        Index("ix_run_logs_project", "project_name", "archived_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String, nullable=False, unique=True)
+    script_name = Column(String, nullable=False)
+    project_name = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    compressed_bytes = Column(Integer, nullable=False)
+    line_count = Column(Integer, nullable=False)
+    blocks = Column(Text, nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<RunLog {self.run_id} {self.project_name}/{self.script_name}>"
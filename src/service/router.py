@@ -1,27 +1,42 @@
 # src/service/router.py
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, Body, HTTPException, Depends, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from src.database.db import get_db
-from src.service.models.db_model import Script
-from src.static.executor import ScriptExecutor
+from src.service.models.db_model import Script, ScriptRun
+from src.static.batches import batch_manager
+from src.static.deployer import DeploymentInProgress, deployer
+from src.static.log_archive import log_archive
+from src.static.run_manager import run_manager
 from src.static.scheduler import scheduler
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+import asyncio
+import hashlib
+import json
 import os
-import zipfile
+import time
+from typing import List
 from loguru import logger
-import shutil
-from src.utils.validator import ScriptValidator
+from src.static.versions import version_store
+from src.utils.archive import ArchiveError, extract_archive, hash_stream
+from src.utils.metrics import upload_seconds
+from src.utils.stats import percentile
+from src.utils.settings import (
+    BATCH_MAX_RUNS, LOG_RANGE_MAX_BYTES, OVERLAP_POLICIES, MISFIRE_POLICIES,
+    SCHEDULE_OVERLAP_POLICY, SCHEDULE_MISFIRE_POLICY
+)
 from croniter import croniter
 
 router = APIRouter()
 
-@router.post("/scripts/upload")
+@router.post("/scripts/upload", status_code=202)
 async def upload_script(
     project_name: str = Form(...),
     script_name: str = Form(...),
     file: UploadFile = File(...),
-    cron_expression: str = Form(None),
-    db: Session = Depends(get_db)
+    cron_expression: str = Form(None)
 ):
     """
     Upload a script package.
@@ -30,116 +45,99 @@ async def upload_script(
     - main.py
     - config/ directory
     - tests/ directory with passing tests
+    The package is validated in the background; follow the returned
+    deployment at /deployments/{deployment_id}.
     """
-    extract_dir = None
     try:
         if not file.filename.endswith('.zip'):
             raise HTTPException(
                 status_code=400,
                 detail="Only zip files are accepted"
             )
+        if cron_expression and not croniter.is_valid(cron_expression):
+            raise HTTPException(status_code=400, detail="Invalid cron expression")
 
-        # Create project directory
-        project_dir = f"/opt/scripts-store/{project_name}"
-        os.makedirs(project_dir, exist_ok=True)
-        
-        # Save and extract zip
-        zip_path = os.path.join(project_dir, file.filename)
-        extract_dir = os.path.join(project_dir, script_name)
-        
-        # Clean up existing directory if it exists
-        if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir)
-        
-        # Save zip file
-        with open(zip_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Extract zip
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        
-        # Remove zip file after extraction
-        os.remove(zip_path)
-
-        # Validate script
-        validator = ScriptValidator(project_name, script_name)
-        is_valid, message = validator.validate_all()
-        
-        if not is_valid:
-            if extract_dir and os.path.exists(extract_dir):
-                shutil.rmtree(extract_dir)
+        # Cheap early refusal; submit() below claims the script atomically
+        active = await asyncio.to_thread(deployer.in_progress, project_name, script_name)
+        if active:
             raise HTTPException(
-                status_code=400,
-                detail=f"Validation failed: {message}"
+                status_code=409,
+                detail=f"Deployment {active} of this script is still in progress"
             )
 
-        # If we get here, validation passed
-        logger.info(f"Validation passed for {script_name}")
+        # Each upload gets its own version directory; the live version is not touched
+        versions_dir = version_store.versions_path(project_name, script_name)
+        os.makedirs(versions_dir, exist_ok=True)
 
-        # Handle versioning
-        existing_script = db.query(Script).filter(
-            Script.project_name == project_name,
-            Script.script_name == script_name
-        ).first()
-
-        if existing_script:
-            # Increment version
-            version_parts = existing_script.version.split('.')
-            new_version = f"{version_parts[0]}.{version_parts[1]}.{int(version_parts[2]) + 1}"
-            
-            # Deactivate old version
-            existing_script.is_active = False
-            db.add(existing_script)
-        else:
-            new_version = "1.0.0"
-
-        # Create new script record
-        new_script = Script(
-            script_name=script_name,
-            project_name=project_name,
-            version=new_version,
-            is_active=True,
-            created_at=datetime.utcnow()
-        )
-
-        # Add cron expression if provided
-        if cron_expression:
-            if not croniter.is_valid(cron_expression):
-                raise HTTPException(status_code=400, detail="Invalid cron expression")
-            new_script.cron_expression = cron_expression
-
-        db.add(new_script)
-        db.commit()
-
-        # Schedule the script if cron expression provided
-        if cron_expression:
-            scheduler.schedule_script(script_name, project_name, cron_expression)
+        # Hash and extract straight from the spooled upload; no intermediate copy
+        started = time.monotonic()
+        try:
+            package_hash, package_size = await asyncio.to_thread(hash_stream, file.file)
+            staging_dir = await asyncio.to_thread(extract_archive, file.file, versions_dir)
+        except ArchiveError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        upload_seconds.observe(time.monotonic() - started)
+        logger.info(f"Received {script_name} package: {package_size} bytes, sha256 {package_hash}")
+        version_path = version_store.add(project_name, script_name, staging_dir, package_hash)
 
-        logger.info(f"Successfully uploaded {script_name} version {new_version} to {project_name}")
-        return {
-            "status": "success",
-            "message": f"Script uploaded and validated successfully",
-            "version": new_version
-        }
+        # Validation, registration and the switch-over continue in the background
+        try:
+            return await asyncio.to_thread(
+                deployer.submit, project_name, script_name, version_path, cron_expression, package_hash
+            )
+        except DeploymentInProgress as e:
+            # Another upload claimed the script since the check above
+            await asyncio.to_thread(version_store.remove, version_path)
+            raise HTTPException(status_code=409, detail=str(e))
 
     except HTTPException:
         raise
     except Exception as e:
-        # Clean up on error
-        if extract_dir and os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir)
         logger.error(f"Error uploading script: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/scripts/{script_name}/run")
+@router.post("/scripts/{script_name}/rollback")
+async def rollback_script(
+    script_name: str,
+    project_name: str,
+    version: str = None
+):
+    """
+    Switch a script back to an earlier deployed version.
+    Without a version, the version deployed before the active one is restored.
+    """
+    try:
+        return await asyncio.to_thread(deployer.rollback, project_name, script_name, version)
+    except DeploymentInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error rolling back script: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/deployments/{deployment_id}")
+async def get_deployment(deployment_id: str):
+    """Get the status, stage progress and timing of a deployment"""
+    deployment = await asyncio.to_thread(deployer.get, deployment_id)
+    if not deployment:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    return deployment
+
+@router.post("/scripts/{script_name}/run", status_code=202)
 async def run_script(
     script_name: str,
     project_name: str,
     params: str = None,
+    wait: bool = False,
+    timeout: float = None,
     db: Session = Depends(get_db)
 ):
-    """Run a script immediately"""
+    """
+    Submit a script run to the background executor.
+    Returns the run ID immediately; with wait=true the response is
+    deferred until the run finishes (or the timeout elapses).
+    """
     try:
         # Verify script exists and is active
         script = db.query(Script).filter(
@@ -151,13 +149,11 @@ async def run_script(
         if not script:
             raise HTTPException(status_code=404, detail="Script not found or not active")
 
-        # Create executor and run script
-        executor = ScriptExecutor(script_name, project_name)
-        try:
-            result = executor.execute(params)
-            return result
-        finally:
-            executor.cleanup()
+        # In queue mode these are database round trips; keep them off the event loop
+        run = await asyncio.to_thread(run_manager.submit, script_name, project_name, params)
+        if wait:
+            run = await run_manager.wait(run["run_id"], timeout)
+        return run
 
     except HTTPException as he:
         raise he
@@ -165,18 +161,225 @@ async def run_script(
         logger.error(f"Error running script: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/batches", status_code=202)
+async def run_batch(
+    runs: List[dict] = Body(None),
+    project_name: str = Body(None),
+    params: str = Body(None),
+    max_parallel: int = Body(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Run several scripts as one batch, at most max_parallel at a time.
+    Takes either `runs`, a list of {project_name, script_name, params}, or
+    `project_name` to run every active script of a project (with `params`).
+    Returns the batch ID immediately; follow it at /batches/{batch_id}.
+    """
+    try:
+        if (runs is None) == (project_name is None):
+            raise HTTPException(status_code=400, detail="Give either runs or project_name")
+        if max_parallel is not None and max_parallel < 1:
+            raise HTTPException(status_code=400, detail="max_parallel must be at least 1")
+
+        if project_name is not None:
+            scripts = db.query(Script.script_name).filter(
+                Script.project_name == project_name,
+                Script.is_active == True
+            ).order_by(Script.script_name).all()
+            if not scripts:
+                raise HTTPException(status_code=404, detail="No active scripts in project")
+            runs = [
+                {"project_name": project_name, "script_name": script.script_name, "params": params}
+                for script in scripts
+            ]
+        else:
+            for entry in runs:
+                if not isinstance(entry.get("project_name"), str) or not isinstance(entry.get("script_name"), str):
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Every run needs a project_name and a script_name"
+                    )
+            requested = {(entry["project_name"], entry["script_name"]) for entry in runs}
+            active = {
+                (row.project_name, row.script_name)
+                for row in db.query(Script.project_name, Script.script_name).filter(
+                    Script.project_name.in_({project for project, _ in requested}),
+                    Script.is_active == True
+                )
+            }
+            missing = sorted(requested - active)
+            if missing:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Scripts not found or not active: {', '.join(f'{p}/{s}' for p, s in missing)}"
+                )
+
+        if not runs:
+            raise HTTPException(status_code=400, detail="Batch has no runs")
+        if len(runs) > BATCH_MAX_RUNS:
+            raise HTTPException(status_code=400, detail=f"Batch has more than {BATCH_MAX_RUNS} runs")
+
+        return batch_manager.submit(runs, max_parallel)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error running batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Get the runs of a batch with their results, duration percentiles and failures"""
+    batch = batch_manager.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Get the status and result of a script run"""
+    run = await asyncio.to_thread(run_manager.get, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.get("/runs/{run_id}/wait")
+async def wait_for_run(run_id: str, timeout: float = 30.0):
+    """Wait until a script run finishes or the timeout elapses"""
+    run = await run_manager.wait(run_id, timeout)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@router.get("/queue")
+async def get_run_queue():
+    """Running and queued script runs, queue depth and wait times"""
+    return await asyncio.to_thread(run_manager.queue_stats)
+
+@router.get("/scheduler")
+async def get_scheduler_status():
+    """Scheduler leadership of this process and the current lease holder"""
+    return scheduler.status()
+
+@router.get("/runs/{run_id}/stream")
+async def stream_run_output(run_id: str, poll_interval: float = 0.5):
+    """Follow a run's output live as Server-Sent Events"""
+    if not await asyncio.to_thread(run_manager.get, run_id):
+        raise HTTPException(status_code=404, detail="Run not found")
+    return StreamingResponse(
+        _follow_run_log(run_id, poll_interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+async def _follow_run_log(run_id: str, poll_interval: float):
+    """Yield new run log lines as SSE events until the run finishes"""
+    position = 0
+    pending = b""
+    while True:
+        run = await asyncio.to_thread(run_manager.get, run_id)
+        finished = run is None or run["finished_at"] is not None
+        log_path = run.get("log_file") if run else None
+
+        data = b""
+        if log_path and os.path.exists(log_path):
+            with open(log_path, "rb") as f:
+                f.seek(position)
+                data = f.read(64 * 1024)
+        elif finished:
+            # The finished log may have been archived while we were following it
+            log = await asyncio.to_thread(log_archive.open, run_id)
+            if log is not None:
+                data = await asyncio.to_thread(log.read, position, 64 * 1024)
+        position += len(data)
+
+        if data:
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield f"data: {line.decode('utf-8', errors='replace')}\n\n"
+            continue
+
+        if finished:
+            if pending:
+                yield f"data: {pending.decode('utf-8', errors='replace')}\n\n"
+            status = run["status"] if run else "unknown"
+            yield f"event: end\ndata: {status}\n\n"
+            return
+
+        await asyncio.sleep(poll_interval)
+
+@router.get("/runs/{run_id}/logs")
+async def get_run_log(
+    run_id: str,
+    offset: int = Query(None, ge=0),
+    length: int = Query(None, ge=1),
+    start_line: int = Query(None, ge=0),
+    lines: int = Query(None, ge=1),
+    tail: int = Query(None, ge=1)
+):
+    """
+    Part of a run's log as plain text, from the live file or the compressed archive.
+    Select bytes with offset/length, lines with start_line/lines (0-based), or
+    the last lines with tail; at most SCRIPTS_STORE_LOG_RANGE_MAX_BYTES are returned.
+    X-Log-Range gives the byte range served, X-Log-Size the size of the whole log.
+    """
+    modes = [offset is not None or length is not None, start_line is not None or lines is not None, tail is not None]
+    if sum(modes) > 1:
+        raise HTTPException(status_code=400, detail="Use one of offset/length, start_line/lines or tail")
+
+    run = await asyncio.to_thread(run_manager.get, run_id)
+    log = await asyncio.to_thread(log_archive.open, run_id, run.get("log_file") if run else None)
+    if log is None:
+        raise HTTPException(status_code=404, detail="Log not found")
+
+    max_bytes = LOG_RANGE_MAX_BYTES
+    if tail is not None:
+        data, start, end = await asyncio.to_thread(log_archive.tail, log, tail, max_bytes)
+    elif start_line is not None or lines is not None:
+        data, start, end = await asyncio.to_thread(
+            # Without a line count, lines are read up to the byte cap
+            log_archive.read_lines, log, start_line or 0, lines, max_bytes
+        )
+    else:
+        data, start, end = await asyncio.to_thread(
+            log_archive.read_range, log, offset or 0, min(length or max_bytes, max_bytes)
+        )
+
+    headers = {
+        "X-Log-Range": f"{start}-{end}",
+        "X-Log-Size": str(log.size),
+        "X-Log-Archived": str(log.archived).lower()
+    }
+    if log.line_count is not None:
+        headers["X-Log-Lines"] = str(log.line_count)
+    return Response(content=data, media_type="text/plain; charset=utf-8", headers=headers)
+
 @router.post("/scripts/{script_name}/schedule")
 async def schedule_script_endpoint(
     script_name: str,
     project_name: str,
     cron_expression: str,
+    overlap_policy: str = None,
+    misfire_policy: str = None,
     db: Session = Depends(get_db)
 ):
-    """Schedule a script with cron expression"""
+    """
+    Schedule a script with cron expression.
+    - overlap_policy: what a fire does while runs of the script are in flight
+      (allow, skip, queue_one)
+    - misfire_policy: what happens to fires missed by more than the grace
+      time, e.g. during downtime (run_all, coalesce, skip)
+    Policies left out keep their current setting.
+    """
     try:
         # Validate cron expression
         if not croniter.is_valid(cron_expression):
             raise HTTPException(status_code=400, detail="Invalid cron expression")
+        if overlap_policy and overlap_policy not in OVERLAP_POLICIES:
+            raise HTTPException(status_code=400, detail=f"overlap_policy must be one of {', '.join(OVERLAP_POLICIES)}")
+        if misfire_policy and misfire_policy not in MISFIRE_POLICIES:
+            raise HTTPException(status_code=400, detail=f"misfire_policy must be one of {', '.join(MISFIRE_POLICIES)}")
         
         # Verify script exists and is active
         script = db.query(Script).filter(
@@ -188,12 +391,18 @@ async def schedule_script_endpoint(
         if not script:
             raise HTTPException(status_code=404, detail="Script not found or not active")
         
-        # Update script with cron expression
+        # Update script with cron expression and policies
         script.cron_expression = cron_expression
+        if overlap_policy:
+            script.overlap_policy = overlap_policy
+        if misfire_policy:
+            script.misfire_policy = misfire_policy
         db.commit()
         
         # Schedule the script
-        scheduler.schedule_script(script_name, project_name, cron_expression)
+        scheduler.schedule_script(
+            script_name, project_name, cron_expression, script.overlap_policy, script.misfire_policy
+        )
         
         return {
             "status": "success",
@@ -207,9 +416,65 @@ async def schedule_script_endpoint(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/scripts")
-async def get_scripts(db: Session = Depends(get_db)):
-    """Get all scripts"""
-    return db.query(Script).all()
+async def get_scripts(
+    request: Request,
+    project_name: str = None,
+    active_only: bool = True,
+    last_status: str = None,
+    scheduled: bool = None,
+    fields: str = None,
+    cursor: int = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    """
+    List scripts, one page at a time.
+    - active_only: only the active version of each script (default true)
+    - scheduled: only scripts with (true) or without (false) a cron expression
+    - fields: comma-separated columns to return (id is always included)
+    - cursor: next_cursor from the previous page
+    Responses carry an ETag; send it back in If-None-Match to get a 304
+    when nothing changed.
+    """
+    columns = Script.__table__.columns
+    if fields:
+        names = ["id"] + [name.strip() for name in fields.split(",") if name.strip() and name.strip() != "id"]
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        names = [column.name for column in columns]
+
+    query = db.query(*[getattr(Script, name) for name in names])
+    if project_name:
+        query = query.filter(Script.project_name == project_name)
+    if active_only:
+        query = query.filter(Script.is_active == True)
+    if last_status:
+        query = query.filter(Script.last_status == last_status)
+    if scheduled is not None:
+        query = query.filter(
+            Script.cron_expression.isnot(None) if scheduled else Script.cron_expression.is_(None)
+        )
+    if cursor is not None:
+        query = query.filter(Script.id > cursor)
+
+    rows = query.order_by(Script.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+
+    body = json.dumps(
+        jsonable_encoder({
+            "scripts": [dict(row._mapping) for row in rows[:limit]],
+            "next_cursor": next_cursor
+        }),
+        separators=(",", ":")
+    )
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get("/scripts/{script_name}/status")
 async def get_script_status(
@@ -235,5 +500,113 @@ async def get_script_status(
         "last_run": script.last_run,
         "last_status": script.last_status,
         "run_count": script.run_count,
-        "cron_expression": script.cron_expression
-    }
\ No newline at end of file
+        "cron_expression": script.cron_expression,
+        "overlap_policy": script.overlap_policy or SCHEDULE_OVERLAP_POLICY,
+        "misfire_policy": script.misfire_policy or SCHEDULE_MISFIRE_POLICY
+    }
+
+@router.get("/scripts/{script_name}/runs")
+async def get_script_runs(
+    script_name: str,
+    project_name: str,
+    version: str = None,
+    status: str = None,
+    trigger: str = None,
+    since: datetime = None,
+    until: datetime = None,
+    cursor: str = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    List the run history of a script, newest first.
+    Pass the returned next_cursor to fetch the following page.
+    """
+    query = db.query(ScriptRun).filter(
+        ScriptRun.project_name == project_name,
+        ScriptRun.script_name == script_name
+    )
+    if version:
+        query = query.filter(ScriptRun.version == version)
+    if status:
+        query = query.filter(ScriptRun.status == status)
+    if trigger:
+        query = query.filter(ScriptRun.trigger == trigger)
+    if since:
+        query = query.filter(ScriptRun.started_at >= since)
+    if until:
+        query = query.filter(ScriptRun.started_at < until)
+    if cursor:
+        try:
+            cursor_time, cursor_id = cursor.rsplit("_", 1)
+            cursor_time, cursor_id = datetime.fromisoformat(cursor_time), int(cursor_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(or_(
+            ScriptRun.started_at < cursor_time,
+            and_(ScriptRun.started_at == cursor_time, ScriptRun.id < cursor_id)
+        ))
+
+    runs = query.order_by(ScriptRun.started_at.desc(), ScriptRun.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(runs) > limit:
+        last = runs[limit - 1]
+        next_cursor = f"{last.started_at.isoformat()}_{last.id}"
+
+    return {"runs": runs[:limit], "next_cursor": next_cursor}
+
+@router.get("/scripts/{script_name}/runs/stats")
+async def get_script_run_stats(
+    script_name: str,
+    project_name: str,
+    since: datetime = None,
+    until: datetime = None,
+    db: Session = Depends(get_db)
+):
+    """Duration percentiles, resource usage and failure rate per version (last 7 days by default)"""
+    since = since or datetime.utcnow() - timedelta(days=7)
+    query = db.query(
+        ScriptRun.version,
+        ScriptRun.status,
+        ScriptRun.duration_seconds,
+        ScriptRun.cpu_time_seconds,
+        ScriptRun.peak_rss_kb
+    ).filter(
+        ScriptRun.project_name == project_name,
+        ScriptRun.script_name == script_name,
+        ScriptRun.started_at >= since
+    )
+    if until:
+        query = query.filter(ScriptRun.started_at < until)
+
+    by_version = {}
+    for row in query.all():
+        by_version.setdefault(row.version, []).append(row)
+
+    all_rows = [row for rows in by_version.values() for row in rows]
+    return {
+        "script_name": script_name,
+        "project_name": project_name,
+        "since": since,
+        "until": until,
+        "overall": _run_stats(all_rows),
+        "versions": {version: _run_stats(rows) for version, rows in by_version.items()}
+    }
+
+def _run_stats(rows: list) -> dict:
+    """Aggregate a list of script_runs rows"""
+    durations = sorted(row.duration_seconds for row in rows)
+    cpu_times = [row.cpu_time_seconds for row in rows if row.cpu_time_seconds is not None]
+    peak_rss = [row.peak_rss_kb for row in rows if row.peak_rss_kb is not None]
+    failures = sum(1 for row in rows if row.status != "success")
+    return {
+        "runs": len(rows),
+        "failures": failures,
+        "failure_rate": failures / len(rows) if rows else None,
+        "duration_p50": percentile(durations, 50),
+        "duration_p95": percentile(durations, 95),
+        "duration_p99": percentile(durations, 99),
+        "duration_max": durations[-1] if durations else None,
+        "cpu_time_avg": sum(cpu_times) / len(cpu_times) if cpu_times else None,
+        "peak_rss_kb_max": max(peak_rss) if peak_rss else None
+    }
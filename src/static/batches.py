@@ -0,0 +1,237 @@
+# src/static/batches.py
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+from loguru import logger
+from src.database.db import SessionLocal
+from src.service.models.db_model import Batch
+from src.static.run_manager import run_manager
+from src.utils.settings import BATCH_MAX_PARALLEL, WORKER_POLL_SECONDS
+from src.utils.stats import percentile
+
+class BatchManager:
+    """
+    Runs a list of scripts as one batch with bounded fan-out.
+
+    A dispatcher thread per batch keeps at most max_parallel of its runs
+    submitted to the run manager at a time and submits the next entry as
+    soon as one finishes, so a large batch neither floods the run queue nor
+    crowds out other projects. Runs go through the normal queue with the
+    "batch" trigger (between manual and cron runs in priority) and still
+    respect the global worker limit and project quotas.
+
+    The entries, their run IDs and outcomes are stored on the batch row, so
+    any API process can report progress. Batches are dispatched by the
+    process that accepted them; one that dies leaves its batch unfinished.
+    """
+    FINISHED_STATUSES = ("success", "failed", "cancelled", "lost")
+
+    def __init__(self, max_parallel: int = BATCH_MAX_PARALLEL):
+        self.max_parallel = max_parallel
+        self.threads = {}
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.log = logger.bind(log_type="execute")
+
+    def submit(self, entries: list, max_parallel: int = None) -> dict:
+        """
+        Record a batch of {project_name, script_name, params} entries and
+        start dispatching it.
+        """
+        batch_id = uuid.uuid4().hex
+        max_parallel = min(max_parallel or self.max_parallel, self.max_parallel)
+        runs = [
+            {
+                "project_name": entry["project_name"],
+                "script_name": entry["script_name"],
+                "params": entry.get("params"),
+                "run_id": None,
+                "status": "pending"
+            }
+            for entry in entries
+        ]
+        db = SessionLocal()
+        try:
+            row = Batch(
+                batch_id=batch_id,
+                status="running",
+                max_parallel=max_parallel,
+                total=len(runs),
+                runs=json.dumps(runs),
+                created_at=datetime.utcnow()
+            )
+            db.add(row)
+            db.commit()
+            batch = self._to_dict(row)
+        finally:
+            db.close()
+
+        with self.lock:
+            if self.stopping:
+                raise Exception("Batch manager is shut down")
+            thread = threading.Thread(
+                target=self._run,
+                args=(batch_id, runs, max_parallel),
+                name=f"batch-{batch_id[:8]}",
+                daemon=True
+            )
+            self.threads[batch_id] = thread
+            thread.start()
+        self.log.info(f"Started batch {batch_id} of {len(runs)} runs, {max_parallel} at a time")
+        return batch
+
+    def get(self, batch_id: str) -> Optional[dict]:
+        """Get a batch with its runs and aggregated results"""
+        db = SessionLocal()
+        try:
+            row = db.query(Batch).filter(Batch.batch_id == batch_id).first()
+            return self._to_dict(row) if row else None
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stop dispatching; entries not yet submitted are cancelled"""
+        with self.lock:
+            self.stopping = True
+
+    def _run(self, batch_id: str, runs: list, max_parallel: int):
+        """Dispatcher loop: keep up to max_parallel runs of the batch in flight"""
+        started = time.monotonic()
+        pending = list(range(len(runs)))
+        pending.reverse()
+        active = {}
+        finished = threading.Event()
+        try:
+            while pending or active:
+                changed = False
+                while pending and len(active) < max_parallel and not self.stopping:
+                    entry = runs[pending.pop()]
+                    try:
+                        run = run_manager.submit(
+                            entry["script_name"], entry["project_name"], entry["params"], trigger="batch"
+                        )
+                    except Exception as e:
+                        entry.update(status="failed", error=f"Could not submit run: {str(e)}")
+                    else:
+                        entry.update(run_id=run["run_id"], status=run["status"])
+                        active[run["run_id"]] = entry
+                        # Local runs wake the dispatcher when they finish; remote ones are polled
+                        if not run_manager.add_done_callback(run["run_id"], finished.set):
+                            finished.set()
+                    changed = True
+
+                if self.stopping:
+                    for index in pending:
+                        runs[index].update(status="cancelled", error="Service shut down before the run started")
+                    pending = []
+                    changed = True
+                    if not active:
+                        break
+
+                if changed:
+                    self._update(batch_id, runs=json.dumps(runs))
+                if not active:
+                    continue
+
+                finished.wait(WORKER_POLL_SECONDS)
+                finished.clear()
+                changed = False
+                for run_id, entry in list(active.items()):
+                    run = run_manager.get(run_id)
+                    if run is None:
+                        entry.update(status="lost", error="Run record is no longer available")
+                    elif run["finished_at"] is None:
+                        if run["status"] != entry["status"]:
+                            entry["status"] = run["status"]
+                            changed = True
+                        continue
+                    else:
+                        self._record(entry, run)
+                    del active[run_id]
+                    changed = True
+                if changed:
+                    self._update(batch_id, runs=json.dumps(runs))
+        except Exception as e:
+            self.log.error(f"Error dispatching batch {batch_id}: {str(e)}")
+            for entry in runs:
+                if entry["status"] not in self.FINISHED_STATUSES:
+                    entry.update(status="lost", error=f"Batch dispatcher failed: {str(e)}")
+
+        statuses = {entry["status"] for entry in runs}
+        if "cancelled" in statuses:
+            status = "cancelled"
+        elif statuses <= {"success"}:
+            status = "succeeded"
+        else:
+            status = "failed"
+        self._update(
+            batch_id,
+            status=status,
+            runs=json.dumps(runs),
+            finished_at=datetime.utcnow(),
+            duration_seconds=time.monotonic() - started
+        )
+        with self.lock:
+            self.threads.pop(batch_id, None)
+        self.log.info(f"Batch {batch_id} finished with status {status}")
+
+    @staticmethod
+    def _record(entry: dict, run: dict):
+        """Copy the outcome and timing of a finished run onto its batch entry"""
+        duration = None
+        if run["started_at"] is not None:
+            duration = (run["finished_at"] - run["started_at"]).total_seconds()
+        entry.update(
+            status=run["status"],
+            started_at=run["started_at"].isoformat() if run["started_at"] else None,
+            finished_at=run["finished_at"].isoformat(),
+            queue_wait_seconds=run["queue_wait_seconds"],
+            duration_seconds=duration,
+            error=run["error"]
+        )
+
+    def _update(self, batch_id: str, **fields):
+        db = SessionLocal()
+        try:
+            db.query(Batch).filter(Batch.batch_id == batch_id).update(
+                fields, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_dict(row: Batch) -> dict:
+        runs = json.loads(row.runs) if row.runs else []
+        counts = {}
+        for entry in runs:
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        durations = sorted(
+            entry["duration_seconds"] for entry in runs if entry.get("duration_seconds") is not None
+        )
+
+        return {
+            "batch_id": row.batch_id,
+            "status": row.status,
+            "max_parallel": row.max_parallel,
+            "total": row.total,
+            "counts": counts,
+            "duration_p50": percentile(durations, 50),
+            "duration_p95": percentile(durations, 95),
+            "duration_max": durations[-1] if durations else None,
+            "run_seconds_total": sum(durations),
+            "failures": [
+                entry for entry in runs
+                if entry["status"] in ("failed", "lost")
+            ],
+            "runs": runs,
+            "created_at": row.created_at,
+            "finished_at": row.finished_at,
+            "duration_seconds": row.duration_seconds
+        }
+
+# Create global batch manager instance
+batch_manager = BatchManager()
@@ -0,0 +1,495 @@
+# src/static/deployer.py
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from loguru import logger
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from src.database.db import SessionLocal
+from src.service.models.db_model import Deployment, Script, ServiceLease
+from src.static.prewarmer import prewarmer
+from src.static.run_manager import run_manager
+from src.static.scheduler import scheduler
+from src.static.validation_cache import validation_cache
+from src.static.versions import version_store
+from src.utils.metrics import deploy_stage_seconds, deployments_total
+from src.utils.settings import DEPLOY_WORKERS, DEPLOY_STALE_SECONDS, SCRIPT_VERSIONS_KEEP
+from src.utils.validator import ScriptValidator
+
+class DeploymentInProgress(Exception):
+    """Another deployment or rollback of the script holds its deploy lease"""
+    def __init__(self, holder: str):
+        super().__init__(f"Deployment {holder} of this script is still in progress")
+        self.holder = holder
+
+class DeploymentManager:
+    """
+    Validates and registers uploaded script packages in the background.
+
+    Each upload becomes a deployment that runs through a pipeline of
+    stages. Structure, pyproject and dependency installation do not depend
+    on each other and run concurrently; tests run once dependencies are
+    installed, and the new version is registered only if every stage
+    passed. Each package is validated in its own version directory and
+    only switched live once registered, so a failed deployment never
+    affects the running version. Packages whose contents passed validation
+    before skip straight to registration. Stage status and timing are stored on the deployment
+    row, so any API process can report progress.
+    """
+    STAGES = ("structure", "pyproject", "dependencies", "tests", "register")
+    ACTIVE_STATUSES = ("queued", "running")
+
+    def __init__(self, max_workers: int = DEPLOY_WORKERS):
+        self.max_workers = max_workers
+        self.pool = None
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.activation_lock = threading.Lock()
+        self.log = logger.bind(log_type="validate")
+
+    def submit(self, project_name: str, script_name: str, script_path: str,
+               cron_expression: str = None, package_hash: str = None) -> dict:
+        """Record a deployment for a package extracted to script_path and start its pipeline"""
+        deployment_id = uuid.uuid4().hex
+        holder = self._claim(project_name, script_name, deployment_id)
+        if holder is not None:
+            raise DeploymentInProgress(holder)
+
+        stages = [{"name": name, "status": "pending"} for name in self.STAGES]
+        db = SessionLocal()
+        try:
+            row = Deployment(
+                deployment_id=deployment_id,
+                script_name=script_name,
+                project_name=project_name,
+                status="queued",
+                package_hash=package_hash,
+                script_path=script_path,
+                cron_expression=cron_expression,
+                stages=json.dumps(stages),
+                created_at=datetime.utcnow()
+            )
+            db.add(row)
+            db.commit()
+            deployment = self._to_dict(row)
+        except Exception:
+            self._release(project_name, script_name, deployment_id)
+            raise
+        finally:
+            db.close()
+
+        with self.lock:
+            self.stages[deployment_id] = {stage["name"]: stage for stage in stages}
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="deploy")
+            self.pool.submit(self._run, deployment_id, project_name, script_name, script_path, cron_expression)
+        self.log.info(f"Queued deployment {deployment_id} for {project_name}/{script_name}")
+        return deployment
+
+    def get(self, deployment_id: str) -> Optional[dict]:
+        """Get a deployment with its stages"""
+        db = SessionLocal()
+        try:
+            row = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).first()
+            return self._to_dict(row) if row else None
+        finally:
+            db.close()
+
+    def in_progress(self, project_name: str, script_name: str) -> Optional[str]:
+        """
+        ID of a deployment of the script that has not finished yet, if any.
+        Deployments older than DEPLOY_STALE_SECONDS are assumed to have died
+        with their process and no longer block new uploads.
+        """
+        db = SessionLocal()
+        try:
+            row = db.query(Deployment.deployment_id).filter(
+                Deployment.project_name == project_name,
+                Deployment.script_name == script_name,
+                Deployment.status.in_(self.ACTIVE_STATUSES),
+                Deployment.created_at >= datetime.utcnow() - timedelta(seconds=DEPLOY_STALE_SECONDS)
+            ).first()
+            return row.deployment_id if row else None
+        finally:
+            db.close()
+
+    def _claim(self, project_name: str, script_name: str, holder: str) -> Optional[str]:
+        """
+        Compare-and-set the script's deploy lease, so the in-progress check and
+        the claim are one step across all API processes. Returns None once
+        claimed, otherwise the current holder. Leases lapse after
+        DEPLOY_STALE_SECONDS in case their process died.
+        """
+        name = f"deploy:{project_name}/{script_name}"
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=DEPLOY_STALE_SECONDS)
+        db = SessionLocal()
+        try:
+            taken = db.query(ServiceLease).filter(
+                ServiceLease.name == name,
+                or_(ServiceLease.expires_at < now, ServiceLease.holder == "")
+            ).update({
+                "holder": holder,
+                "acquired_at": now,
+                "expires_at": expires_at
+            }, synchronize_session=False)
+            if taken:
+                db.commit()
+                return None
+
+            lease = db.query(ServiceLease).filter(ServiceLease.name == name).first()
+            if lease is not None:
+                db.commit()
+                return lease.holder
+            db.add(ServiceLease(name=name, holder=holder, acquired_at=now, expires_at=expires_at))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+                lease = db.query(ServiceLease).filter(ServiceLease.name == name).first()
+                return lease.holder if lease else "unknown"
+        finally:
+            db.close()
+
+    def _release(self, project_name: str, script_name: str, holder: str):
+        """Give up the script's deploy lease if we still hold it"""
+        db = SessionLocal()
+        try:
+            db.query(ServiceLease).filter(
+                ServiceLease.name == f"deploy:{project_name}/{script_name}",
+                ServiceLease.holder == holder
+            ).update({"holder": "", "expires_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            self.log.error(f"Error releasing deploy lease of {project_name}/{script_name}: {str(e)}")
+        finally:
+            db.close()
+
+    def shutdown(self):
+        """Stop starting new pipelines; pipelines already running are abandoned"""
+        with self.lock:
+            pool = self.pool
+            self.pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, deployment_id: str, project_name: str, script_name: str, script_path: str,
+             cron_expression: str):
+        """Run the pipeline of a deployment and release the script's deploy lease"""
+        try:
+            self._pipeline(deployment_id, project_name, script_name, script_path, cron_expression)
+        finally:
+            self._release(project_name, script_name, deployment_id)
+
+    def _pipeline(self, deployment_id: str, project_name: str, script_name: str, script_path: str,
+                  cron_expression: str):
+        """Validate, register and switch over one deployment"""
+        started = time.monotonic()
+        self._update(deployment_id, status="running", started_at=datetime.utcnow())
+        validator = ScriptValidator(project_name, script_name, script_path)
+        version = None
+        error = None
+        try:
+            content_hash = validation_cache.tree_hash(validator.script_path)
+            self._update(deployment_id, content_hash=content_hash)
+            cached = validation_cache.get(content_hash)
+
+            if cached:
+                # Identical contents passed before; go straight to registration
+                self.log.info(f"Deployment {deployment_id} reuses validation of {content_hash[:12]}")
+                for name in ("structure", "pyproject", "dependencies"):
+                    self._set_stage(deployment_id, name, status="cached")
+                self._set_stage(deployment_id, "tests", status="cached", message=cached["test_output"])
+            else:
+                # Independent stages run side by side
+                with ThreadPoolExecutor(max_workers=3, thread_name_prefix="deploy-stage") as stages:
+                    futures = [
+                        stages.submit(self._stage, deployment_id, "structure", validator.validate_structure),
+                        stages.submit(self._stage, deployment_id, "pyproject", validator.validate_pyproject),
+                        stages.submit(self._stage, deployment_id, "dependencies", validator.install_dependencies)
+                    ]
+                    results = [future.result() for future in futures]
+                error = next((message for ok, message in results if not ok), None)
+
+                if error is None:
+                    ok, message = self._stage(deployment_id, "tests", validator.run_tests)
+                    if ok:
+                        validation_cache.put(content_hash, "All validations passed successfully", message)
+                    else:
+                        error = message
+
+            if error is None:
+                ok, message = self._stage(
+                    deployment_id, "register",
+                    lambda: self._register(project_name, script_name, script_path, cron_expression)
+                )
+                if ok:
+                    version = message
+                else:
+                    error = message
+        except Exception as e:
+            error = f"Deployment error: {str(e)}"
+        finally:
+            validator.release()
+
+        if error is not None:
+            self._skip_pending(deployment_id)
+            # A package that failed validation is not kept; the live version is untouched
+            if version_store.resolve(project_name, script_name) != os.path.realpath(script_path):
+                version_store.remove(script_path)
+            self.log.error(f"Deployment {deployment_id} of {script_name} failed: {error}")
+        else:
+            self.log.info(f"Deployment {deployment_id} registered {script_name} version {version}")
+
+        deployments_total.labels(status="failed" if error is not None else "succeeded").inc()
+        self._update(
+            deployment_id,
+            status="failed" if error is not None else "succeeded",
+            version=version,
+            error=error,
+            finished_at=datetime.utcnow(),
+            duration_seconds=time.monotonic() - started
+        )
+        with self.lock:
+            self.stages.pop(deployment_id, None)
+
+    def _stage(self, deployment_id: str, name: str, action) -> tuple:
+        """Run one pipeline stage, recording its status, timing and message"""
+        self._set_stage(deployment_id, name, status="running", started_at=datetime.utcnow().isoformat())
+        started = time.monotonic()
+        try:
+            ok, message = action()
+        except Exception as e:
+            ok, message = False, f"{name} stage error: {str(e)}"
+        deploy_stage_seconds.labels(stage=name, status="passed" if ok else "failed").observe(
+            time.monotonic() - started
+        )
+        self._set_stage(
+            deployment_id, name,
+            status="passed" if ok else "failed",
+            finished_at=datetime.utcnow().isoformat(),
+            duration_seconds=round(time.monotonic() - started, 3),
+            message=message
+        )
+        return ok, message
+
+    def _set_stage(self, deployment_id: str, name: str, **fields):
+        """Update a stage and persist the stage list"""
+        with self.lock:
+            stages = self.stages[deployment_id]
+            stages[name].update(fields)
+            payload = json.dumps(list(stages.values()))
+        self._update(deployment_id, stages=payload)
+
+    def _skip_pending(self, deployment_id: str):
+        """Mark stages that never ran once the pipeline has failed"""
+        with self.lock:
+            pending = [
+                name for name, stage in self.stages[deployment_id].items()
+                if stage["status"] == "pending"
+            ]
+        for name in pending:
+            self._set_stage(deployment_id, name, status="skipped")
+
+    def _update(self, deployment_id: str, **fields):
+        db = SessionLocal()
+        try:
+            db.query(Deployment).filter(Deployment.deployment_id == deployment_id).update(
+                fields, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _register(self, project_name: str, script_name: str, script_path: str,
+                  cron_expression: str = None) -> tuple:
+        """Activate a new version of a validated script and schedule it"""
+        with self.activation_lock:
+            db = SessionLocal()
+            try:
+                # Handle versioning
+                existing_script = db.query(Script).filter(
+                    Script.project_name == project_name,
+                    Script.script_name == script_name,
+                    Script.is_active == True
+                ).first()
+
+                if existing_script:
+                    # Increment the newest version; after a rollback it is not the active one
+                    versions = [
+                        tuple(int(part) for part in row.version.split('.'))
+                        for row in db.query(Script.version).filter(
+                            Script.project_name == project_name,
+                            Script.script_name == script_name
+                        )
+                    ]
+                    major, minor, patch = max(versions)
+                    new_version = f"{major}.{minor}.{patch + 1}"
+
+                    # Deactivate old version, keeping its files for rollback
+                    existing_script.is_active = False
+                    if existing_script.path is None:
+                        existing_script.path = version_store.adopt_legacy(project_name, script_name)
+                    db.add(existing_script)
+                else:
+                    new_version = "1.0.0"
+
+                # Fire policies belong to the script, not the version
+                overlap_policy = existing_script.overlap_policy if existing_script else None
+                misfire_policy = existing_script.misfire_policy if existing_script else None
+
+                # Create new script record
+                new_script = Script(
+                    script_name=script_name,
+                    project_name=project_name,
+                    version=new_version,
+                    is_active=True,
+                    created_at=datetime.utcnow(),
+                    cron_expression=cron_expression,
+                    path=script_path,
+                    overlap_policy=overlap_policy,
+                    misfire_policy=misfire_policy
+                )
+                db.add(new_script)
+                db.commit()
+            finally:
+                db.close()
+
+            # Switch the live path only once the new version is recorded
+            version_store.activate(project_name, script_name, script_path)
+            self._prune(project_name, script_name)
+
+        # Schedule the script if cron expression provided
+        if cron_expression:
+            scheduler.schedule_script(
+                script_name, project_name, cron_expression, overlap_policy, misfire_policy
+            )
+        # Make sure the first run finds a ready environment
+        prewarmer.request(project_name, script_name, cron_expression)
+        return True, new_version
+
+    def rollback(self, project_name: str, script_name: str, version: str = None) -> dict:
+        """
+        Make an earlier version active again by switching the live path back
+        to its directory. Without a version, the one deployed before the
+        active version is restored. The active schedule is kept.
+        Raises DeploymentInProgress while a deployment of the script runs.
+        """
+        holder = f"rollback-{uuid.uuid4().hex}"
+        active = self._claim(project_name, script_name, holder)
+        if active is not None:
+            raise DeploymentInProgress(active)
+        try:
+            return self._rollback(project_name, script_name, version)
+        finally:
+            self._release(project_name, script_name, holder)
+
+    def _rollback(self, project_name: str, script_name: str, version: str = None) -> dict:
+        """Switch the live path and the active row to the target version"""
+        with self.activation_lock:
+            db = SessionLocal()
+            try:
+                current = db.query(Script).filter(
+                    Script.project_name == project_name,
+                    Script.script_name == script_name,
+                    Script.is_active == True
+                ).first()
+                if current is None:
+                    raise LookupError("Script not found or not active")
+
+                query = db.query(Script).filter(
+                    Script.project_name == project_name,
+                    Script.script_name == script_name,
+                    Script.id != current.id,
+                    Script.path.isnot(None)
+                )
+                if version:
+                    target = query.filter(Script.version == version).order_by(Script.id.desc()).first()
+                else:
+                    target = query.filter(Script.id < current.id).order_by(Script.id.desc()).first()
+                if target is None or not os.path.isdir(target.path):
+                    raise LookupError(f"Version {version or 'before ' + current.version} is not available")
+
+                version_store.activate(project_name, script_name, target.path)
+                current.is_active = False
+                target.is_active = True
+                target.cron_expression = current.cron_expression
+                target.overlap_policy = current.overlap_policy
+                target.misfire_policy = current.misfire_policy
+                db.commit()
+                result = {
+                    "project_name": project_name,
+                    "script_name": script_name,
+                    "previous_version": current.version,
+                    "version": target.version,
+                    "path": target.path
+                }
+                cron_expression = target.cron_expression
+            finally:
+                db.close()
+
+        prewarmer.request(project_name, script_name, cron_expression)
+
+        self.log.info(f"Rolled back {project_name}/{script_name} to version {result['version']}")
+        return result
+
+    def _prune(self, project_name: str, script_name: str, keep: int = SCRIPT_VERSIONS_KEEP):
+        """
+        Delete the directories of all but the newest `keep` versions.
+        Runs pin the version that was active when they started, so while any
+        run of the script is queued or running nothing is deleted; the next
+        deployment prunes what was left over.
+        """
+        if not keep:
+            return
+        active = run_manager.active_runs(script_name, project_name)
+        if active["queued"] or active["running"]:
+            self.log.info(
+                f"Deferring pruning of {project_name}/{script_name}: "
+                f"{active['running']} running, {active['queued']} queued runs"
+            )
+            return
+        db = SessionLocal()
+        try:
+            rows = db.query(Script).filter(
+                Script.project_name == project_name,
+                Script.script_name == script_name,
+                Script.path.isnot(None)
+            ).order_by(Script.id.desc()).all()
+            for row in rows[keep:]:
+                if row.is_active:
+                    continue
+                version_store.remove(row.path)
+                row.path = None
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_dict(row: Deployment) -> dict:
+        return {
+            "deployment_id": row.deployment_id,
+            "script_name": row.script_name,
+            "project_name": row.project_name,
+            "status": row.status,
+            "package_hash": row.package_hash,
+            "script_path": row.script_path,
+            "content_hash": row.content_hash,
+            "cron_expression": row.cron_expression,
+            "version": row.version,
+            "stages": json.loads(row.stages) if row.stages else [],
+            "error": row.error,
+            "created_at": row.created_at,
+            "started_at": row.started_at,
+            "finished_at": row.finished_at,
+            "duration_seconds": row.duration_seconds
+        }
+
+# Create global deployment manager instance
+deployer = DeploymentManager()
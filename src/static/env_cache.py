@@ -0,0 +1,218 @@
+# src/static/env_cache.py
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from loguru import logger
+from src.static.package_store import package_store
+from src.utils.settings import (
+    ENVS_PATH, ENV_PYTHON, ENV_CACHE_MAX_ENVS, ENV_CACHE_MAX_BYTES, PACKAGE_STORE_ENABLED
+)
+
+class EnvironmentCache:
+    """
+    Cache of Poetry virtualenvs keyed by the hash of a script's
+    pyproject.toml and poetry.lock.
+
+    Each environment lives in its own directory under the cache root.
+    A ready marker inside the directory records its size, and the
+    marker's mtime doubles as the last-used timestamp for LRU eviction.
+
+    Processes sharing the cache root coordinate through flock: builds hold
+    an exclusive lock on <key>.lock, and every run or build holds a shared
+    lock on <key>.use while it uses the environment. Eviction only removes
+    an environment whose two locks it can take exclusively without
+    waiting, so it never deletes one that any process builds or runs in.
+    """
+    DEPENDENCY_FILES = ('pyproject.toml', 'poetry.lock')
+    READY_MARKER = '.ready'
+    LOCK_SUFFIXES = ('.lock', '.use')
+
+    def __init__(self, root: str = ENVS_PATH, max_envs: int = ENV_CACHE_MAX_ENVS,
+                 max_bytes: int = ENV_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_envs = max_envs
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.build_locks = {}
+        # key -> open files holding a shared lock on <key>.use, one per acquire()
+        self.use_locks = {}
+        self.log = logger.bind(log_type="execute")
+
+    def compute_key(self, script_path: str) -> str:
+        """Hash the dependency files of a script into a cache key"""
+        digest = hashlib.sha256(ENV_PYTHON.encode())
+        for file_name in self.DEPENDENCY_FILES:
+            file_path = os.path.join(script_path, file_name)
+            digest.update(file_name.encode())
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:32]
+
+    def path(self, key: str) -> str:
+        """Directory of the virtualenv for a cache key"""
+        return os.path.join(self.root, key)
+
+    def is_ready(self, key: str) -> bool:
+        """Check whether a fully built environment exists for a key"""
+        return os.path.exists(os.path.join(self.path(key), self.READY_MARKER))
+
+    @contextmanager
+    def build_lock(self, key: str):
+        """Serialize builds of the same environment across threads and processes"""
+        with self.lock:
+            thread_lock = self.build_locks.setdefault(key, threading.Lock())
+
+        with thread_lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, f"{key}.lock"), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def mark_ready(self, key: str):
+        """Record a finished build so other runs can reuse it"""
+        env_path = self.path(key)
+        info = {"size": self._dir_size(env_path), "created": time.time()}
+        with open(os.path.join(env_path, self.READY_MARKER), 'w') as f:
+            json.dump(info, f)
+
+    def acquire(self, key: str):
+        """
+        Mark an environment as in use until release() and refresh its LRU
+        position. Waits while another process is evicting it.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, f"{key}.use"), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+        except OSError:
+            lock_file.close()
+            raise
+        with self.lock:
+            self.use_locks.setdefault(key, []).append(lock_file)
+        try:
+            os.utime(os.path.join(self.path(key), self.READY_MARKER))
+        except OSError:
+            pass
+
+    def release(self, key: str):
+        """Release an environment after a run; it stays cached until evicted"""
+        with self.lock:
+            held = self.use_locks.get(key)
+            lock_file = held.pop() if held else None
+            if held is not None and not held:
+                del self.use_locks[key]
+        if lock_file is not None:
+            # Closing the file drops its shared lock
+            lock_file.close()
+
+    def remove(self, key: str) -> bool:
+        """Delete a cached environment unless a process builds or uses it"""
+        with self._exclusive(key) as locked:
+            if not locked:
+                return False
+            shutil.rmtree(self.path(key), ignore_errors=True)
+        self.log.info(f"Removed cached environment {key}")
+        return True
+
+    @contextmanager
+    def _exclusive(self, key: str):
+        """Take the build and use locks of a key without waiting; yields whether both were taken"""
+        lock_files = []
+        try:
+            for suffix in self.LOCK_SUFFIXES:
+                lock_file = open(os.path.join(self.root, f"{key}{suffix}"), 'w')
+                lock_files.append(lock_file)
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True
+        finally:
+            for lock_file in lock_files:
+                lock_file.close()
+
+    def evict(self):
+        """
+        Evict least recently used environments beyond the count or disk
+        budget. Called after builds, the only time the cache grows. The disk
+        budget covers the package store too: an evicted environment frees its
+        private bytes and the stored objects no other environment links.
+        """
+        entries = []
+        if not os.path.isdir(self.root):
+            return
+        for key in os.listdir(self.root):
+            marker = os.path.join(self.root, key, self.READY_MARKER)
+            try:
+                last_used = os.path.getmtime(marker)
+                with open(marker) as f:
+                    size = json.load(f).get("size", 0)
+            except (OSError, ValueError):
+                continue
+            entries.append((last_used, key, size))
+
+        entries.sort()
+        total_size = sum(size for _, _, size in entries)
+        if self.max_bytes and PACKAGE_STORE_ENABLED:
+            total_size += package_store.size()
+        count = len(entries)
+        evicted = 0
+
+        for _, key, size in entries:
+            over_count = self.max_envs and count > self.max_envs
+            over_size = self.max_bytes and total_size > self.max_bytes
+            if not (over_count or over_size):
+                break
+            # Measured before removal; afterwards the link counts are gone
+            shared = self._store_only_size(self.path(key)) if PACKAGE_STORE_ENABLED else 0
+            if not self.remove(key):
+                continue
+            count -= 1
+            total_size -= size + shared
+            evicted += 1
+
+        # Evicted environments may have held the last links to shared packages
+        if evicted and PACKAGE_STORE_ENABLED:
+            package_store.gc()
+
+    @staticmethod
+    def _dir_size(path: str) -> int:
+        """
+        Bytes private to an environment. Files hardlinked from the shared
+        package store are counted once, in the store's size.
+        """
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for file_name in filenames:
+                file_stat = os.lstat(os.path.join(dirpath, file_name))
+                if stat.S_ISREG(file_stat.st_mode) and file_stat.st_nlink == 1:
+                    total += file_stat.st_size
+        return total
+
+    @staticmethod
+    def _store_only_size(path: str) -> int:
+        """Bytes of store objects linked by this environment and no other"""
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for file_name in filenames:
+                try:
+                    file_stat = os.lstat(os.path.join(dirpath, file_name))
+                except FileNotFoundError:
+                    continue
+                if stat.S_ISREG(file_stat.st_mode) and file_stat.st_nlink == 2:
+                    total += file_stat.st_size
+        return total
+
+# Create global environment cache instance
+env_cache = EnvironmentCache()
@@ -1,18 +1,29 @@
 # src/static/executor.py
 from datetime import datetime
+from functools import partial
 import os
+import time
+import uuid
 from loguru import logger
+from src.static.log_archive import log_archive
 from src.static.package_manager import PackageManager
-from src.database.db import SessionLocal
-from src.service.models.db_model import Script
-from src.utils.logger_config import get_run_logger
+from src.static.run_recorder import run_recorder
+from src.static.versions import version_store
+from src.utils.metrics import runs_total, schedule_lag_seconds
+from src.utils.run_log import run_log_writer
 
 class ScriptExecutor:
-    def __init__(self, script_name: str, project_name: str):
+    def __init__(self, script_name: str, project_name: str, run_id: str = None,
+                 trigger: str = "manual", scheduled_at: float = None):
         self.script_name = script_name
         self.project_name = project_name
-        self.script_path = f"/opt/scripts-store/{project_name}/{script_name}"
-        self.package_manager = PackageManager(project_name, script_name)
+        # Pin the active version so a deploy during the run does not swap files under it
+        self.script_path = version_store.resolve(project_name, script_name)
+        self.package_manager = PackageManager(project_name, script_name, self.script_path)
+        self.run_id = run_id or uuid.uuid4().hex
+        self.trigger = trigger
+        self.scheduled_at = scheduled_at
+        self.log_path = None
         self.log = logger.bind(
             log_type="execute",
             script_name=script_name,
@@ -23,10 +34,15 @@ class ScriptExecutor:
         """Execute a script with optional parameters"""
         self.log.info(f"Executing script {self.script_name} from project {self.project_name}")
         
+        # Set up run-specific logging
+        log_path = run_log_writer.open(self.run_id, self.project_name, self.script_name)
+        self.log_path = log_path
+        run_log = logger.bind(run_id=self.run_id)
+
+        started_at = datetime.utcnow()
+        status = "failed"
+        usage = {}
         try:
-            # Set up run-specific logging
-            log_path = get_run_logger(self.project_name, self.script_name)
-            
             # Check if script exists
             main_script = os.path.join(self.script_path, 'main.py')
             self.log.info(f"Main script path: {main_script}")
@@ -34,63 +50,77 @@ class ScriptExecutor:
             if not os.path.exists(main_script):
                 raise Exception(f"Main script not found at {main_script}")
             
-            # Set up environment if needed
-            if not self.package_manager.setup_environment():
+            # Set up environment if needed (reuses a cached one when available)
+            env_ready, _ = self.package_manager.setup_environment()
+            if not env_ready:
                 raise Exception("Failed to set up Python environment")
             
-            # Run the script
-            success, output, error = self.package_manager.run_in_environment(
+            # Lag from the cron fire time to the process start
+            if self.scheduled_at is not None:
+                schedule_lag_seconds.labels(project=self.project_name).observe(time.time() - self.scheduled_at)
+
+            # Run the script, streaming its output into the run log
+            success, output, error, usage = self.package_manager.run_in_environment(
                 main_script,
-                params
-            )
-            
-            # Update script status in database
-            self._update_script_status(success)
-            
-            # Log output to run-specific log
-            run_log = logger.bind(
-                log_type=self.project_name,
-                script_name=self.script_name
+                params,
+                output_sink=partial(run_log_writer.write, self.run_id)
             )
             
+            status = "success" if success else "failed"
+
+            # Output is already in the run log; record the outcome after it
             if success:
-                run_log.info(f"Script output:\n{output}")
+                run_log.info("Script finished successfully")
             else:
-                run_log.error(f"Script error:\n{error}")
+                run_log.error("Script failed")
                 raise Exception(f"Script execution failed: {error}")
             
             return {
-                "status": "success" if success else "failed",
+                "run_id": self.run_id,
+                "status": status,
                 "output": output,
                 "error": error,
-                "log_file": log_path
+                "log_file": log_path,
+                "usage": usage
             }
             
         except Exception as e:
             self.log.error(f"Error executing script: {str(e)}")
+            run_log.error(f"Error executing script: {str(e)}")
             raise
+        finally:
+            run_log_writer.close(self.run_id)
+            # Compressed and indexed in the background
+            log_archive.archive(self.run_id, self.project_name, self.script_name, log_path)
+            runs_total.labels(project=self.project_name, trigger=self.trigger, status=status).inc()
+            self._record_run(status, started_at, usage)
 
     def cleanup(self):
-        """Cleanup any resources"""
-        self.package_manager.cleanup_environment()
+        """Release the script environment back to the cache"""
+        self.package_manager.release_environment()
 
-    def _update_script_status(self, success: bool):
-        """Update script status in database"""
-        db = SessionLocal()
-        try:
-            script = db.query(Script).filter(
-                Script.script_name == self.script_name,
-                Script.project_name == self.project_name,
-                Script.is_active == True
-            ).first()
-            
-            if script:
-                script.last_run = datetime.utcnow()
-                script.last_status = 'success' if success else 'failed'
-                script.run_count += 1
-                # Set the env_name based on PackageManager's naming
-                script.env_name = self.package_manager.get_venv_name()
-                db.commit()
-                self.log.info(f"Updated script status: {script.last_status}")
-        finally:
-            db.close()
\ No newline at end of file
+    def _record_run(self, status: str, started_at: datetime, usage: dict):
+        """
+        Hand the run to the background recorder, which writes the run
+        history and the script's last run status
+        """
+        finished_at = datetime.utcnow()
+        run_recorder.record({
+            "run_id": self.run_id,
+            "script_name": self.script_name,
+            "project_name": self.project_name,
+            # The recorder looks up the version of the pinned directory
+            "script_path": self.script_path,
+            "trigger": self.trigger,
+            "status": status,
+            "exit_code": usage.get("exit_code"),
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "duration_seconds": (finished_at - started_at).total_seconds(),
+            "cpu_time_seconds": usage.get("cpu_time_seconds"),
+            "peak_rss_kb": usage.get("peak_rss_kb"),
+            "output_bytes": usage.get("output_bytes"),
+            "io_read_bytes": usage.get("io_read_bytes"),
+            "io_write_bytes": usage.get("io_write_bytes"),
+            "timed_out": usage.get("timed_out")
+        })
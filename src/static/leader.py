@@ -0,0 +1,152 @@
+# src/static/leader.py
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from loguru import logger
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from src.database.db import SessionLocal
+from src.service.models.db_model import ServiceLease
+from src.utils.settings import SCHEDULER_LEASE_SECONDS
+
+class LeaderElector:
+    """
+    Elects a single leader for a role among all processes sharing the database.
+
+    The leader holds a row in service_leases and renews it every third of
+    the lease time. Other processes retry on the same interval and take
+    over as soon as the lease expires or is released.
+    """
+    def __init__(self, name: str, lease_seconds: int = SCHEDULER_LEASE_SECONDS,
+                 on_elected: Callable[[], None] = None, on_demoted: Callable[[], None] = None,
+                 on_heartbeat: Callable[[], None] = None):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.holder = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_heartbeat = on_heartbeat
+        self.is_leader = False
+        self.thread = None
+        self.stopping = threading.Event()
+        self.log = logger.bind(log_type="schedule")
+
+    def start(self):
+        """Try to become leader now and keep competing in the background"""
+        self.stopping.clear()
+        self._tick()
+        self.thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop competing and hand the lease over immediately"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.is_leader:
+            self._set_leader(False)
+            self._release()
+
+    def current(self) -> Optional[dict]:
+        """Current lease holder"""
+        db = SessionLocal()
+        try:
+            lease = db.query(ServiceLease).filter(ServiceLease.name == self.name).first()
+            if not lease:
+                return None
+            return {
+                "name": lease.name,
+                "holder": lease.holder,
+                "acquired_at": lease.acquired_at,
+                "expires_at": lease.expires_at
+            }
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self.stopping.wait(self.lease_seconds / 3):
+            self._tick()
+
+    def _tick(self):
+        """Acquire or renew the lease and fire callbacks on leadership changes"""
+        try:
+            acquired = self._try_acquire()
+        except Exception as e:
+            self.log.error(f"Leader election for {self.name} failed: {str(e)}")
+            acquired = False
+        self._set_leader(acquired)
+        if self.is_leader and self.on_heartbeat:
+            self.on_heartbeat()
+
+    def _set_leader(self, leader: bool):
+        if leader and not self.is_leader:
+            self.is_leader = True
+            self.log.info(f"{self.holder} became {self.name} leader")
+            if self.on_elected:
+                self.on_elected()
+        elif not leader and self.is_leader:
+            self.is_leader = False
+            self.log.warning(f"{self.holder} is no longer {self.name} leader")
+            if self.on_demoted:
+                self.on_demoted()
+
+    def _try_acquire(self) -> bool:
+        """Compare-and-set the lease row: renew our own lease or take over an expired one"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        db = SessionLocal()
+        try:
+            renewed = db.query(ServiceLease).filter(
+                ServiceLease.name == self.name,
+                ServiceLease.holder == self.holder
+            ).update({"expires_at": expires_at}, synchronize_session=False)
+            if renewed:
+                db.commit()
+                return True
+
+            taken = db.query(ServiceLease).filter(
+                ServiceLease.name == self.name,
+                or_(ServiceLease.expires_at < now, ServiceLease.holder == "")
+            ).update({
+                "holder": self.holder,
+                "acquired_at": now,
+                "expires_at": expires_at
+            }, synchronize_session=False)
+            if taken:
+                db.commit()
+                return True
+
+            if not db.query(ServiceLease).filter(ServiceLease.name == self.name).first():
+                db.add(ServiceLease(
+                    name=self.name,
+                    holder=self.holder,
+                    acquired_at=now,
+                    expires_at=expires_at
+                ))
+                try:
+                    db.commit()
+                    return True
+                except IntegrityError:
+                    db.rollback()
+            db.commit()
+            return False
+        finally:
+            db.close()
+
+    def _release(self):
+        """Expire our lease so another process can take over without waiting"""
+        db = SessionLocal()
+        try:
+            db.query(ServiceLease).filter(
+                ServiceLease.name == self.name,
+                ServiceLease.holder == self.holder
+            ).update({"holder": "", "expires_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            self.log.error(f"Error releasing {self.name} lease: {str(e)}")
+        finally:
+            db.close()
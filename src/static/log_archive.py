@@ -0,0 +1,368 @@
+# src/static/log_archive.py
+import bisect
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+from loguru import logger
+from src.database.db import SessionLocal
+from src.service.models.db_model import RunLog
+from src.utils.run_log import run_log_writer
+from src.utils.settings import (
+    RUN_LOGS_PATH, LOG_ARCHIVE_ENABLED, LOG_ARCHIVE_BLOCK_BYTES,
+    LOG_RETENTION_DAYS, LOG_RETENTION_DAYS_BY_PROJECT,
+    LOG_RETENTION_MAX_BYTES, LOG_RETENTION_MAX_BYTES_BY_PROJECT,
+    LOG_RETENTION_INTERVAL_SECONDS
+)
+
+class PlainLog:
+    """Uncompressed log of a run that is still running or not archived yet"""
+    archived = False
+
+    def __init__(self, path: str):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.line_count = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(max(0, min(length, self.size - offset)))
+
+    def line_offset(self, line: int) -> int:
+        """Byte offset where a line starts, found by scanning forward in chunks"""
+        return _scan_line_offset(self, line, 0, 0)
+
+class ArchivedLog:
+    """
+    Block-compressed log. Each block is a separate gzip member, so the file
+    is a regular .gz for zcat, and a read only inflates the blocks it covers.
+    """
+    archived = True
+
+    def __init__(self, row: RunLog):
+        self.path = row.path
+        self.size = row.size_bytes
+        self.line_count = row.line_count
+        self.blocks = json.loads(row.blocks)
+        self.offsets = [block[2] for block in self.blocks]
+        self.first_lines = [block[4] for block in self.blocks]
+        self.cached = (None, b'')
+
+    def _block(self, index: int) -> bytes:
+        if self.cached[0] != index:
+            compressed_offset, compressed_size = self.blocks[index][:2]
+            with open(self.path, 'rb') as f:
+                f.seek(compressed_offset)
+                data = zlib.decompress(f.read(compressed_size), 31)
+            self.cached = (index, data)
+        return self.cached[1]
+
+    def read(self, offset: int, length: int) -> bytes:
+        end = min(offset + length, self.size)
+        chunks = []
+        index = max(0, bisect.bisect_right(self.offsets, offset) - 1)
+        while offset < end and index < len(self.blocks):
+            block_offset = self.blocks[index][2]
+            data = self._block(index)
+            chunks.append(data[offset - block_offset:end - block_offset])
+            offset = block_offset + len(data)
+            index += 1
+        return b''.join(chunks)
+
+    def line_offset(self, line: int) -> int:
+        """Byte offset where a line starts; the index narrows the scan to one block"""
+        if line <= 0:
+            return 0
+        # Block holding the line-th newline: the last one with fewer newlines before it
+        index = bisect.bisect_left(self.first_lines, line) - 1
+        if index < 0:
+            return 0
+        return _scan_line_offset(self, line, self.blocks[index][2], self.blocks[index][4])
+
+def _scan_line_offset(log, line: int, offset: int, lines_before: int, chunk_size: int = 1024 ** 2) -> int:
+    """Offset after the line-th newline, scanning from offset where lines_before newlines precede"""
+    if line <= 0:
+        return 0
+    while offset < log.size:
+        data = log.read(offset, chunk_size)
+        newlines = data.count(b'\n')
+        if lines_before + newlines >= line:
+            position = -1
+            for _ in range(line - lines_before):
+                position = data.index(b'\n', position + 1)
+            return offset + position + 1
+        lines_before += newlines
+        offset += len(data)
+    return log.size
+
+class LogArchive:
+    """
+    Compressed, indexed store of finished run logs with per-project retention.
+
+    Executors hand each finished run's log to archive(); a background thread
+    compresses it in blocks of about LOG_ARCHIVE_BLOCK_BYTES cut at line
+    boundaries, records the block offsets and line counts in run_logs and
+    removes the plain file. Readers seek straight to the blocks covering a
+    byte or line range, so no request inflates or loads a whole log.
+    The same thread deletes logs beyond each project's age and size limits.
+    """
+    def __init__(self, root: str = RUN_LOGS_PATH, block_bytes: int = LOG_ARCHIVE_BLOCK_BYTES,
+                 enabled: bool = LOG_ARCHIVE_ENABLED):
+        self.root = root
+        self.block_bytes = block_bytes
+        self.enabled = enabled
+        self.queue = queue.Queue()
+        self.thread = None
+        self.last_retention = 0.0
+        self.lock = threading.Lock()
+        self.log = logger.bind(log_type="execute")
+
+    def archive(self, run_id: str, project_name: str, script_name: str, log_path: str):
+        """Queue the log of a finished run for compression"""
+        if not self.enabled:
+            return
+        self.start()
+        self.queue.put((run_id, project_name, script_name, log_path))
+
+    def open(self, run_id: str, live_path: str = None):
+        """Reader for a run's log: the archive if compressed, else the plain file"""
+        db = SessionLocal()
+        try:
+            row = db.query(RunLog).filter(RunLog.run_id == run_id).first()
+        finally:
+            db.close()
+        if row is not None and os.path.exists(row.path):
+            return ArchivedLog(row)
+        if live_path and os.path.exists(live_path):
+            try:
+                return PlainLog(live_path)
+            except FileNotFoundError:
+                # Archived between the two checks
+                return self.open(run_id)
+        return None
+
+    def read_range(self, log, offset: int, length: int) -> tuple:
+        """Bytes [offset, offset + length) of a log; returns (data, start, end)"""
+        offset = max(0, min(offset, log.size))
+        data = log.read(offset, length)
+        return data, offset, offset + len(data)
+
+    def read_lines(self, log, start_line: int, lines: Optional[int], max_bytes: int) -> tuple:
+        """
+        Up to `lines` lines from start_line (0-based), or every line with
+        None, at most max_bytes; returns (data, start, end)
+        """
+        offset = log.line_offset(start_line)
+        collected = []
+        size = 0
+        position = offset
+        remaining = lines
+        while (remaining is None or remaining > 0) and position < log.size and size < max_bytes:
+            data = log.read(position, min(64 * 1024, max_bytes - size))
+            if remaining is not None:
+                index = -1
+                while remaining > 0:
+                    index = data.find(b'\n', index + 1)
+                    if index < 0:
+                        break
+                    remaining -= 1
+                if remaining == 0:
+                    data = data[:index + 1]
+            collected.append(data)
+            size += len(data)
+            position += len(data)
+        return b''.join(collected), offset, position
+
+    def tail(self, log, lines: int, max_bytes: int) -> tuple:
+        """The last `lines` lines of a log, at most max_bytes; returns (data, start, end)"""
+        end = log.size
+        position = end
+        # A trailing newline ends the last line rather than starting another
+        if end and log.read(end - 1, 1) == b'\n':
+            position -= 1
+        found = 0
+        start = 0
+        while position > 0 and end - position < max_bytes:
+            chunk_start = max(0, position - 64 * 1024, end - max_bytes)
+            data = log.read(chunk_start, position - chunk_start)
+            index = len(data)
+            while found < lines:
+                index = data.rfind(b'\n', 0, index)
+                if index < 0:
+                    break
+                found += 1
+            if found >= lines:
+                start = chunk_start + index + 1
+                break
+            position = chunk_start
+            start = chunk_start
+        start = max(start, end - max_bytes)
+        return log.read(start, end - start), start, end
+
+    def apply_retention(self):
+        """Delete archived logs beyond each project's age and size limits"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            projects = [row.project_name for row in db.query(RunLog.project_name).distinct()]
+            removed = 0
+            for project_name in projects:
+                days = LOG_RETENTION_DAYS_BY_PROJECT.get(project_name, LOG_RETENTION_DAYS)
+                max_bytes = LOG_RETENTION_MAX_BYTES_BY_PROJECT.get(project_name, LOG_RETENTION_MAX_BYTES)
+                rows = db.query(
+                    RunLog.id, RunLog.path, RunLog.compressed_bytes, RunLog.archived_at
+                ).filter(RunLog.project_name == project_name).order_by(RunLog.archived_at.desc()).all()
+
+                expired = []
+                total = 0
+                cutoff = now - timedelta(days=days) if days else None
+                for row in rows:
+                    total += row.compressed_bytes
+                    if (cutoff is not None and row.archived_at < cutoff) or (max_bytes and total > max_bytes):
+                        expired.append(row)
+                for row in expired:
+                    try:
+                        os.unlink(row.path)
+                    except FileNotFoundError:
+                        pass
+                ids = [row.id for row in expired]
+                for start in range(0, len(ids), 500):
+                    db.query(RunLog).filter(RunLog.id.in_(ids[start:start + 500])).delete(synchronize_session=False)
+                db.commit()
+                removed += len(expired)
+        except Exception as e:
+            db.rollback()
+            self.log.error(f"Error applying run log retention: {str(e)}")
+            return
+        finally:
+            db.close()
+
+        removed += self._remove_stale_plain_logs(now)
+        if removed:
+            self.log.info(f"Run log retention removed {removed} logs")
+
+    def _remove_stale_plain_logs(self, now: datetime) -> int:
+        """Delete uncompressed logs left by older releases or crashed runs once they expire"""
+        removed = 0
+        open_paths = {entry[2] for entry in list(run_log_writer.files.values())}
+        if not os.path.isdir(self.root):
+            return 0
+        for project_name in os.listdir(self.root):
+            days = LOG_RETENTION_DAYS_BY_PROJECT.get(project_name, LOG_RETENTION_DAYS)
+            if not days:
+                continue
+            cutoff = (now - timedelta(days=days)).timestamp()
+            for dirpath, _, filenames in os.walk(os.path.join(self.root, project_name)):
+                for file_name in filenames:
+                    path = os.path.join(dirpath, file_name)
+                    if not file_name.endswith('.log') or path in open_paths:
+                        continue
+                    try:
+                        if os.path.getmtime(path) < cutoff:
+                            os.unlink(path)
+                            removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+    def stop(self, timeout: float = 30.0):
+        """Compress logs still queued and stop the archiver thread"""
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout)
+
+    def start(self):
+        """Start the archiver thread, which also applies retention periodically"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="log-archive", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        """Compress queued logs; apply retention every LOG_RETENTION_INTERVAL_SECONDS"""
+        while True:
+            if time.monotonic() - self.last_retention >= LOG_RETENTION_INTERVAL_SECONDS:
+                self.last_retention = time.monotonic()
+                self.apply_retention()
+            try:
+                item = self.queue.get(timeout=LOG_RETENTION_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            try:
+                self._compress(*item)
+            except Exception as e:
+                self.log.error(f"Error archiving log of run {item[0]}: {str(e)}")
+
+    def _compress(self, run_id: str, project_name: str, script_name: str, log_path: str):
+        """Write a log as gzip blocks cut at line boundaries, index it and drop the plain file"""
+        if not os.path.exists(log_path):
+            return
+        archive_path = f"{log_path}.gz"
+        tmp_path = f"{archive_path}.tmp"
+        blocks = []
+        offset = 0
+        lines_before = 0
+        last_byte = b''
+        carry = b''
+        with open(log_path, 'rb') as source, open(tmp_path, 'wb') as target:
+            while True:
+                data = source.read(self.block_bytes)
+                block = carry + data
+                if not block:
+                    break
+                cut = block.rfind(b'\n') + 1 if data else len(block)
+                if cut <= 0:
+                    # A line longer than a block is split across blocks
+                    cut = len(block)
+                block, carry = block[:cut], block[cut:]
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+                compressed = compressor.compress(block) + compressor.flush()
+                newlines = block.count(b'\n')
+                blocks.append([target.tell(), len(compressed), offset, len(block), lines_before, newlines])
+                target.write(compressed)
+                offset += len(block)
+                lines_before += newlines
+                last_byte = block[-1:]
+            target.flush()
+            os.fsync(target.fileno())
+            compressed_bytes = target.tell()
+
+        # A last line without a trailing newline still counts
+        line_count = lines_before + (1 if last_byte and last_byte != b'\n' else 0)
+        os.replace(tmp_path, archive_path)
+        db = SessionLocal()
+        try:
+            db.add(RunLog(
+                run_id=run_id,
+                script_name=script_name,
+                project_name=project_name,
+                path=archive_path,
+                size_bytes=offset,
+                compressed_bytes=compressed_bytes,
+                line_count=line_count,
+                blocks=json.dumps(blocks),
+                archived_at=datetime.utcnow()
+            ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            os.unlink(archive_path)
+            raise
+        finally:
+            db.close()
+        os.unlink(log_path)
+
+# Create global log archive instance
+log_archive = LogArchive()
@@ -1,103 +1,420 @@
 # src/static/package_manager.py
 import subprocess
 import os
-import hashlib
+import signal
+import threading
+import time
+import toml
+from collections import OrderedDict
+from functools import partial
 from loguru import logger
 import shutil
+from typing import Callable
+from src.static.env_cache import env_cache
+from src.static.package_store import package_store
+from src.static.warm_pool import WarmPoolError, warm_pool
+from src.utils import fork_server
+from src.utils.metrics import env_setup_seconds, env_setups_total, run_duration_seconds, warm_starts_total
+from src.utils.output_stream import StreamPump
+from src.utils.settings import (
+    SCRIPTS_STORE_PATH, ENV_PYTHON, PACKAGE_STORE_ENABLED, OUTPUT_TAIL_BYTES,
+    RUN_TIMEOUT_SECONDS, RUN_MEMORY_LIMIT_MB, RUN_CPU_LIMIT_SECONDS, RUN_KILL_GRACE_SECONDS,
+    WARM_POOL_ENABLED
+)
 
 class PackageManager:
-    def __init__(self, project_name: str, script_name: str):
+    # script path -> (dependency file signature, environment key), shared by all
+    # instances; least recently used paths are dropped beyond RESOLVED_ENVS_MAX
+    _resolved_envs = OrderedDict()
+    _resolved_envs_lock = threading.Lock()
+    RESOLVED_ENVS_MAX = 1024
+
+    def __init__(self, project_name: str, script_name: str, script_path: str = None):
         self.project_name = project_name
         self.script_name = script_name
-        self.script_path = f"/opt/scripts-store/{project_name}/{script_name}"
+        self.script_path = script_path or f"{SCRIPTS_STORE_PATH}/{project_name}/{script_name}"
         self.log = logger.bind(log_type="execute", script_name=script_name)
-        
+        self.env_key = None
+        self.env_acquired = False
+        self.env_outcome = None
+
+    def _dependency_signature(self) -> tuple:
+        """Cheap stat-based fingerprint of the dependency files"""
+        signature = []
+        for file_name in env_cache.DEPENDENCY_FILES:
+            try:
+                stat = os.stat(os.path.join(self.script_path, file_name))
+                signature.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get_env_key(self) -> str:
+        """
+        Cache key of the environment, derived from pyproject.toml and poetry.lock.
+        The key is remembered per script path and only recomputed when the
+        dependency files change on disk.
+        """
+        if self.env_key is None:
+            signature = self._dependency_signature()
+            with self._resolved_envs_lock:
+                resolved = self._resolved_envs.get(self.script_path)
+                if resolved:
+                    self._resolved_envs.move_to_end(self.script_path)
+            if resolved and resolved[0] == signature:
+                self.env_key = resolved[1]
+            else:
+                self.env_key = env_cache.compute_key(self.script_path)
+                with self._resolved_envs_lock:
+                    self._resolved_envs[self.script_path] = (signature, self.env_key)
+                    self._resolved_envs.move_to_end(self.script_path)
+                    while len(self._resolved_envs) > self.RESOLVED_ENVS_MAX:
+                        self._resolved_envs.popitem(last=False)
+        return self.env_key
+
     def get_venv_name(self) -> str:
-        """Generate a unique virtualenv name for the script"""
-        sanitized_name = f"{self.project_name}-{self.script_name}".lower()
-        hash_input = f"{self.script_path}-py3.9"
-        hash_value = hashlib.sha256(hash_input.encode()).hexdigest()[:8]
-        return f"{sanitized_name}-{hash_value}-py3.9"
+        """Name of the cached virtualenv used by the script"""
+        return self.get_env_key()
+
+    def get_venv_path(self) -> str:
+        """Location of the cached virtualenv used by the script"""
+        return env_cache.path(self.get_env_key())
+
+    def get_interpreter(self) -> str:
+        """Path of the Python interpreter inside the cached virtualenv"""
+        return os.path.join(self.get_venv_path(), 'bin', 'python')
 
     def virtualenv_exists(self) -> bool:
-        """Check if virtualenv already exists"""
-        result = subprocess.run(
-            ['poetry', 'env', 'list'], 
-            cwd=self.script_path,
-            capture_output=True,
-            text=True
-        )
-        return self.get_venv_name() in result.stdout
-        
+        """Check if virtualenv already exists using filesystem stats only"""
+        return env_cache.is_ready(self.get_env_key()) and os.access(self.get_interpreter(), os.X_OK)
+
+    def _activated_env(self) -> dict:
+        """Process environment that activates the cached virtualenv"""
+        venv_path = self.get_venv_path()
+        env = dict(os.environ)
+        env.pop('PYTHONHOME', None)
+        # Scripts using prometheus_client must not write into the service's metrics
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        env['VIRTUAL_ENV'] = venv_path
+        env['PATH'] = f"{os.path.join(venv_path, 'bin')}{os.pathsep}{env.get('PATH', '')}"
+        return env
+
     def setup_environment(self) -> tuple[bool, str]:
-        """Set up a Poetry virtual environment for the script."""
+        """
+        Set up the Poetry virtual environment for the script.
+        Environments are shared by every script and version with identical
+        dependency files and stay cached until evicted.
+        """
+        started = time.monotonic()
+        env_ready, venv_name = self._setup_environment()
+        outcome = self.env_outcome if env_ready else "failed"
+        env_setup_seconds.labels(project=self.project_name, outcome=outcome).observe(time.monotonic() - started)
+        env_setups_total.labels(project=self.project_name, outcome=outcome).inc()
+        return env_ready, venv_name
+
+    def _setup_environment(self) -> tuple[bool, str]:
+        """Reuse or build the cached environment; sets env_outcome to reused or built"""
         try:
             if not os.path.exists(os.path.join(self.script_path, 'pyproject.toml')):
                 raise Exception("pyproject.toml not found")
 
             venv_name = self.get_venv_name()
-            
-            # Check if virtualenv already exists
+            if not self.env_acquired:
+                env_cache.acquire(venv_name)
+                self.env_acquired = True
+        except Exception as e:
+            self.log.error(f"Error setting up environment: {str(e)}")
+            return False, ""
+
+        try:
+            # Reuse a warm environment if one exists
             if self.virtualenv_exists():
-                self.log.info(f"Using existing virtualenv: {venv_name}")
+                self.log.info(f"Using cached virtualenv: {venv_name}")
+                self.env_outcome = "reused"
                 return True, venv_name
 
-            # Create new virtualenv and install dependencies
-            self.log.info("Installing dependencies in new virtualenv")
-            result = subprocess.run(
-                ['poetry', 'install', '--no-root'],
-                cwd=self.script_path,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
+            with env_cache.build_lock(venv_name):
+                # Another run may have built it while we waited
+                if self.virtualenv_exists():
+                    self.log.info(f"Using cached virtualenv: {venv_name}")
+                    self.env_outcome = "reused"
+                    return True, venv_name
+
+                venv_path = self.get_venv_path()
+                if os.path.exists(venv_path):
+                    shutil.rmtree(venv_path)
+
+                # Create new virtualenv and install dependencies
+                self.log.info(f"Installing dependencies in new virtualenv: {venv_name}")
+                subprocess.run(
+                    [ENV_PYTHON, '-m', 'venv', venv_path],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+
+                # Link already-seen distributions so Poetry skips installing them
+                if PACKAGE_STORE_ENABLED:
+                    package_store.link_locked(self.script_path, venv_path)
+
+                subprocess.run(
+                    ['poetry', 'install', '--no-root'],
+                    cwd=self.script_path,
+                    env=self._activated_env(),
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+
+                # Share newly installed distributions with future environments
+                if PACKAGE_STORE_ENABLED:
+                    package_store.ingest(venv_path)
+
+                env_cache.mark_ready(venv_name)
+
             self.log.info(f"Created new virtualenv: {venv_name}")
+            self.env_outcome = "built"
+            # Only builds grow the cache, so the budget is applied here; this
+            # environment is in use and is never the one evicted
+            env_cache.evict()
             return True, venv_name
 
         except subprocess.CalledProcessError as e:
-            self.log.error(f"Poetry command failed: {e.stderr}")
+            self.log.error(f"Environment command failed: {e.stderr}")
+            self.release_environment()
             return False, ""
         except Exception as e:
             self.log.error(f"Error setting up environment: {str(e)}")
+            self.release_environment()
             return False, ""
 
-    def run_in_environment(self, script_path: str, params: str = None) -> tuple[bool, str, str]:
-        """Run a Python script in its Poetry environment"""
+    def run_limits(self) -> dict:
+        """
+        Limits for runs of the script: service defaults, overridden by the
+        [tool.scripts-store] section of its pyproject.toml, e.g.
+            [tool.scripts-store]
+            timeout_seconds = 600
+            memory_mb = 512
+            cpu_seconds = 300
+        A value of 0 disables a limit.
+        """
+        limits = {
+            "timeout_seconds": RUN_TIMEOUT_SECONDS,
+            "memory_mb": RUN_MEMORY_LIMIT_MB,
+            "cpu_seconds": RUN_CPU_LIMIT_SECONDS
+        }
+        section = self._run_settings()
+        for name in limits:
+            if name in section:
+                try:
+                    limits[name] = max(0, float(section[name]))
+                except (TypeError, ValueError):
+                    self.log.warning(f"Ignoring invalid {name} in [tool.scripts-store]: {section[name]}")
+        return limits
+
+    def warm_start_modules(self):
+        """
+        Modules to preload when the script opts into warm starts, or None:
+            [tool.scripts-store]
+            warm_start = true
+            preload = ["pandas", "our_sdk"]
+        """
+        section = self._run_settings()
+        if not WARM_POOL_ENABLED or section.get('warm_start') is not True:
+            return None
+        preload = section.get('preload', [])
+        if not isinstance(preload, list) or not all(isinstance(name, str) for name in preload):
+            self.log.warning(f"Ignoring invalid preload in [tool.scripts-store]: {preload}")
+            return []
+        return sorted(set(preload))
+
+    def _run_settings(self) -> dict:
+        """The [tool.scripts-store] section of the script's pyproject.toml"""
+        try:
+            with open(os.path.join(self.script_path, 'pyproject.toml')) as f:
+                return toml.load(f).get('tool', {}).get('scripts-store', {})
+        except (OSError, toml.TomlDecodeError):
+            return {}
+
+    @staticmethod
+    def _rlimits(limits: dict) -> dict:
+        """Address space and CPU time caps of a run, as {rlimit name: (soft, hard)}"""
+        rlimits = {}
+        if limits["memory_mb"]:
+            memory = int(limits["memory_mb"] * 1024 * 1024)
+            rlimits["RLIMIT_AS"] = (memory, memory)
+        if limits["cpu_seconds"]:
+            # SIGXCPU at the soft limit, SIGKILL one second later
+            cpu = int(limits["cpu_seconds"])
+            rlimits["RLIMIT_CPU"] = (cpu, cpu + 1)
+        return rlimits
+
+    @staticmethod
+    def _kill_group(pgid: int, sig: int):
+        """Signal every process of a run's process group"""
+        try:
+            os.killpg(pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def run_in_environment(self, script_path: str, params: str = None,
+                           output_sink: Callable[[bytes], None] = None) -> tuple[bool, str, str, dict]:
+        """
+        Run a Python script in its virtualenv.
+        The venv interpreter is exec'd directly; Poetry is only needed to build
+        the environment, not to run it. Output is passed to output_sink in chunks
+        as it arrives and only the last OUTPUT_TAIL_BYTES of each stream are returned,
+        together with the exit code and resource usage of the process.
+
+        The script runs in its own process group under the limits from
+        run_limits(). When the timeout expires the group gets SIGTERM, then
+        SIGKILL after RUN_KILL_GRACE_SECONDS; processes the script leaves
+        behind are killed when it exits.
+
+        Scripts that opt into warm starts are forked from the warm pool's
+        interpreter for their environment instead, falling back to a fresh
+        interpreter when it is unavailable.
+        """
         try:
-            # Get Poetry run command
-            command = ['poetry', 'run', 'python', script_path]
+            command = [self.get_interpreter(), script_path]
             if params:
                 command.extend(params.split())
-            
+
             # Run with environment settings
-            env = dict(os.environ)
+            env = self._activated_env()
             env['PYTHONUNBUFFERED'] = '1'
-            
-            # Run the script
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                cwd=self.script_path,
-                env=env
-            )
-            
-            success = result.returncode == 0
-            return success, result.stdout, result.stderr
+            limits = self.run_limits()
+            # Set in the child before the script starts, so nothing it runs escapes them
+            rlimits = self._rlimits(limits)
+
+            # Run the script in a new session so the whole process tree can be signalled
+            process_started = time.monotonic()
+            process = None
+            preload = self.warm_start_modules()
+            if preload is not None:
+                try:
+                    process = warm_pool.spawn(
+                        command[0], preload, env, self.script_path, command[1:], rlimits
+                    )
+                    warm_starts_total.labels(project=self.project_name, outcome="forked").inc()
+                except WarmPoolError as e:
+                    warm_starts_total.labels(project=self.project_name, outcome="fallback").inc()
+                    self.log.warning(f"Warm start failed, starting a fresh interpreter: {str(e)}")
+            if process is None:
+                process = subprocess.Popen(
+                    command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=self.script_path,
+                    env=env,
+                    start_new_session=True,
+                    preexec_fn=partial(fork_server.apply_rlimits, rlimits) if rlimits else None
+                )
+
+            pumps = [
+                StreamPump(process.stdout, output_sink, OUTPUT_TAIL_BYTES),
+                StreamPump(process.stderr, output_sink, OUTPUT_TAIL_BYTES)
+            ]
+            for pump in pumps:
+                pump.start()
+
+            timed_out = threading.Event()
+            exited = threading.Event()
+            # Held while signalling the group and while recording the exit,
+            # so the watchdog never signals a group id that may be reused
+            kill_lock = threading.Lock()
+
+            def enforce_timeout():
+                if exited.wait(limits["timeout_seconds"]):
+                    return
+                with kill_lock:
+                    if exited.is_set():
+                        return
+                    timed_out.set()
+                    self.log.warning(f"Run timed out after {limits['timeout_seconds']}s, terminating")
+                    self._kill_group(process.pid, signal.SIGTERM)
+                if not exited.wait(RUN_KILL_GRACE_SECONDS):
+                    with kill_lock:
+                        if not exited.is_set():
+                            self._kill_group(process.pid, signal.SIGKILL)
+
+            watchdog = None
+            if limits["timeout_seconds"]:
+                watchdog = threading.Thread(target=enforce_timeout, daemon=True)
+                watchdog.start()
+
+            # Reap the process ourselves to collect its resource usage; a warm
+            # start's parent is its fork server, which reports them instead
+            if isinstance(process, subprocess.Popen):
+                # Wait without reaping: until it is reaped the exited leader
+                # keeps its pid, so its process group cannot be reused yet
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+                with kill_lock:
+                    exited.set()
+                # Leftover children would keep the output pipes open
+                self._kill_group(process.pid, signal.SIGKILL)
+                _, status, rusage = os.wait4(process.pid, 0)
+            else:
+                # The fork server kills leftover children before it reaps the script
+                try:
+                    _, status, rusage = process.wait4()
+                except WarmPoolError:
+                    # Without its server nobody will reap the script; don't leave it running
+                    with kill_lock:
+                        exited.set()
+                        self._kill_group(process.pid, signal.SIGKILL)
+                    raise
+                with kill_lock:
+                    exited.set()
+            process.returncode = os.waitstatus_to_exitcode(status)
+            run_duration_seconds.labels(
+                project=self.project_name,
+                status="success" if process.returncode == 0 else "failed"
+            ).observe(time.monotonic() - process_started)
+            for pump in pumps:
+                pump.join()
+            if watchdog is not None:
+                watchdog.join()
+
+            usage = {
+                "exit_code": process.returncode,
+                "cpu_time_seconds": rusage.ru_utime + rusage.ru_stime,
+                "peak_rss_kb": rusage.ru_maxrss,
+                "output_bytes": pumps[0].tail.total + pumps[1].tail.total,
+                # Block I/O operations are counted in 512-byte units
+                "io_read_bytes": rusage.ru_inblock * 512,
+                "io_write_bytes": rusage.ru_oublock * 512,
+                "timed_out": timed_out.is_set(),
+                "limits": limits
+            }
+            error = pumps[1].tail.getvalue()
+            if timed_out.is_set():
+                error = f"{error}\nRun killed after exceeding its {limits['timeout_seconds']}s timeout"
+            elif process.returncode == -signal.SIGXCPU or (
+                limits["cpu_seconds"] and process.returncode == -signal.SIGKILL
+                and usage["cpu_time_seconds"] >= limits["cpu_seconds"]
+            ):
+                error = f"{error}\nRun killed after exceeding its {limits['cpu_seconds']}s CPU limit"
+            success = process.returncode == 0
+            return success, pumps[0].tail.getvalue(), error, usage
 
         except Exception as e:
             self.log.error(f"Error running script: {str(e)}")
-            return False, "", str(e)
+            return False, "", str(e), {}
+
+    def release_environment(self):
+        """Return the environment to the cache; it is only removed by LRU eviction"""
+        if self.env_acquired:
+            self.env_acquired = False
+            env_cache.release(self.env_key)
 
     def cleanup_environment(self):
-        """Clean up the Poetry virtual environment"""
+        """Remove the cached virtual environment of the script"""
         try:
             if self.virtualenv_exists():
-                subprocess.run(
-                    ['poetry', 'env', 'remove', self.get_venv_name()],
-                    cwd=self.script_path
-                )
-                self.log.info(f"Cleaned up environment: {self.get_venv_name()}")
+                if env_cache.remove(self.get_venv_name()):
+                    self.log.info(f"Cleaned up environment: {self.get_venv_name()}")
+                else:
+                    self.log.warning(f"Environment {self.get_venv_name()} is in use, not removed")
         except Exception as e:
-            self.log.error(f"Error cleaning up environment: {str(e)}")
\ No newline at end of file
+            self.log.error(f"Error cleaning up environment: {str(e)}")
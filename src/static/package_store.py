@@ -0,0 +1,303 @@
+# src/static/package_store.py
+import csv
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import platform
+import re
+import stat
+import tempfile
+import toml
+from contextlib import contextmanager
+from loguru import logger
+from src.utils.settings import PACKAGE_STORE_PATH
+
+def normalize_name(name: str) -> str:
+    """Normalize a distribution name (PEP 503)"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+class PackageStore:
+    """
+    Content-addressed store of installed distributions shared by all
+    cached environments.
+
+    Layout under the store root:
+        objects/ab/cdef...                  file contents addressed by sha256
+        dists/<python tag>/<name>-<version>.json
+                                            manifest of a distribution's files
+
+    Files in virtualenvs are hardlinks to objects, so each unique file is
+    stored once. An object's link count is its reference count: objects
+    whose only remaining link is the store's own are garbage. Ingesting
+    and linking hold a shared flock on .gc.lock and garbage collection an
+    exclusive one, so no object is deleted between being found and linked.
+
+    Only distributions installed entirely inside site-packages get a
+    manifest. Console scripts and data files live elsewhere in the
+    virtualenv and carry its interpreter path, so distributions with such
+    files are left for Poetry to install; their site-packages files are
+    still deduplicated.
+    """
+    # Manifests of other formats are dropped when met
+    MANIFEST_FORMAT = 2
+
+    def __init__(self, root: str = PACKAGE_STORE_PATH):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.dists_dir = os.path.join(root, 'dists')
+        self.log = logger.bind(log_type="execute")
+
+    @staticmethod
+    def site_packages(venv_path: str) -> str:
+        """Locate the site-packages directory of a virtualenv"""
+        matches = glob.glob(os.path.join(venv_path, 'lib', 'python*', 'site-packages'))
+        if not matches:
+            raise Exception(f"site-packages not found in {venv_path}")
+        return matches[0]
+
+    @staticmethod
+    def python_tag(venv_path: str) -> str:
+        """Interpreter and platform tag; compiled files are only shared within a tag"""
+        version = "unknown"
+        with open(os.path.join(venv_path, 'pyvenv.cfg')) as f:
+            for line in f:
+                key, _, value = line.partition('=')
+                if key.strip() in ('version', 'version_info'):
+                    version = '.'.join(value.strip().split('.')[:2])
+                    break
+        return f"py{version}-{platform.system().lower()}-{platform.machine()}"
+
+    @staticmethod
+    def locked_packages(script_path: str) -> list:
+        """(name, version) pairs from poetry.lock, excluding non-registry sources"""
+        lock_path = os.path.join(script_path, 'poetry.lock')
+        if not os.path.exists(lock_path):
+            return []
+        with open(lock_path) as f:
+            lock = toml.load(f)
+        packages = []
+        for package in lock.get('package', []):
+            source_type = package.get('source', {}).get('type')
+            if source_type in ('git', 'directory', 'file', 'url'):
+                continue
+            packages.append((normalize_name(package['name']), package['version']))
+        return packages
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _manifest_path(self, tag: str, name: str, version: str) -> str:
+        return os.path.join(self.dists_dir, tag, f"{name}-{version}.json")
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @contextmanager
+    def _lock(self, exclusive: bool = False):
+        """Store-wide flock: shared while linking objects, exclusive while collecting them"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.gc.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def link_locked(self, script_path: str, venv_path: str) -> int:
+        """
+        Hardlink every locked distribution already in the store into a new
+        virtualenv, so the following poetry install only fetches the rest.
+        Returns the number of distributions linked.
+        """
+        with self._lock():
+            return self._link_locked(script_path, venv_path)
+
+    def _link_locked(self, script_path: str, venv_path: str) -> int:
+        tag = self.python_tag(venv_path)
+        site_packages = self.site_packages(venv_path)
+        installed = self._installed_dists(site_packages)
+        linked = 0
+
+        for name, version in self.locked_packages(script_path):
+            manifest_path = self._manifest_path(tag, name, version)
+            if name in installed or not os.path.exists(manifest_path):
+                continue
+            created = []
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get('format') != self.MANIFEST_FORMAT:
+                    raise ValueError("outdated manifest format")
+                for rel_path, digest in manifest['files']:
+                    target = os.path.join(site_packages, rel_path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.link(self._object_path(digest), target)
+                    created.append(target)
+                linked += 1
+            except (OSError, ValueError, KeyError) as e:
+                # Incomplete link; undo it, drop the stale manifest and let Poetry install it
+                self.log.warning(f"Could not link {name}-{version} from store: {str(e)}")
+                for target in created:
+                    os.unlink(target)
+                try:
+                    os.unlink(manifest_path)
+                except OSError:
+                    pass
+
+        if linked:
+            self.log.info(f"Linked {linked} distributions from package store into {venv_path}")
+        return linked
+
+    @staticmethod
+    def _installed_dists(site_packages: str) -> set:
+        """Normalized names of the distributions present in site-packages"""
+        names = set()
+        for dist_info in glob.glob(os.path.join(site_packages, '*.dist-info')):
+            stem = os.path.basename(dist_info)[:-len('.dist-info')]
+            names.add(normalize_name(stem.rpartition('-')[0]))
+        return names
+
+    def ingest(self, venv_path: str) -> int:
+        """
+        Move the distributions of a freshly built virtualenv into the store
+        and replace their files with hardlinks to the stored objects.
+        Returns the number of bytes deduplicated.
+        """
+        with self._lock():
+            return self._ingest(venv_path)
+
+    def _ingest(self, venv_path: str) -> int:
+        tag = self.python_tag(venv_path)
+        site_packages = self.site_packages(venv_path)
+        saved = 0
+
+        for dist_info in glob.glob(os.path.join(site_packages, '*.dist-info')):
+            # Distributions installed from git, paths or URLs are not content-stable
+            if os.path.exists(os.path.join(dist_info, 'direct_url.json')):
+                continue
+            record_path = os.path.join(dist_info, 'RECORD')
+            if not os.path.exists(record_path):
+                continue
+
+            stem = os.path.basename(dist_info)[:-len('.dist-info')]
+            name, _, version = stem.rpartition('-')
+            name = normalize_name(name)
+
+            files = []
+            outside = False
+            with open(record_path, newline='') as f:
+                for row in csv.reader(f):
+                    if not row:
+                        continue
+                    if row[0].startswith('..') or os.path.isabs(row[0]):
+                        # bin/ scripts, headers or data files; see the class docstring
+                        outside = True
+                        continue
+                    file_path = os.path.join(site_packages, row[0])
+                    if not os.path.isfile(file_path) or os.path.islink(file_path):
+                        continue
+                    digest, linked_bytes = self._store_file(file_path)
+                    saved += linked_bytes
+                    files.append([row[0], digest])
+
+            manifest_path = self._manifest_path(tag, name, version)
+            if not outside and not os.path.exists(manifest_path):
+                os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(manifest_path))
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({
+                        "format": self.MANIFEST_FORMAT,
+                        "name": name,
+                        "version": version,
+                        "files": files
+                    }, f)
+                os.replace(tmp_path, manifest_path)
+
+        self.log.info(f"Package store deduplicated {saved} bytes from {venv_path}")
+        return saved
+
+    def _store_file(self, file_path: str) -> tuple:
+        """
+        Make a file a hardlink of its content-addressed object.
+        Returns the object digest and the bytes saved by linking.
+        """
+        digest = self._hash_file(file_path)
+        object_path = self._object_path(digest)
+        file_stat = os.stat(file_path)
+
+        try:
+            object_stat = os.stat(object_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            try:
+                os.link(file_path, object_path)
+                # Shared objects must never be modified in place
+                os.chmod(object_path, stat.S_IMODE(file_stat.st_mode) & ~0o222)
+                return digest, 0
+            except FileExistsError:
+                object_stat = os.stat(object_path)
+
+        if object_stat.st_ino == file_stat.st_ino:
+            return digest, 0
+
+        # Same content already stored: swap the file for a link to it
+        tmp_path = f"{file_path}.store-tmp"
+        os.link(object_path, tmp_path)
+        os.replace(tmp_path, file_path)
+        return digest, file_stat.st_size
+
+    def size(self) -> int:
+        """Bytes of all stored objects"""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for file_name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, file_name)).st_size
+                except FileNotFoundError:
+                    continue
+        return total
+
+    def gc(self) -> int:
+        """
+        Delete objects no virtualenv links to any more, and manifests that
+        refer to deleted objects. Returns the number of objects removed.
+        """
+        with self._lock(exclusive=True):
+            return self._gc()
+
+    def _gc(self) -> int:
+        removed = set()
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for file_name in filenames:
+                object_path = os.path.join(dirpath, file_name)
+                try:
+                    if os.stat(object_path).st_nlink <= 1:
+                        os.unlink(object_path)
+                        removed.add(os.path.basename(dirpath) + file_name)
+                except FileNotFoundError:
+                    continue
+
+        if removed:
+            for manifest_path in glob.glob(os.path.join(self.dists_dir, '*', '*.json')):
+                try:
+                    with open(manifest_path) as f:
+                        files = json.load(f)['files']
+                except (OSError, ValueError, KeyError):
+                    files = []
+                if not files or any(digest in removed for _, digest in files):
+                    try:
+                        os.unlink(manifest_path)
+                    except OSError:
+                        pass
+            self.log.info(f"Package store garbage collected {len(removed)} objects")
+        return len(removed)
+
+# Create global package store instance
+package_store = PackageStore()
@@ -0,0 +1,149 @@
+# src/static/prewarmer.py
+import heapq
+import itertools
+import math
+import threading
+import time
+from datetime import datetime
+from croniter import croniter
+from loguru import logger
+from src.database.db import SessionLocal
+from src.service.models.db_model import Script
+from src.static.package_manager import PackageManager
+from src.static.versions import version_store
+from src.utils.settings import PREWARM_ENABLED, PREWARM_WORKERS
+
+class EnvironmentPrewarmer:
+    """
+    Builds script environments in the background before they are needed.
+
+    Versions are queued when they are registered and, at startup, for every
+    active scheduled script. A few builder threads take the script whose
+    cron schedule fires next first, so scheduled runs find a ready
+    interpreter instead of building one at fire time. Builds go through the
+    environment cache, so an environment that already exists costs a stat.
+    """
+    def __init__(self, max_workers: int = PREWARM_WORKERS, enabled: bool = PREWARM_ENABLED):
+        self.max_workers = max_workers
+        self.enabled = enabled
+        self.queue = []
+        self.pending = set()
+        self.sequence = itertools.count()
+        self.workers = []
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.log = logger.bind(log_type="execute")
+
+    @staticmethod
+    def next_fire_time(cron_expression: str = None) -> float:
+        """Timestamp of the next scheduled run; unscheduled scripts sort last"""
+        if not cron_expression:
+            return math.inf
+        try:
+            return croniter(cron_expression, datetime.now()).get_next(float)
+        except Exception:
+            return math.inf
+
+    def request(self, project_name: str, script_name: str, cron_expression: str = None):
+        """
+        Queue the active version of a script for an environment build.
+        Requests for a script already waiting in the queue are merged.
+        """
+        if not self.enabled:
+            return
+        key = (project_name, script_name)
+        with self.lock:
+            if self.stopping or key in self.pending:
+                return
+            self._ensure_workers()
+            self.pending.add(key)
+            heapq.heappush(
+                self.queue,
+                (self.next_fire_time(cron_expression), next(self.sequence), project_name, script_name)
+            )
+            self.available.notify()
+
+    def prewarm_scheduled(self) -> int:
+        """Queue every active scheduled script; returns how many were queued"""
+        if not self.enabled:
+            return 0
+        db = SessionLocal()
+        try:
+            scripts = db.query(
+                Script.project_name,
+                Script.script_name,
+                Script.cron_expression
+            ).filter(
+                Script.is_active == True,
+                Script.cron_expression.isnot(None)
+            ).all()
+        finally:
+            db.close()
+
+        for script in scripts:
+            self.request(script.project_name, script.script_name, script.cron_expression)
+        self.log.info(f"Queued {len(scripts)} scheduled scripts for environment prewarming")
+        return len(scripts)
+
+    def stats(self) -> dict:
+        """Builds waiting and builder threads"""
+        with self.lock:
+            return {"queued": len(self.queue), "workers": len(self.workers)}
+
+    def shutdown(self):
+        """Drop queued builds; builds in progress finish in the background"""
+        with self.lock:
+            self.stopping = True
+            self.queue = []
+            self.pending.clear()
+            self.available.notify_all()
+
+    def _ensure_workers(self):
+        """Start the builder threads on first use (caller holds the lock)"""
+        while len(self.workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"env-prewarm-{len(self.workers)}",
+                daemon=True
+            )
+            self.workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        """Builder loop: build the most urgent queued environment until shut down"""
+        while True:
+            with self.lock:
+                while not self.queue:
+                    if self.stopping:
+                        return
+                    self.available.wait()
+                _, _, project_name, script_name = heapq.heappop(self.queue)
+                # _build resolves the active version when it starts; a version
+                # registered from now on needs a request of its own
+                self.pending.discard((project_name, script_name))
+            self._build(project_name, script_name)
+
+    def _build(self, project_name: str, script_name: str):
+        """Build the environment of a script's active version if it is missing"""
+        script_path = version_store.resolve(project_name, script_name)
+        package_manager = PackageManager(project_name, script_name, script_path)
+        started = time.monotonic()
+        try:
+            existed = package_manager.virtualenv_exists()
+            # Also refreshes the environment's LRU position when it exists
+            env_ready, env_key = package_manager.setup_environment()
+            if env_ready and not existed:
+                self.log.info(
+                    f"Prewarmed environment {env_key} for {project_name}/{script_name} "
+                    f"in {time.monotonic() - started:.1f}s"
+                )
+            elif not env_ready:
+                self.log.warning(f"Could not prewarm environment for {project_name}/{script_name}")
+        except Exception as e:
+            self.log.error(f"Error prewarming {project_name}/{script_name}: {str(e)}")
+        finally:
+            package_manager.release_environment()
+
+# Create global environment prewarmer instance
+prewarmer = EnvironmentPrewarmer()
@@ -0,0 +1,315 @@
+# src/static/run_manager.py
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Optional
+from loguru import logger
+from src.static.executor import ScriptExecutor
+from src.static.run_queue import run_queue
+from src.utils.run_log import run_log_writer
+from src.utils.settings import (
+    RUN_WORKERS, RUN_HISTORY_SIZE, PROJECT_RUN_QUOTA, PROJECT_RUN_QUOTAS, RUN_PRIORITIES,
+    EXECUTION_MODE, WORKER_POLL_SECONDS
+)
+
+class RunManager:
+    """
+    Executes scripts on a bounded pool of worker threads and tracks each
+    execution by run ID so callers never block on a running script.
+
+    Submitted runs wait in a priority queue. Workers take the
+    highest-priority run (manual before cron, then oldest first) whose
+    project is below its concurrency quota, so bursts of scheduled runs are
+    smoothed out instead of all starting at once.
+
+    In "queue" execution mode runs are not executed here: submit() puts them
+    on the shared database queue for worker processes (src/worker.py) and
+    lookups fall back to that queue.
+    """
+    WAIT_SAMPLES = 100
+
+    def __init__(self, max_workers: int = RUN_WORKERS, history_size: int = RUN_HISTORY_SIZE,
+                 project_quota: int = PROJECT_RUN_QUOTA, project_quotas: dict = None,
+                 mode: str = EXECUTION_MODE):
+        self.remote = mode == "queue"
+        self.max_workers = max_workers
+        self.history_size = history_size
+        self.project_quota = project_quota
+        self.project_quotas = PROJECT_RUN_QUOTAS if project_quotas is None else project_quotas
+        self.runs = {}
+        self.futures = {}
+        self.finished = deque()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.running = Counter()
+        self.wait_samples = deque(maxlen=self.WAIT_SAMPLES)
+        self.workers = []
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.log = logger.bind(log_type="execute")
+
+    def submit(self, script_name: str, project_name: str, params: str = None,
+               trigger: str = "manual", priority: int = None, run_id: str = None,
+               scheduled_at: float = None) -> dict:
+        """
+        Queue a script run and return its run record immediately.
+        scheduled_at is the cron fire time (epoch seconds) of scheduled runs.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        if priority is None:
+            priority = RUN_PRIORITIES.get(trigger, max(RUN_PRIORITIES.values()))
+        if self.remote:
+            return run_queue.enqueue(
+                script_name, project_name, params, trigger, priority, run_id, scheduled_at
+            )
+        run = {
+            "run_id": run_id,
+            "script_name": script_name,
+            "project_name": project_name,
+            "params": params,
+            "trigger": trigger,
+            "priority": priority,
+            "status": "queued",
+            "scheduled_at": scheduled_at,
+            "submitted_at": datetime.utcnow(),
+            "started_at": None,
+            "finished_at": None,
+            "queue_wait_seconds": None,
+            "log_file": None,
+            "result": None,
+            "error": None
+        }
+        with self.lock:
+            if self.stopping:
+                raise Exception("Run manager is shut down")
+            self._ensure_workers()
+            self.runs[run_id] = run
+            self.futures[run_id] = Future()
+            heapq.heappush(self.queue, (priority, next(self.sequence), time.monotonic(), run_id))
+            self.available.notify()
+        self.log.info(f"Queued run {run_id} for {project_name}/{script_name} ({trigger})")
+        return dict(run)
+
+    def get(self, run_id: str) -> Optional[dict]:
+        """Get a snapshot of a run record"""
+        with self.lock:
+            run = self.runs.get(run_id)
+            if not run:
+                return run_queue.get(run_id) if self.remote else None
+            snapshot = dict(run)
+        if snapshot["log_file"] is None:
+            snapshot["log_file"] = run_log_writer.path(run_id)
+        return snapshot
+
+    async def wait(self, run_id: str, timeout: float = None) -> Optional[dict]:
+        """Wait for a run to finish without blocking the event loop"""
+        with self.lock:
+            future = self.futures.get(run_id)
+        if future is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except asyncio.TimeoutError:
+                pass
+        elif self.remote:
+            return await self._poll_queue(run_id, timeout)
+        return self.get(run_id)
+
+    def add_done_callback(self, run_id: str, callback: Callable[[], None]) -> bool:
+        """
+        Call callback from the worker thread once a run executed here
+        finishes. Returns False for runs this process does not execute or
+        that already finished; callers poll get() for those.
+        """
+        with self.lock:
+            future = self.futures.get(run_id)
+        if future is None:
+            return False
+        future.add_done_callback(lambda _: callback())
+        return True
+
+    async def _poll_queue(self, run_id: str, timeout: float = None) -> Optional[dict]:
+        """Poll the shared queue until a run executed by a worker finishes"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            run = await asyncio.to_thread(run_queue.get, run_id)
+            if run is None or run["finished_at"] is not None:
+                return run
+            if deadline is not None and time.monotonic() >= deadline:
+                return run
+            await asyncio.sleep(WORKER_POLL_SECONDS)
+
+    def quota(self, project_name: str) -> int:
+        """Concurrent run limit of a project (0 = unlimited)"""
+        return self.project_quotas.get(project_name, self.project_quota)
+
+    def active_runs(self, script_name: str, project_name: str) -> dict:
+        """Number of queued and running runs of a script"""
+        if self.remote:
+            return run_queue.active_runs(script_name, project_name)
+        counts = {"queued": 0, "running": 0}
+        with self.lock:
+            for run in self.runs.values():
+                if (
+                    run["finished_at"] is None
+                    and run["script_name"] == script_name
+                    and run["project_name"] == project_name
+                ):
+                    counts["queued" if run["status"] == "queued" else "running"] += 1
+        return counts
+
+    def queue_stats(self) -> dict:
+        """Queue depth, running counts and wait times, overall and per project"""
+        if self.remote:
+            return run_queue.stats()
+        now = time.monotonic()
+        with self.lock:
+            queued = [(self.runs[run_id], enqueued) for _, _, enqueued, run_id in self.queue]
+            waits = list(self.wait_samples)
+            projects = {}
+            for run, enqueued in queued:
+                project = projects.setdefault(run["project_name"], {"queued": 0, "running": 0})
+                project["queued"] += 1
+            for project_name, count in self.running.items():
+                projects.setdefault(project_name, {"queued": 0, "running": 0})["running"] = count
+            for project_name, project in projects.items():
+                project["quota"] = self.quota(project_name)
+
+            return {
+                "mode": "local",
+                "max_workers": self.max_workers,
+                "running": sum(self.running.values()),
+                "queued": len(queued),
+                "oldest_wait_seconds": max((now - enqueued for _, enqueued in queued), default=0.0),
+                "recent_wait_seconds_avg": sum(waits) / len(waits) if waits else 0.0,
+                "recent_wait_seconds_max": max(waits, default=0.0),
+                "projects": projects,
+                "queue": [
+                    {
+                        "run_id": run["run_id"],
+                        "project_name": run["project_name"],
+                        "script_name": run["script_name"],
+                        "trigger": run["trigger"],
+                        "priority": run["priority"],
+                        "waiting_seconds": now - enqueued
+                    }
+                    for run, enqueued in sorted(queued, key=lambda item: (item[0]["priority"], item[1]))
+                ]
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the workers; runs still queued are cancelled"""
+        with self.lock:
+            self.stopping = True
+            cancelled = [run_id for _, _, _, run_id in self.queue]
+            self.queue = []
+            self.available.notify_all()
+            workers = list(self.workers)
+        for run_id in cancelled:
+            self._finish(run_id, "cancelled", error="Service shut down before the run started")
+        if wait:
+            for worker in workers:
+                worker.join()
+
+    def _ensure_workers(self):
+        """Start the worker threads on first use (caller holds the lock)"""
+        while len(self.workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._work,
+                name=f"script-run-{len(self.workers)}",
+                daemon=True
+            )
+            self.workers.append(worker)
+            worker.start()
+
+    def _next_run(self) -> Optional[str]:
+        """Pop the best run whose project has quota left (caller holds the lock)"""
+        skipped = []
+        run_id = None
+        while self.queue:
+            entry = heapq.heappop(self.queue)
+            project_name = self.runs[entry[3]]["project_name"]
+            quota = self.quota(project_name)
+            if quota and self.running[project_name] >= quota:
+                skipped.append(entry)
+                continue
+            run_id = entry[3]
+            self.running[project_name] += 1
+            self.wait_samples.append(time.monotonic() - entry[2])
+            break
+        for entry in skipped:
+            heapq.heappush(self.queue, entry)
+        return run_id
+
+    def _work(self):
+        """Worker loop: take eligible runs until shut down"""
+        while True:
+            with self.lock:
+                run_id = self._next_run()
+                while run_id is None:
+                    if self.stopping:
+                        return
+                    self.available.wait()
+                    run_id = self._next_run()
+            self._execute(run_id)
+
+    def _execute(self, run_id: str):
+        """Run the script on a worker thread and record the outcome"""
+        with self.lock:
+            run = self.runs[run_id]
+            run["status"] = "running"
+            run["started_at"] = datetime.utcnow()
+            run["queue_wait_seconds"] = (run["started_at"] - run["submitted_at"]).total_seconds()
+
+        # Built inside the try so a failing constructor still frees the project slot and Future
+        executor = None
+        try:
+            executor = ScriptExecutor(
+                run["script_name"],
+                run["project_name"],
+                run_id=run_id,
+                trigger=run["trigger"],
+                scheduled_at=run["scheduled_at"]
+            )
+            result = executor.execute(run["params"])
+            self._finish(run_id, result["status"], result=result, log_file=executor.log_path)
+        except Exception as e:
+            log_file = executor.log_path if executor is not None else None
+            self._finish(run_id, "failed", error=str(e), log_file=log_file)
+        finally:
+            if executor is not None:
+                executor.cleanup()
+            with self.lock:
+                self.running[run["project_name"]] -= 1
+                if self.running[run["project_name"]] <= 0:
+                    del self.running[run["project_name"]]
+                # A freed project slot may unblock runs other workers skipped
+                self.available.notify_all()
+
+    def _finish(self, run_id: str, status: str, result: dict = None, error: str = None,
+                log_file: str = None):
+        """Mark a run finished and trim old finished runs"""
+        with self.lock:
+            run = self.runs[run_id]
+            run["status"] = status
+            run["finished_at"] = datetime.utcnow()
+            run["log_file"] = log_file
+            run["result"] = result
+            run["error"] = error
+            future = self.futures.pop(run_id, None)
+            self.finished.append(run_id)
+            while len(self.finished) > self.history_size:
+                self.runs.pop(self.finished.popleft(), None)
+
+        if future is not None:
+            future.set_result(status)
+        self.log.info(f"Run {run_id} finished with status {status}")
+
+# Create global run manager instance
+run_manager = RunManager()
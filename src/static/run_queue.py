@@ -0,0 +1,240 @@
+# src/static/run_queue.py
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from loguru import logger
+from sqlalchemy import and_, func, or_
+from src.database.db import SessionLocal
+from src.service.models.db_model import QueuedRun
+from src.utils.settings import WORKER_LEASE_SECONDS, WORKER_MAX_ATTEMPTS
+
+class RunQueue:
+    """
+    Database-backed run queue shared by the API and worker processes.
+
+    Workers lease runs with a compare-and-set update, so a run is only
+    ever claimed by one worker. Leases are renewed by heartbeats; when a
+    worker dies its leases lapse and the runs are claimed again, up to
+    WORKER_MAX_ATTEMPTS times.
+    """
+    def __init__(self, lease_seconds: int = WORKER_LEASE_SECONDS,
+                 max_attempts: int = WORKER_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.log = logger.bind(log_type="execute")
+
+    def enqueue(self, script_name: str, project_name: str, params: str = None,
+                trigger: str = "manual", priority: int = 0, run_id: str = None,
+                scheduled_at: float = None) -> dict:
+        """Add a run to the queue and return its run record"""
+        db = SessionLocal()
+        try:
+            row = QueuedRun(
+                run_id=run_id or uuid.uuid4().hex,
+                script_name=script_name,
+                project_name=project_name,
+                params=params,
+                trigger=trigger,
+                priority=priority,
+                scheduled_at=scheduled_at,
+                status="queued",
+                submitted_at=datetime.utcnow(),
+                attempts=0
+            )
+            db.add(row)
+            db.commit()
+            self.log.info(f"Enqueued run {row.run_id} for {project_name}/{script_name} ({trigger})")
+            return self._to_dict(row)
+        finally:
+            db.close()
+
+    def get(self, run_id: str) -> Optional[dict]:
+        """Get a run record from the queue table"""
+        db = SessionLocal()
+        try:
+            row = db.query(QueuedRun).filter(QueuedRun.run_id == run_id).first()
+            return self._to_dict(row) if row else None
+        finally:
+            db.close()
+
+    def claim(self, worker_id: str, slots: int, quota: Callable[[str], int]) -> list:
+        """
+        Lease up to `slots` runs for a worker, best priority first, skipping
+        projects that already have `quota(project)` runs leased cluster-wide.
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            leased = dict(
+                db.query(QueuedRun.project_name, func.count(QueuedRun.id)).filter(
+                    QueuedRun.status == "leased",
+                    QueuedRun.lease_expires_at >= now
+                ).group_by(QueuedRun.project_name).all()
+            )
+
+            candidates = db.query(QueuedRun).filter(
+                QueuedRun.status == "queued"
+            ).order_by(QueuedRun.priority, QueuedRun.submitted_at).limit(slots * 10).all()
+            candidates += db.query(QueuedRun).filter(
+                QueuedRun.status == "leased",
+                QueuedRun.lease_expires_at < now
+            ).limit(slots * 10).all()
+            candidates.sort(key=lambda row: (row.priority, row.submitted_at))
+
+            claimable = or_(
+                QueuedRun.status == "queued",
+                and_(QueuedRun.status == "leased", QueuedRun.lease_expires_at < now)
+            )
+            claimed = []
+            for row in candidates:
+                if len(claimed) >= slots:
+                    break
+                project_quota = quota(row.project_name)
+                if project_quota and leased.get(row.project_name, 0) >= project_quota:
+                    continue
+
+                if row.attempts >= self.max_attempts:
+                    db.query(QueuedRun).filter(QueuedRun.id == row.id, claimable).update({
+                        "status": "failed",
+                        "finished_at": now,
+                        "error": f"Run abandoned after {row.attempts} lease attempts"
+                    }, synchronize_session=False)
+                    db.commit()
+                    continue
+
+                updated = db.query(QueuedRun).filter(QueuedRun.id == row.id, claimable).update({
+                    "status": "leased",
+                    "worker_id": worker_id,
+                    "started_at": now,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "attempts": QueuedRun.attempts + 1
+                }, synchronize_session=False)
+                db.commit()
+
+                if updated:
+                    db.refresh(row)
+                    leased[row.project_name] = leased.get(row.project_name, 0) + 1
+                    claimed.append(self._to_dict(row))
+                    if row.attempts > 1:
+                        self.log.warning(f"Re-leased run {row.run_id} (attempt {row.attempts})")
+            return claimed
+        finally:
+            db.close()
+
+    def heartbeat(self, worker_id: str, run_ids: list) -> int:
+        """Renew the leases a worker holds; returns how many are still held"""
+        if not run_ids:
+            return 0
+        db = SessionLocal()
+        try:
+            updated = db.query(QueuedRun).filter(
+                QueuedRun.run_id.in_(run_ids),
+                QueuedRun.worker_id == worker_id,
+                QueuedRun.status == "leased"
+            ).update({
+                "lease_expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.commit()
+            return updated
+        finally:
+            db.close()
+
+    def complete(self, run_id: str, worker_id: str, status: str,
+                 result: dict = None, error: str = None) -> bool:
+        """Store the outcome of a leased run; ignored if the lease was lost"""
+        db = SessionLocal()
+        try:
+            updated = db.query(QueuedRun).filter(
+                QueuedRun.run_id == run_id,
+                QueuedRun.worker_id == worker_id,
+                QueuedRun.status == "leased"
+            ).update({
+                "status": status,
+                "finished_at": datetime.utcnow(),
+                "result": json.dumps(result, default=str) if result is not None else None,
+                "error": error
+            }, synchronize_session=False)
+            db.commit()
+            if not updated:
+                self.log.warning(f"Worker {worker_id} lost the lease of run {run_id}")
+            return bool(updated)
+        finally:
+            db.close()
+
+    def active_runs(self, script_name: str, project_name: str) -> dict:
+        """Number of queued and leased runs of a script"""
+        db = SessionLocal()
+        try:
+            counts = dict(
+                db.query(QueuedRun.status, func.count(QueuedRun.id)).filter(
+                    QueuedRun.status.in_(("queued", "leased")),
+                    QueuedRun.project_name == project_name,
+                    QueuedRun.script_name == script_name
+                ).group_by(QueuedRun.status).all()
+            )
+        finally:
+            db.close()
+        return {"queued": counts.get("queued", 0), "running": counts.get("leased", 0)}
+
+    def stats(self) -> dict:
+        """Queue depth, leased runs and oldest wait, overall and per project"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                QueuedRun.project_name,
+                QueuedRun.status,
+                func.count(QueuedRun.id),
+                func.min(QueuedRun.submitted_at)
+            ).filter(
+                QueuedRun.status.in_(("queued", "leased"))
+            ).group_by(QueuedRun.project_name, QueuedRun.status).all()
+        finally:
+            db.close()
+
+        projects = {}
+        oldest = None
+        for project_name, status, count, first_submitted in rows:
+            project = projects.setdefault(project_name, {"queued": 0, "running": 0})
+            if status == "queued":
+                project["queued"] = count
+                oldest = first_submitted if oldest is None else min(oldest, first_submitted)
+            else:
+                project["running"] = count
+        return {
+            "mode": "queue",
+            "running": sum(project["running"] for project in projects.values()),
+            "queued": sum(project["queued"] for project in projects.values()),
+            "oldest_wait_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+            "projects": projects
+        }
+
+    @staticmethod
+    def _to_dict(row: QueuedRun) -> dict:
+        """Run record in the same shape the in-process run manager returns"""
+        result = json.loads(row.result) if row.result else None
+        return {
+            "run_id": row.run_id,
+            "script_name": row.script_name,
+            "project_name": row.project_name,
+            "params": row.params,
+            "trigger": row.trigger,
+            "priority": row.priority,
+            "status": "running" if row.status == "leased" else row.status,
+            "scheduled_at": row.scheduled_at,
+            "submitted_at": row.submitted_at,
+            "started_at": row.started_at,
+            "finished_at": row.finished_at,
+            "queue_wait_seconds": (
+                (row.started_at - row.submitted_at).total_seconds() if row.started_at else None
+            ),
+            "log_file": result.get("log_file") if result else None,
+            "result": result,
+            "error": row.error,
+            "worker_id": row.worker_id,
+            "attempts": row.attempts
+        }
+
+# Create global run queue instance
+run_queue = RunQueue()
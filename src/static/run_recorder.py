@@ -0,0 +1,161 @@
+# src/static/run_recorder.py
+import queue
+import threading
+import time
+from loguru import logger
+from sqlalchemy import func
+from src.database.db import SessionLocal
+from src.service.models.db_model import Script, ScriptRun
+from src.utils.settings import (
+    RUN_RECORDER_BATCH_SIZE, RUN_RECORDER_FLUSH_SECONDS, RUN_RECORDER_RETRIES, RUN_RECORDER_RETRY_SECONDS
+)
+
+class RunRecorder:
+    """
+    Writes script run history in the background.
+
+    Executors hand finished runs to record(), which only enqueues them;
+    a writer thread inserts queued runs in batches, together with the last
+    run, status and run count of their scripts, so the run itself never
+    waits on the database. A failed batch is retried with backoff, then
+    written run by run so one bad row does not lose the others.
+    """
+    def __init__(self, batch_size: int = RUN_RECORDER_BATCH_SIZE,
+                 flush_seconds: float = RUN_RECORDER_FLUSH_SECONDS):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.log = logger.bind(log_type="execute")
+
+    def record(self, run: dict):
+        """Queue a finished run for insertion into script_runs"""
+        self._ensure_started()
+        self.queue.put(run)
+
+    def stop(self, timeout: float = 5.0):
+        """Flush pending runs and stop the writer thread"""
+        with self.lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join(timeout)
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="run-recorder", daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        """Collect queued runs into batches and write them"""
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                continue
+
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = False
+                    break
+            stopping = item is None
+
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: list):
+        """Write a batch, retrying transient failures before falling back to single runs"""
+        for attempt in range(RUN_RECORDER_RETRIES + 1):
+            try:
+                self._insert(batch)
+                return
+            except Exception as e:
+                self.log.warning(
+                    f"Error recording {len(batch)} script runs (attempt {attempt + 1}): {str(e)}"
+                )
+            if attempt < RUN_RECORDER_RETRIES:
+                time.sleep(RUN_RECORDER_RETRY_SECONDS * 2 ** attempt)
+
+        if len(batch) == 1:
+            self.log.error(f"Dropping run {batch[0].get('run_id')} after {RUN_RECORDER_RETRIES + 1} attempts")
+            return
+        for run in batch:
+            try:
+                self._insert([run])
+            except Exception as e:
+                self.log.error(f"Dropping run {run.get('run_id')}: {str(e)}")
+
+    def _insert(self, batch: list):
+        """
+        Insert a batch of runs and update their scripts in one transaction.
+        Versions are looked up by the version directory a run used, else the
+        active version. The batch itself is left unchanged so it can be retried.
+        """
+        db = SessionLocal()
+        try:
+            versions = {}
+            rows = []
+            for run in batch:
+                row = dict(run)
+                script_path = row.pop("script_path", None)
+                if row.get("version") is None:
+                    key = (row["project_name"], row["script_name"], script_path)
+                    if key not in versions:
+                        versions[key] = self._version(db, *key)
+                    row["version"] = versions[key]
+                rows.append(row)
+
+            db.bulk_insert_mappings(ScriptRun, rows)
+            self._update_scripts(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _version(db, project_name: str, script_name: str, script_path: str = None):
+        query = db.query(Script.version).filter(
+            Script.project_name == project_name,
+            Script.script_name == script_name
+        )
+        script = query.filter(Script.path == script_path).first() if script_path else None
+        if script is None:
+            script = query.filter(Script.is_active == True).first()
+        return script.version if script else None
+
+    @staticmethod
+    def _update_scripts(db, batch: list):
+        """One update per script: run count, and time and status of its latest run"""
+        scripts = {}
+        for run in batch:
+            key = (run["project_name"], run["script_name"])
+            count, latest = scripts.get(key, (0, None))
+            if latest is None or run["finished_at"] >= latest["finished_at"]:
+                latest = run
+            scripts[key] = (count + 1, latest)
+
+        for (project_name, script_name), (count, latest) in scripts.items():
+            db.query(Script).filter(
+                Script.project_name == project_name,
+                Script.script_name == script_name,
+                Script.is_active == True
+            ).update({
+                Script.last_run: latest["finished_at"],
+                Script.last_status: "success" if latest["status"] == "success" else "failed",
+                Script.run_count: func.coalesce(Script.run_count, 0) + count
+            }, synchronize_session=False)
+
+# Create global run recorder instance
+run_recorder = RunRecorder()
@@ -1,61 +1,353 @@
 # src/static/scheduler.py
+from apscheduler.executors.base import BaseExecutor, run_job
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from apscheduler.util import datetime_to_utc_timestamp
+from collections import deque
+from contextlib import contextmanager
+from croniter import croniter
+from datetime import datetime, timezone
+from functools import partial
+from sqlalchemy.exc import IntegrityError
+import pickle
+import sys
+import threading
+import time
+from typing import Callable, Optional
 from loguru import logger
-from src.database.db import SessionLocal
+from src.database.db import SessionLocal, engine
 from src.service.models.db_model import Script
-from src.static.executor import ScriptExecutor
+from src.static.leader import LeaderElector
+from src.static.run_manager import run_manager
+from src.utils.metrics import (
+    scheduler_fires_total, scheduler_fires_skipped_total, scheduler_fires_coalesced_total,
+    scheduler_leader, scheduler_restore_seconds
+)
+from src.utils.settings import (
+    RESTORE_BATCH_SIZE, SCHEDULE_OVERLAP_POLICY, SCHEDULE_MISFIRE_POLICY,
+    SCHEDULE_MISFIRE_GRACE_SECONDS, SCHEDULE_CATCHUP_RATE, SCHEDULE_CATCHUP_BURST
+)
 
-def execute_scheduled_script(script_name: str, project_name: str):
+# Overlap checks and submissions of concurrent fires do not interleave
+_fire_lock = threading.Lock()
+
+def execute_scheduled_script(script_name: str, project_name: str, overlap_policy: str = None,
+                             misfire_policy: str = None, scheduled_at: float = None):
     """
     Global function for script execution that APScheduler can serialize.
-    This will be called by the scheduler.
+    This will be called for each fire the script's misfire policy keeps
+    (applied by ScheduledFireExecutor); it applies the overlap policy and
+    only queues the run on the bounded run manager so a burst of fires
+    cannot overload the host.
+    """
+    overlap_policy = overlap_policy or SCHEDULE_OVERLAP_POLICY
+    if scheduled_at is None:
+        scheduled_at = scheduled_fire_time(script_name, project_name)
+    with _fire_lock:
+        if overlap_policy != "allow":
+            active = run_manager.active_runs(script_name, project_name)
+            if active["queued"] or (overlap_policy == "skip" and active["running"]):
+                scheduler_fires_skipped_total.labels(project=project_name, reason="overlap").inc()
+                logger.info(
+                    f"Skipped fire of {project_name}/{script_name}: {active['running']} running, "
+                    f"{active['queued']} queued ({overlap_policy})"
+                )
+                return None
+        return run_manager.submit(
+            script_name, project_name, trigger="cron", scheduled_at=scheduled_at
+        )
+
+def scheduled_fire_time(script_name: str, project_name: str) -> Optional[float]:
+    """
+    Timestamp of the cron slot a fire belongs to: the latest fire time of
+    the script's schedule at or before now. Used to measure schedule lag.
     """
-    executor = ScriptExecutor(script_name, project_name)
+    db = SessionLocal()
     try:
-        executor.execute()
+        script = db.query(Script.cron_expression).filter(
+            Script.project_name == project_name,
+            Script.script_name == script_name,
+            Script.is_active == True
+        ).first()
     finally:
-        executor.cleanup()
+        db.close()
+    if not script or not script.cron_expression:
+        return None
+    try:
+        # Cron jobs fire in local time, like the scheduler's triggers
+        return croniter(script.cron_expression, datetime.now()).get_prev(datetime).timestamp()
+    except Exception:
+        return None
+
+class BatchingJobStore(SQLAlchemyJobStore):
+    """
+    SQLAlchemy jobstore whose writes can be grouped into one transaction.
+    Inside batch(), job writes from the calling thread share one connection
+    and commit together; other threads keep writing one job at a time.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._batch = threading.local()
+
+    @contextmanager
+    def batch(self):
+        with self.engine.begin() as connection:
+            self._batch.connection = connection
+            try:
+                yield
+            finally:
+                self._batch.connection = None
+
+    @contextmanager
+    def _begin(self):
+        connection = getattr(self._batch, "connection", None)
+        if connection is not None:
+            yield connection
+        else:
+            with self.engine.begin() as connection:
+                yield connection
+
+    def add_job(self, job):
+        insert = self.jobs_t.insert().values(
+            id=job.id,
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        )
+        with self._begin() as connection:
+            try:
+                connection.execute(insert)
+            except IntegrityError:
+                raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        update = self.jobs_t.update().values(
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        ).where(self.jobs_t.c.id == job.id)
+        with self._begin() as connection:
+            if connection.execute(update).rowcount == 0:
+                raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        delete = self.jobs_t.delete().where(self.jobs_t.c.id == job_id)
+        with self._begin() as connection:
+            if connection.execute(delete).rowcount == 0:
+                raise JobLookupError(job_id)
+
+class CatchUpLimiter:
+    """
+    Submits late cron fires at a bounded rate.
+
+    After downtime or a leader change every job with missed fires is due at
+    once. Late fires wait here and go out oldest first, at most `rate` per
+    second once a burst of `burst` has been spent, so the recovered node
+    does not start them all together. On-time fires never wait behind them.
+    """
+    def __init__(self, rate: float = SCHEDULE_CATCHUP_RATE, burst: int = SCHEDULE_CATCHUP_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.pending = deque()
+        self.thread = None
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+
+    def submit(self, fire: Callable[[], None]):
+        """Run fire now if the rate allows, else once it is its turn"""
+        if not self.rate:
+            fire()
+            return
+        with self.lock:
+            if self.stopping:
+                return
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="scheduler-catch-up", daemon=True)
+                self.thread.start()
+            self.pending.append(fire)
+            self.available.notify()
+
+    def stop(self):
+        """Drop the fires still waiting"""
+        with self.lock:
+            self.stopping = True
+            dropped = len(self.pending)
+            self.pending.clear()
+            self.available.notify_all()
+        if dropped:
+            logger.warning(f"Dropped {dropped} late cron fires waiting for catch-up")
+
+    def _run(self):
+        """Release waiting fires as tokens become available"""
+        while True:
+            with self.lock:
+                while not self.pending and not self.stopping:
+                    self.available.wait()
+                if self.stopping:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens < 1:
+                    self.available.wait((1 - self.tokens) / self.rate)
+                    continue
+                self.tokens -= 1
+                fire = self.pending.popleft()
+            try:
+                fire()
+            except Exception as e:
+                logger.error(f"Error submitting late cron fire: {str(e)}")
+
+class ScheduledFireExecutor(BaseExecutor):
+    """
+    APScheduler executor applying the scripts' misfire policies.
+
+    The scheduler hands over all due fire times of a job at once, so after
+    downtime this sees every missed fire and can run, merge or drop them.
+    Fires only queue runs, so on-time ones are handled on the scheduler
+    thread; late ones go through the catch-up limiter. Other jobs run
+    directly, as with APScheduler's debug executor.
+    """
+    def __init__(self, catch_up: CatchUpLimiter, grace_seconds: float = SCHEDULE_MISFIRE_GRACE_SECONDS):
+        super().__init__()
+        self.catch_up = catch_up
+        self.grace_seconds = grace_seconds
+
+    def _do_submit_job(self, job, run_times):
+        try:
+            if job.func is execute_scheduled_script:
+                self._fire(job, run_times)
+                events = []
+            else:
+                events = run_job(job, job._jobstore_alias, run_times, self._logger.name)
+        except BaseException:
+            self._run_job_error(job.id, *sys.exc_info()[1:])
+        else:
+            self._run_job_success(job.id, events)
+
+    def _fire(self, job, run_times: list):
+        """Apply the misfire policy to a job's due fire times and submit the rest"""
+        script_name, project_name = job.args[:2]
+        policy = job.kwargs.get("misfire_policy") or SCHEDULE_MISFIRE_POLICY
+        now = datetime.now(timezone.utc)
+        scheduler_fires_total.labels(project=project_name).inc(len(run_times))
+
+        # Fire times are in order, so the late ones come first
+        late = sum(1 for run_time in run_times if (now - run_time).total_seconds() > self.grace_seconds)
+        if policy == "skip" and late:
+            scheduler_fires_skipped_total.labels(project=project_name, reason="misfire").inc(late)
+            logger.warning(f"Skipped {late} missed fires of {job.name}")
+            run_times = run_times[late:]
+            late = 0
+        elif policy == "coalesce" and len(run_times) > 1:
+            scheduler_fires_coalesced_total.labels(project=project_name).inc(len(run_times) - 1)
+            logger.info(f"Coalesced {len(run_times)} fires of {job.name} into one")
+            late = 1 if late == len(run_times) else 0
+            run_times = run_times[-1:]
+
+        for index, run_time in enumerate(run_times):
+            fire = partial(
+                execute_scheduled_script, script_name, project_name,
+                scheduled_at=run_time.timestamp(), **job.kwargs
+            )
+            try:
+                if index < late:
+                    self.catch_up.submit(fire)
+                else:
+                    fire()
+            except Exception as e:
+                logger.error(f"Error submitting fire of {job.name}: {str(e)}")
 
 class ScriptScheduler:
+    """
+    Cron scheduler shared by every API process.
+
+    All processes keep a paused APScheduler on the shared jobstore, so any
+    of them can add or change jobs, but only the elected leader resumes its
+    scheduler and fires jobs. When the leader dies another process takes
+    over within SCRIPTS_STORE_SCHEDULER_LEASE_SECONDS.
+
+    Each script's overlap and misfire policies travel in its job's kwargs;
+    without them the SCRIPTS_STORE_SCHEDULE_*_POLICY defaults apply.
+    """
     def __init__(self):
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.add_jobstore('sqlalchemy', url='sqlite:///jobs.sqlite')
+        self.catch_up = CatchUpLimiter()
+        self.scheduler = BackgroundScheduler(executors={"default": ScheduledFireExecutor(self.catch_up)})
+        # Jobs live in the application database and share its engine and pool
+        self.jobstore = BatchingJobStore(engine=engine)
+        self.scheduler.add_jobstore(self.jobstore)
+        self.elector = LeaderElector(
+            "scheduler",
+            on_elected=self._on_elected,
+            on_demoted=self._on_demoted,
+            # Pick up jobs other processes added to the shared jobstore
+            on_heartbeat=self.scheduler.wakeup
+        )
+
+    @property
+    def is_leader(self) -> bool:
+        return self.elector.is_leader
 
     def start(self):
-        """Start the scheduler and restore any existing jobs"""
+        """Start the scheduler in standby and compete for leadership"""
         if not self.scheduler.running:
-            self.scheduler.start()
-            self._restore_jobs()
-            logger.info("Scheduler started and jobs restored")
+            self.scheduler.start(paused=True)
+            self.elector.start()
+            logger.info(f"Scheduler started (leader: {self.is_leader})")
 
     def stop(self):
-        """Stop the scheduler"""
+        """Stop the scheduler and hand over leadership"""
         if self.scheduler.running:
+            self.elector.stop()
             self.scheduler.shutdown()
+            self.catch_up.stop()
             logger.info("Scheduler stopped")
 
-    def schedule_script(self, script_name: str, project_name: str, cron_expression: str):
-        """Schedule a script to run on a cron schedule"""
-        try:
-            job_id = f"{project_name}_{script_name}"
+    def status(self) -> dict:
+        """Leadership and job counts of this process"""
+        return {
+            "running": self.scheduler.running,
+            "leader": self.is_leader,
+            "holder": self.elector.holder,
+            "lease": self.elector.current(),
+            "catch_up_pending": len(self.catch_up.pending)
+        }
+
+    def _on_elected(self):
+        """Restore jobs and start firing them"""
+        started = time.monotonic()
+        self._restore_jobs()
+        scheduler_restore_seconds.set(time.monotonic() - started)
+        self.scheduler.resume()
+        scheduler_leader.set(1)
+        logger.info("Scheduler elected leader; jobs restored and resumed")
 
-            # Remove existing job if it exists
-            if job_id in [job.id for job in self.scheduler.get_jobs()]:
-                self.scheduler.remove_job(job_id)
+    def _on_demoted(self):
+        """Stop firing jobs; another process is leader now"""
+        self.scheduler.pause()
+        scheduler_leader.set(0)
+        logger.info("Scheduler lost leadership; paused")
 
-            # Add new job using the global function
-            trigger = CronTrigger.from_crontab(cron_expression)
-            
+    def schedule_script(self, script_name: str, project_name: str, cron_expression: str,
+                        overlap_policy: str = None, misfire_policy: str = None):
+        """Schedule a script to run on a cron schedule"""
+        try:
+            # replace_existing overwrites a job with the same ID in a single
+            # jobstore lookup, no need to scan all jobs first
             self.scheduler.add_job(
                 execute_scheduled_script,  # Using the global function
-                trigger=trigger,
+                trigger=CronTrigger.from_crontab(cron_expression),
                 args=[script_name, project_name],
-                id=job_id,
+                kwargs=self.job_kwargs(overlap_policy, misfire_policy),
+                id=self.job_id(script_name, project_name),
                 name=f"{project_name} - {script_name}",
                 replace_existing=True,
-                misfire_grace_time=None  # Allow misfired jobs to run immediately
+                # Every due fire reaches ScheduledFireExecutor, which applies the misfire policy
+                coalesce=False,
+                misfire_grace_time=None
             )
 
             logger.info(f"Scheduled script {script_name} with cron: {cron_expression}")
@@ -65,32 +357,109 @@ class ScriptScheduler:
             logger.error(f"Error scheduling script: {str(e)}")
             raise
 
+    @staticmethod
+    def job_kwargs(overlap_policy: str = None, misfire_policy: str = None) -> dict:
+        """Job kwargs carrying a script's own fire policies"""
+        kwargs = {}
+        if overlap_policy:
+            kwargs["overlap_policy"] = overlap_policy
+        if misfire_policy:
+            kwargs["misfire_policy"] = misfire_policy
+        return kwargs
+
+    @staticmethod
+    def job_id(script_name: str, project_name: str) -> str:
+        """Jobstore ID of a script's cron job"""
+        return f"{project_name}_{script_name}"
+
     def _restore_jobs(self):
-        """Restore scheduled jobs from the database"""
+        """
+        Reconcile the jobstore with the scheduled scripts in the database.
+        Both sides are loaded once and indexed by job ID; only jobs that are
+        missing, changed or no longer scheduled are written, in batches.
+        """
         db = SessionLocal()
         try:
             # Get all active scripts with cron expressions
-            active_scripts = db.query(Script).filter(
+            active_scripts = db.query(
+                Script.script_name,
+                Script.project_name,
+                Script.cron_expression,
+                Script.overlap_policy,
+                Script.misfire_policy
+            ).filter(
                 Script.is_active == True,
                 Script.cron_expression.isnot(None)
             ).all()
-
-            for script in active_scripts:
-                try:
-                    self.schedule_script(
-                        script.script_name,
-                        script.project_name,
-                        script.cron_expression
-                    )
-                except Exception as e:
-                    logger.error(f"Error restoring job for {script.script_name}: {str(e)}")
-
-            logger.info(f"Restored {len(active_scripts)} scheduled jobs")
-
         except Exception as e:
             logger.error(f"Error restoring jobs: {str(e)}")
+            return
         finally:
             db.close()
 
+        # One jobstore read, indexed by job ID
+        existing = {job.id: job for job in self.scheduler.get_jobs()}
+        desired = set()
+        added = []
+        updated = []
+        triggers = {}
+
+        for script in active_scripts:
+            job_id = self.job_id(script.script_name, script.project_name)
+            desired.add(job_id)
+            try:
+                if script.cron_expression not in triggers:
+                    triggers[script.cron_expression] = CronTrigger.from_crontab(script.cron_expression)
+            except Exception as e:
+                logger.error(f"Invalid cron expression for {script.script_name}: {str(e)}")
+                continue
+
+            job = existing.get(job_id)
+            if job is None:
+                added.append(script)
+            elif (
+                str(job.trigger) != str(triggers[script.cron_expression])
+                or list(job.args) != [script.script_name, script.project_name]
+                or job.kwargs != self.job_kwargs(script.overlap_policy, script.misfire_policy)
+            ):
+                updated.append(script)
+
+        stale = [
+            job_id for job_id, job in existing.items()
+            if job_id not in desired and job.func is execute_scheduled_script
+        ]
+
+        changes = [("add", script) for script in added] + \
+                  [("update", script) for script in updated] + \
+                  [("remove", job_id) for job_id in stale]
+        for start in range(0, len(changes), RESTORE_BATCH_SIZE):
+            with self.jobstore.batch():
+                for action, item in changes[start:start + RESTORE_BATCH_SIZE]:
+                    try:
+                        if action == "add":
+                            self.schedule_script(
+                                item.script_name, item.project_name, item.cron_expression,
+                                item.overlap_policy, item.misfire_policy
+                            )
+                        elif action == "update":
+                            # One write: reads inside the batch do not see its earlier writes
+                            trigger = triggers[item.cron_expression]
+                            self.scheduler.modify_job(
+                                self.job_id(item.script_name, item.project_name),
+                                args=[item.script_name, item.project_name],
+                                kwargs=self.job_kwargs(item.overlap_policy, item.misfire_policy),
+                                trigger=trigger,
+                                next_run_time=trigger.get_next_fire_time(None, datetime.now(self.scheduler.timezone))
+                            )
+                        else:
+                            self.scheduler.remove_job(item)
+                    except Exception as e:
+                        logger.error(f"Error restoring job {action} for {item}: {str(e)}")
+
+        logger.info(
+            f"Restored {len(active_scripts)} scheduled jobs: "
+            f"{len(added)} added, {len(updated)} updated, {len(stale)} removed"
+        )
+
 # Create global scheduler instance
 scheduler = ScriptScheduler()
\ No newline at end of file
@@ -0,0 +1,110 @@
+# src/static/validation_cache.py
+import hashlib
+import os
+import subprocess
+from datetime import datetime
+from typing import Optional
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from src.database.db import SessionLocal
+from src.service.models.db_model import ValidationResult
+from src.utils.settings import ENV_PYTHON, VALIDATION_CACHE_ENABLED
+
+class ValidationCache:
+    """
+    Results of successful package validations keyed by the content of the
+    package tree and the Python version the environment is built with.
+
+    Re-uploading byte-identical package contents (CI retries, promotion to
+    another environment) finds the earlier result and skips dependency
+    installation and tests. Failures are not cached, so a flaky install or
+    test is always retried.
+    """
+    # Written by test runs inside the package; not part of its content
+    IGNORED_NAMES = {'__pycache__', '.pytest_cache', '.venv', '.mypy_cache'}
+
+    def __init__(self, python: str = ENV_PYTHON, enabled: bool = VALIDATION_CACHE_ENABLED):
+        self.python = python
+        self.enabled = enabled
+        self._python_version = None
+        self.log = logger.bind(log_type="validate")
+
+    def python_version(self) -> str:
+        """Full version of the interpreter environments are built with, resolved once"""
+        if self._python_version is None:
+            result = subprocess.run(
+                [self.python, '-c', 'import sys; print(sys.version.split()[0])'],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            self._python_version = result.stdout.strip()
+        return self._python_version
+
+    def tree_hash(self, path: str) -> str:
+        """
+        Deterministic hash of a package tree: relative paths in sorted order,
+        executable bits and file contents. Timestamps and ownership are ignored.
+        """
+        digest = hashlib.sha256()
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(name for name in dirnames if name not in self.IGNORED_NAMES)
+            for file_name in sorted(filenames):
+                if file_name.endswith('.pyc'):
+                    continue
+                file_path = os.path.join(dirpath, file_name)
+                rel_path = os.path.relpath(file_path, path).replace(os.sep, '/')
+                executable = os.access(file_path, os.X_OK)
+                digest.update(f"{rel_path}\0{int(executable)}\0{os.path.getsize(file_path)}\0".encode())
+                with open(file_path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, content_hash: str) -> Optional[dict]:
+        """Cached validation result for a package tree hash, if any"""
+        if not self.enabled:
+            return None
+        db = SessionLocal()
+        try:
+            row = db.query(ValidationResult).filter(
+                ValidationResult.content_hash == content_hash,
+                ValidationResult.python_version == self.python_version()
+            ).first()
+            if row is None:
+                return None
+            row.last_used_at = datetime.utcnow()
+            row.hits = (row.hits or 0) + 1
+            db.commit()
+            return {"message": row.message, "test_output": row.test_output}
+        finally:
+            db.close()
+
+    def put(self, content_hash: str, message: str, test_output: str = None):
+        """Remember a successful validation"""
+        if not self.enabled:
+            return
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.add(ValidationResult(
+                content_hash=content_hash,
+                python_version=self.python_version(),
+                message=message,
+                test_output=test_output,
+                created_at=now,
+                last_used_at=now,
+                hits=0
+            ))
+            db.commit()
+        except IntegrityError:
+            # Validated concurrently by another deployment
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            self.log.error(f"Error caching validation result: {str(e)}")
+        finally:
+            db.close()
+
+# Create global validation cache instance
+validation_cache = ValidationCache()
@@ -0,0 +1,78 @@
+# src/static/versions.py
+import os
+import shutil
+import time
+from datetime import datetime
+from loguru import logger
+from src.utils.settings import SCRIPTS_STORE_PATH
+
+class VersionStore:
+    """
+    On-disk versions of script packages.
+
+    Every deployed package gets its own directory:
+        {root}/{project}/.versions/{script}/{timestamp}-{hash}
+    and the live path {root}/{project}/{script} is a symlink to the active
+    one. Switching versions replaces the symlink with a rename, so runs
+    always see either the old or the new version in full, and a version
+    that fails validation never touches the live path.
+    """
+    VERSIONS_DIR = '.versions'
+
+    def __init__(self, root: str = SCRIPTS_STORE_PATH):
+        self.root = root
+        self.log = logger.bind(log_type="validate")
+
+    def live_path(self, project_name: str, script_name: str) -> str:
+        """Path scripts are run from; a symlink to the active version"""
+        return os.path.join(self.root, project_name, script_name)
+
+    def versions_path(self, project_name: str, script_name: str) -> str:
+        """Directory holding every deployed version of a script"""
+        return os.path.join(self.root, project_name, self.VERSIONS_DIR, script_name)
+
+    def resolve(self, project_name: str, script_name: str) -> str:
+        """Directory of the active version, so a run keeps using it across a switch"""
+        return os.path.realpath(self.live_path(project_name, script_name))
+
+    def add(self, project_name: str, script_name: str, staging_dir: str, package_hash: str) -> str:
+        """Move an extracted package into a new version directory and return its path"""
+        name = f"{datetime.utcnow():%Y%m%d%H%M%S%f}-{package_hash[:12]}"
+        version_path = os.path.join(self.versions_path(project_name, script_name), name)
+        os.rename(staging_dir, version_path)
+        return version_path
+
+    def remove(self, version_path: str):
+        """Delete a version directory"""
+        shutil.rmtree(version_path, ignore_errors=True)
+
+    def adopt_legacy(self, project_name: str, script_name: str) -> str:
+        """
+        Move a live directory deployed before versioning into the versions
+        directory and return its new path, or None if there is none.
+        """
+        live_path = self.live_path(project_name, script_name)
+        if os.path.islink(live_path) or not os.path.isdir(live_path):
+            return None
+        legacy_path = os.path.join(
+            self.versions_path(project_name, script_name), f"legacy-{int(time.time())}"
+        )
+        os.makedirs(os.path.dirname(legacy_path), exist_ok=True)
+        os.rename(live_path, legacy_path)
+        os.symlink(legacy_path, live_path)
+        self.log.info(f"Moved unversioned {project_name}/{script_name} to {legacy_path}")
+        return legacy_path
+
+    def activate(self, project_name: str, script_name: str, version_path: str):
+        """Atomically point the live path at a version directory"""
+        live_path = self.live_path(project_name, script_name)
+        self.adopt_legacy(project_name, script_name)
+        tmp_link = f"{live_path}.{os.getpid()}.tmp"
+        if os.path.lexists(tmp_link):
+            os.unlink(tmp_link)
+        os.symlink(version_path, tmp_link)
+        os.replace(tmp_link, live_path)
+        self.log.info(f"Activated {project_name}/{script_name} at {version_path}")
+
+# Create global version store instance
+version_store = VersionStore()
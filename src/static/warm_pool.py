@@ -0,0 +1,299 @@
+# src/static/warm_pool.py
+import json
+import os
+import select
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from loguru import logger
+from src.utils import fork_server
+from src.utils.settings import WARM_POOL_IDLE_SECONDS, WARM_POOL_MAX_SERVERS, WARM_POOL_START_TIMEOUT
+
+class WarmPoolError(Exception):
+    """A warm interpreter could not be started or did not accept a run"""
+
+class WarmProcess:
+    """
+    A script process forked by a fork server. Mirrors the parts of
+    subprocess.Popen the package manager uses; the exit status and resource
+    usage come from the server, which is the process's parent.
+    """
+    def __init__(self, conn: socket.socket, reader, pid: int, stdout, stderr, on_exit):
+        self.conn = conn
+        self.reader = reader
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.on_exit = on_exit
+
+    def wait4(self) -> tuple:
+        """Block until the process exits; same result shape as os.wait4"""
+        try:
+            line = self.reader.readline()
+        finally:
+            self.reader.close()
+            self.conn.close()
+            self.on_exit()
+        if not line:
+            raise WarmPoolError("Fork server exited while the run was in progress")
+        message = json.loads(line)
+        return message["pid"], message["status"], SimpleNamespace(**message["rusage"])
+
+class ForkServer:
+    """A pre-started interpreter of one virtualenv with some modules imported"""
+    def __init__(self, interpreter: str, modules: tuple, socket_path: str):
+        self.interpreter = interpreter
+        self.modules = modules
+        self.socket_path = socket_path
+        self.process = None
+        self.interpreter_stat = None
+        self.failed = {}
+        self.active = 0
+        self.retired = False
+        self.runs = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def start(self, env: dict):
+        """Start the server and wait until its modules are imported"""
+        self.interpreter_stat = self._stat()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.process = subprocess.Popen(
+            [self.interpreter, fork_server.__file__, self.socket_path, *self.modules],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True
+        )
+        ready, _, _ = select.select([self.process.stdout], [], [], WARM_POOL_START_TIMEOUT)
+        line = self.process.stdout.readline() if ready else b''
+        self.process.stdout.close()
+        if not line:
+            self.stop()
+            raise WarmPoolError(f"Fork server for {self.interpreter} did not start")
+        self.failed = json.loads(line)["failed"]
+
+    def is_current(self) -> bool:
+        """Still running, and its virtualenv was not rebuilt since it started"""
+        return self.process.poll() is None and self._stat() == self.interpreter_stat
+
+    def spawn(self, env: dict, cwd: str, argv: list, rlimits: dict = None) -> WarmProcess:
+        """Fork a script process with fresh stdout/stderr pipes and the given resource limits"""
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # One reader for the whole exchange; the exit report may follow the pid at once
+        reader = conn.makefile('rb')
+        try:
+            conn.connect(self.socket_path)
+            request = json.dumps(
+                {"argv": argv, "cwd": cwd, "env": env, "rlimits": rlimits or {}}
+            ).encode() + b"\n"
+            sent = socket.send_fds(conn, [request], [stdout_write, stderr_write])
+            conn.sendall(request[sent:])
+            line = reader.readline()
+            if not line:
+                raise WarmPoolError("connection closed")
+            message = json.loads(line)
+            if "pid" not in message:
+                raise WarmPoolError(message.get("error", "run rejected"))
+        except (OSError, ValueError, WarmPoolError) as e:
+            reader.close()
+            conn.close()
+            os.close(stdout_read)
+            os.close(stderr_read)
+            raise WarmPoolError(f"Fork server unavailable: {str(e)}")
+        finally:
+            # The child holds the write ends now; output ends when it exits
+            os.close(stdout_write)
+            os.close(stderr_write)
+
+        with self.lock:
+            self.active += 1
+            self.runs += 1
+            self.last_used = time.monotonic()
+        return WarmProcess(
+            conn, reader, message["pid"],
+            os.fdopen(stdout_read, 'rb'), os.fdopen(stderr_read, 'rb'),
+            self._finished
+        )
+
+    def retire(self):
+        """Stop the server once the runs it forked have finished"""
+        with self.lock:
+            self.retired = True
+            idle = self.active == 0
+        if idle:
+            self.stop()
+
+    def stop(self):
+        """Stop the server; runs it forked keep running but their exit status is lost"""
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _finished(self):
+        with self.lock:
+            self.active -= 1
+            self.last_used = time.monotonic()
+            idle = self.retired and self.active == 0
+        if idle:
+            self.stop()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.interpreter)
+            return stat.st_ino, stat.st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+class WarmPool:
+    """
+    Pre-started interpreters for scripts that opt into warm starts.
+
+    One fork server per (virtualenv, preloaded modules) keeps the script's
+    heavy imports loaded; each run is a fork of it, so runs skip interpreter
+    startup and those imports but still get their own process, session,
+    pipes, working directory, environment, argv and resource limits. Nothing
+    a run does reaches the server or later runs. Servers idle for
+    WARM_POOL_IDLE_SECONDS are stopped, and the least recently used is
+    stopped when more than WARM_POOL_MAX_SERVERS are running.
+    """
+    def __init__(self, idle_seconds: int = WARM_POOL_IDLE_SECONDS, max_servers: int = WARM_POOL_MAX_SERVERS):
+        self.idle_seconds = idle_seconds
+        self.max_servers = max_servers
+        self.servers = {}
+        # key -> lock held while that key's server starts
+        self.start_locks = {}
+        self.socket_dir = None
+        self.reaper = None
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.log = logger.bind(log_type="execute")
+
+    def spawn(self, interpreter: str, modules: list, env: dict, cwd: str, argv: list,
+              rlimits: dict = None) -> WarmProcess:
+        """Run argv in a fork of the warm interpreter for this environment and module set"""
+        key = (interpreter, tuple(modules))
+        server = self._server(key, env)
+        try:
+            return server.spawn(env, cwd, argv, rlimits)
+        except WarmPoolError as e:
+            # A server that died since its last run is restarted once
+            self.log.warning(f"Restarting fork server for {interpreter}: {str(e)}")
+            self._stop(key, server)
+            return self._server(key, env).spawn(env, cwd, argv, rlimits)
+
+    def stats(self) -> dict:
+        """Running servers with their activity"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                "servers": [
+                    {
+                        "interpreter": interpreter,
+                        "modules": list(modules),
+                        "pid": server.process.pid,
+                        "active_runs": server.active,
+                        "runs": server.runs,
+                        "idle_seconds": now - server.last_used,
+                        "failed_imports": server.failed
+                    }
+                    for (interpreter, modules), server in self.servers.items()
+                ]
+            }
+
+    def shutdown(self):
+        """Stop every server"""
+        self.stopping.set()
+        with self.lock:
+            servers = list(self.servers.values())
+            self.servers.clear()
+        for server in servers:
+            server.stop()
+        if self.socket_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+    def _server(self, key: tuple, env: dict) -> ForkServer:
+        """Running, up-to-date server for a key, started if needed"""
+        with self.lock:
+            if self.stopping.is_set():
+                raise WarmPoolError("Warm pool is shut down")
+            server = self.servers.get(key)
+            if server is not None and server.is_current():
+                return server
+            key_lock = self.start_locks.setdefault(key, threading.Lock())
+
+        # Only runs of the same key wait while its server imports its modules
+        with key_lock:
+            with self.lock:
+                server = self.servers.get(key)
+                if server is not None and server.is_current():
+                    return server
+                if self.socket_dir is None:
+                    # Unix socket paths are short; environment paths may not be
+                    self.socket_dir = tempfile.mkdtemp(prefix="scripts-store-warm-")
+                if self.reaper is None:
+                    self.reaper = threading.Thread(target=self._reap, name="warm-pool-reaper", daemon=True)
+                    self.reaper.start()
+                stale = self.servers.pop(key, None)
+                evicted = []
+                while self.max_servers and len(self.servers) >= self.max_servers:
+                    idle = [item for item in self.servers.items() if item[1].active == 0]
+                    if not idle:
+                        break
+                    oldest = min(idle, key=lambda item: item[1].last_used)[0]
+                    evicted.append(self.servers.pop(oldest))
+                server = ForkServer(
+                    key[0], key[1], os.path.join(self.socket_dir, f"{len(self.servers)}-{time.monotonic_ns()}.sock")
+                )
+
+            for old in ([stale] if stale else []) + evicted:
+                old.retire()
+            server.start(env)
+            with self.lock:
+                if self.stopping.is_set():
+                    server.stop()
+                    raise WarmPoolError("Warm pool is shut down")
+                self.servers[key] = server
+
+        if server.failed:
+            self.log.warning(f"Fork server for {key[0]} could not preload: {server.failed}")
+        self.log.info(f"Started fork server {server.process.pid} for {key[0]} with {list(key[1])}")
+        return server
+
+    def _stop(self, key: tuple, server: ForkServer):
+        with self.lock:
+            if self.servers.get(key) is server:
+                del self.servers[key]
+        server.retire()
+
+    def _reap(self):
+        """Stop servers that have been idle for too long"""
+        interval = max(1.0, min(self.idle_seconds / 4, 30.0))
+        while not self.stopping.wait(interval):
+            now = time.monotonic()
+            with self.lock:
+                idle = [
+                    (key, server) for key, server in self.servers.items()
+                    if server.active == 0 and now - server.last_used > self.idle_seconds
+                ]
+            for key, server in idle:
+                self.log.info(f"Stopping idle fork server {server.process.pid} for {key[0]}")
+                self._stop(key, server)
+
+# Create global warm pool instance
+warm_pool = WarmPool()
@@ -0,0 +1,101 @@
+# src/utils/archive.py
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+import zipfile
+from typing import BinaryIO
+from src.utils.settings import (
+    UPLOAD_MAX_BYTES, UPLOAD_MAX_UNCOMPRESSED_BYTES, UPLOAD_MAX_FILES, UPLOAD_MAX_COMPRESSION_RATIO
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+class ArchiveError(Exception):
+    """Raised when an uploaded archive is malformed or exceeds the upload limits"""
+
+def hash_stream(fileobj: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES) -> tuple:
+    """
+    Hash a seekable upload in one sequential pass, enforcing the size limit.
+    Returns the sha256 hex digest and the size, and rewinds the stream.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise ArchiveError(f"Upload exceeds {max_bytes} bytes")
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+def _member_path(root: str, info: zipfile.ZipInfo) -> str:
+    """Resolve an archive member under root, rejecting anything that escapes it"""
+    name = info.filename.replace('\\', '/')
+    if name.startswith('/') or (len(name) > 1 and name[1] == ':'):
+        raise ArchiveError(f"Absolute path in archive: {info.filename}")
+    target = os.path.realpath(os.path.join(root, name))
+    if target != root and not target.startswith(root + os.sep):
+        raise ArchiveError(f"Path escapes the package directory: {info.filename}")
+    return target
+
+def extract_archive(fileobj: BinaryIO, staging_parent: str,
+                    max_uncompressed_bytes: int = UPLOAD_MAX_UNCOMPRESSED_BYTES,
+                    max_files: int = UPLOAD_MAX_FILES,
+                    max_ratio: int = UPLOAD_MAX_COMPRESSION_RATIO) -> str:
+    """
+    Extract a zip read straight from the upload stream into a new staging
+    directory under staging_parent and return its path.
+
+    Limits are enforced on the bytes actually decompressed, not on the sizes
+    the archive declares. Symlinks, device files and paths outside the
+    staging directory are rejected. The staging directory is removed if
+    extraction fails.
+    """
+    staging_dir = os.path.realpath(tempfile.mkdtemp(dir=staging_parent, prefix='.upload-'))
+    try:
+        try:
+            archive = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"Invalid zip file: {str(e)}")
+
+        with archive:
+            members = archive.infolist()
+            if max_files and len(members) > max_files:
+                raise ArchiveError(f"Archive has {len(members)} entries, limit is {max_files}")
+
+            total = 0
+            for info in members:
+                mode = info.external_attr >> 16
+                if stat.S_IFMT(mode) and not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+                    raise ArchiveError(f"Unsupported entry type in archive: {info.filename}")
+
+                target = _member_path(staging_dir, info)
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                written = 0
+                with archive.open(info) as source, open(target, 'wb') as dest:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        written += len(chunk)
+                        total += len(chunk)
+                        if max_uncompressed_bytes and total > max_uncompressed_bytes:
+                            raise ArchiveError(
+                                f"Archive expands beyond {max_uncompressed_bytes} bytes"
+                            )
+                        if max_ratio and written > max_ratio * max(info.compress_size, 1) \
+                                and written > CHUNK_SIZE:
+                            raise ArchiveError(
+                                f"Compression ratio of {info.filename} exceeds {max_ratio}"
+                            )
+                        dest.write(chunk)
+                if mode:
+                    os.chmod(target, stat.S_IMODE(mode) & 0o755 | 0o600)
+        return staging_dir
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
@@ -0,0 +1,200 @@
+# src/utils/fork_server.py
+"""
+Fork server for warm-started script runs.
+
+Runs inside a script virtualenv, started by the warm pool as
+    python fork_server.py SOCKET_PATH [MODULE ...]
+It imports the given modules once, then forks a child per run request on
+SOCKET_PATH. The child starts a new session, takes the run's stdout and
+stderr pipes, working directory, environment, argv and resource limits, and
+runs main.py as __main__, then exits like a fresh interpreter would. When it
+exits the server kills whatever it left running in its process group, reaps it
+and reports its exit status and resource usage on the request's connection.
+
+Standard library only: this file is executed by the script's interpreter,
+not imported by the service.
+"""
+import io
+import json
+import os
+import resource
+import runpy
+import selectors
+import signal
+import socket
+import sys
+
+MAX_FDS = 2
+PARENT_CHECK_SECONDS = 1.0
+
+def apply_rlimits(rlimits: dict):
+    """
+    Set resource limits of the current process, given as
+    {"RLIMIT_AS": [soft, hard], ...}, capped at the existing hard limits.
+    Also used as the preexec_fn of runs started without the fork server.
+    """
+    for name, (soft, hard) in rlimits.items():
+        limit = getattr(resource, name)
+        _, current_hard = resource.getrlimit(limit)
+        if current_hard != resource.RLIM_INFINITY:
+            soft, hard = min(soft, current_hard), min(hard, current_hard)
+        resource.setrlimit(limit, (soft, hard))
+
+def _read_request(conn: socket.socket) -> tuple:
+    """Newline-terminated JSON request; the stdout and stderr fds arrive with the first chunk"""
+    data, fds, _, _ = socket.recv_fds(conn, 64 * 1024, MAX_FDS)
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(64 * 1024)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data), fds
+
+def _send(conn: socket.socket, message: dict):
+    try:
+        conn.sendall(json.dumps(message).encode() + b"\n")
+    except OSError:
+        pass
+
+def serve(listener: socket.socket):
+    """
+    Accept run requests and fork a child for each until the service that
+    started the server exits. Returns the request in the forked child.
+    """
+    parent = os.getppid()
+    wake_read, wake_write = os.pipe()
+    os.set_blocking(wake_read, False)
+    os.set_blocking(wake_write, False)
+    signal.set_wakeup_fd(wake_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wake_read, selectors.EVENT_READ)
+    children = {}
+
+    while os.getppid() == parent:
+        for key, _ in selector.select(PARENT_CHECK_SECONDS):
+            if key.fileobj is listener:
+                conn, _ = listener.accept()
+                try:
+                    request, fds = _read_request(conn)
+                except (OSError, ValueError) as e:
+                    _send(conn, {"error": f"Bad request: {e}"})
+                    conn.close()
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    # Child: drop the server's state and run the script
+                    signal.set_wakeup_fd(-1)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    selector.close()
+                    for fd in (wake_read, wake_write):
+                        os.close(fd)
+                    listener.close()
+                    conn.close()
+                    for other in children.values():
+                        other.close()
+                    request["fds"] = fds
+                    return request
+                for fd in fds:
+                    os.close(fd)
+                _send(conn, {"pid": pid})
+                children[pid] = conn
+            else:
+                try:
+                    while os.read(wake_read, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+
+        while children:
+            # Find an exited child without reaping it: its pid, and with it the
+            # process group, stays reserved while the leftovers are killed
+            try:
+                exited = os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+            except ChildProcessError:
+                break
+            if exited is None:
+                break
+            if exited.si_pid in children:
+                try:
+                    os.killpg(exited.si_pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+            pid, status, rusage = os.wait4(exited.si_pid, 0)
+            conn = children.pop(pid, None)
+            if conn is None:
+                continue
+            _send(conn, {
+                "pid": pid,
+                "status": status,
+                "rusage": {
+                    name: getattr(rusage, name)
+                    for name in ("ru_utime", "ru_stime", "ru_maxrss", "ru_inblock", "ru_oublock")
+                }
+            })
+            conn.close()
+    sys.exit(0)
+
+def run_child(request: dict):
+    """Become the script process described by a run request"""
+    os.setsid()
+    stdout_fd, stderr_fd = request["fds"]
+    stdin_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(stdin_fd, 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    # Like subprocess with close_fds: only stdio is inherited
+    os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    main_script = request["argv"][0]
+    sys.argv = list(request["argv"])
+    sys.path.insert(0, os.path.dirname(os.path.abspath(main_script)))
+
+    # Unbuffered text streams on the run's pipes, as with PYTHONUNBUFFERED
+    sys.stdin = io.TextIOWrapper(io.FileIO(0, "r", closefd=False))
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), write_through=True)
+    sys.stderr = io.TextIOWrapper(
+        io.FileIO(2, "w", closefd=False), write_through=True, errors="backslashreplace"
+    )
+    sys.__stdin__, sys.__stdout__, sys.__stderr__ = sys.stdin, sys.stdout, sys.stderr
+    # Limits apply before any script code runs, and to every process it starts
+    apply_rlimits(request.get("rlimits", {}))
+
+    # Exceptions and SystemExit propagate to the interpreter exactly as for `python main.py`
+    runpy.run_path(main_script, run_name="__main__")
+
+def main():
+    socket_path = sys.argv[1]
+    # This file's directory is not the script's; run_child puts main.py's directory first
+    sys.path.pop(0)
+
+    failed = {}
+    for module in sys.argv[2:]:
+        try:
+            __import__(module)
+        except Exception as e:
+            failed[module] = f"{type(e).__name__}: {e}"
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    listener.listen(64)
+
+    # Report readiness, then detach from the pipe the warm pool reads it from
+    sys.stdout.write(json.dumps({"pid": os.getpid(), "failed": failed}) + "\n")
+    sys.stdout.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    os.close(devnull)
+
+    request = serve(listener)
+    run_child(request)
+
+if __name__ == "__main__":
+    main()
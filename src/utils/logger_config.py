@@ -2,7 +2,8 @@
 from loguru import logger
 import sys
 import os
-from datetime import datetime
+from src.utils.run_log import run_log_writer
+from src.utils.settings import LOGS_PATH
 
 def setup_logging():
     # Remove default logger
@@ -10,7 +11,7 @@ def setup_logging():
     
     # Add executor logger
     logger.add(
-        "/opt/logs/executor.log",
+        f"{LOGS_PATH}/executor.log",
         filter=lambda record: record["extra"].get("log_type") == "execute",
         format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[log_type]}: {message}",
         rotation="1 day",
@@ -19,13 +20,20 @@ def setup_logging():
 
     # Add scheduler logger
     logger.add(
-        "/opt/logs/scheduler.log",
+        f"{LOGS_PATH}/scheduler.log",
         filter=lambda record: record["extra"].get("log_type") == "schedule",
         format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {extra[log_type]}: {message}",
         rotation="1 day",
         retention="7 days"
     )
 
+    # Add a single run logger; records bound with run_id are routed to that run's file
+    logger.add(
+        run_log_writer.sink,
+        filter=run_log_writer.accepts,
+        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}"
+    )
+
     # Add console logger for debugging
     if os.getenv("DEBUG", "false").lower() == "true":
         logger.add(
@@ -33,22 +41,3 @@ def setup_logging():
             format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}",
             level="DEBUG"
         )
-
-def get_run_logger(project_name: str, script_name: str) -> str:
-    """Create a log file for a specific script run"""
-    timestamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
-    log_dir = f"/opt/logs/scripts-store-logs/{project_name}/{script_name}"
-    os.makedirs(log_dir, exist_ok=True)
-    log_path = f"{log_dir}/run_{timestamp}.log"
-    
-    logger.add(
-        log_path,
-        filter=lambda record: (
-            record["extra"].get("log_type") == project_name and 
-            record["extra"].get("script_name") == script_name
-        ),
-        format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}",
-        rotation="100 MB"
-    )
-    
-    return log_path
\ No newline at end of file
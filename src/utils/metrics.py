@@ -0,0 +1,163 @@
+# src/utils/metrics.py
+"""
+Prometheus metrics of the service, kept with prometheus_client.
+
+With PROMETHEUS_MULTIPROC_DIR set (start_services.sh sets it), every process
+writes its values to files in that directory and any process answering a
+scrape reports the sum over all of them, so several uvicorn workers behind
+one port still expose one consistent set of metrics. The directory must be
+emptied before the processes start. Without it, values are per process.
+"""
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess, start_http_server
+)
+from prometheus_client.core import GaugeMetricFamily
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def _exposition_registry() -> CollectorRegistry:
+    """Registry scrapes are answered from: the aggregate of all processes, or this one"""
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+def render() -> bytes:
+    """Current metrics in the Prometheus text exposition format"""
+    return generate_latest(registry)
+
+def serve(port: int, host: str = "0.0.0.0"):
+    """
+    Serve the metrics at /metrics on a background thread, for processes
+    without the API's endpoint (workers)
+    """
+    return start_http_server(port, addr=host, registry=registry)
+
+def mark_process_dead(pid: int = None):
+    """Drop the live gauges of an exiting process from the shared directory"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+class QueueCollector:
+    """
+    Running and queued runs per project, read from the run manager at scrape
+    time. In queue mode the counts come from the database, so every process
+    reports the same global values and nothing is summed across processes.
+    """
+    def __init__(self, queue_stats):
+        self.queue_stats = queue_stats
+
+    def describe(self):
+        return self._families()
+
+    def collect(self):
+        running, queued = self._families()
+        for project_name, project in self.queue_stats()["projects"].items():
+            running.add_metric([project_name], project["running"])
+            queued.add_metric([project_name], project["queued"])
+        return [running, queued]
+
+    @staticmethod
+    def _families() -> list:
+        return [
+            GaugeMetricFamily(
+                "scripts_store_runs_running", "Script runs currently executing", labels=["project"]
+            ),
+            GaugeMetricFamily(
+                "scripts_store_runs_queued", "Script runs waiting for a worker", labels=["project"]
+            )
+        ]
+
+# Create global exposition registry instance
+registry = _exposition_registry()
+
+# Environments
+env_setup_seconds = Histogram(
+    "scripts_store_env_setup_seconds",
+    "Time to set up a script environment, by outcome (reused, built, failed)",
+    ("project", "outcome"),
+    buckets=HISTOGRAM_BUCKETS
+)
+env_setups_total = Counter(
+    "scripts_store_env_setups_total",
+    "Environment setups, by outcome (reused, built, failed)",
+    ("project", "outcome")
+)
+warm_starts_total = Counter(
+    "scripts_store_warm_starts_total",
+    "Runs of warm-start scripts, by outcome (forked, fallback to a fresh interpreter)",
+    ("project", "outcome")
+)
+
+# Runs
+run_duration_seconds = Histogram(
+    "scripts_store_run_duration_seconds",
+    "Wall-clock duration of script processes",
+    ("project", "status"),
+    buckets=HISTOGRAM_BUCKETS
+)
+runs_total = Counter(
+    "scripts_store_runs_total",
+    "Finished script runs, by trigger and status",
+    ("project", "trigger", "status")
+)
+
+# Scheduling
+schedule_lag_seconds = Histogram(
+    "scripts_store_schedule_lag_seconds",
+    "Time from a cron fire time to the start of the script process",
+    ("project",),
+    buckets=HISTOGRAM_BUCKETS
+)
+scheduler_fires_total = Counter(
+    "scripts_store_scheduler_fires_total",
+    "Cron jobs fired by the scheduler",
+    ("project",)
+)
+scheduler_fires_skipped_total = Counter(
+    "scripts_store_scheduler_fires_skipped_total",
+    "Cron fires dropped by the script's overlap or misfire policy, by reason",
+    ("project", "reason")
+)
+scheduler_fires_coalesced_total = Counter(
+    "scripts_store_scheduler_fires_coalesced_total",
+    "Missed cron fires merged into a later fire of the same job",
+    ("project",)
+)
+# Summed over live processes: 1 while exactly one of them is the leader
+scheduler_leader = Gauge(
+    "scripts_store_scheduler_leader",
+    "Number of processes that are scheduler leader and fire cron jobs",
+    multiprocess_mode="livesum"
+)
+scheduler_restore_seconds = Gauge(
+    "scripts_store_scheduler_restore_seconds",
+    "Duration of the last reconciliation of cron jobs with the database",
+    multiprocess_mode="livemostrecent"
+)
+
+# Deploys
+upload_seconds = Histogram(
+    "scripts_store_upload_seconds",
+    "Time to hash and extract an uploaded package",
+    buckets=HISTOGRAM_BUCKETS
+)
+deploy_stage_seconds = Histogram(
+    "scripts_store_deploy_stage_seconds",
+    "Duration of deployment pipeline stages, by stage and result",
+    ("stage", "status"),
+    buckets=HISTOGRAM_BUCKETS
+)
+deployments_total = Counter(
+    "scripts_store_deployments_total",
+    "Finished deployments, by status",
+    ("status",)
+)
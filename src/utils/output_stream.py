@@ -0,0 +1,62 @@
+# src/utils/output_stream.py
+import os
+import threading
+from collections import deque
+from typing import BinaryIO, Callable, Optional
+
+class RingBuffer:
+    """Keeps only the last max_bytes of a byte stream"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.size = 0
+        self.total = 0
+
+    def write(self, data: bytes):
+        self.chunks.append(data)
+        self.size += len(data)
+        self.total += len(data)
+        while self.size > self.max_bytes and self.chunks:
+            excess = self.size - self.max_bytes
+            head = self.chunks[0]
+            if len(head) <= excess:
+                self.chunks.popleft()
+                self.size -= len(head)
+            else:
+                self.chunks[0] = head[excess:]
+                self.size -= excess
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self.size
+
+    def getvalue(self) -> str:
+        """Buffered tail decoded as text, prefixed with a marker when truncated"""
+        text = b''.join(self.chunks).decode('utf-8', errors='replace')
+        if self.truncated:
+            return f"[... {self.total - self.size} bytes truncated ...]\n{text}"
+        return text
+
+class StreamPump(threading.Thread):
+    """
+    Copies a pipe chunk by chunk into a sink (usually the run log) while
+    keeping a bounded tail in memory.
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, pipe: BinaryIO, sink: Optional[Callable[[bytes], None]], tail_bytes: int):
+        super().__init__(daemon=True)
+        self.pipe = pipe
+        self.sink = sink
+        self.tail = RingBuffer(tail_bytes)
+
+    def run(self):
+        fd = self.pipe.fileno()
+        while True:
+            data = os.read(fd, self.CHUNK_SIZE)
+            if not data:
+                break
+            self.tail.write(data)
+            if self.sink is not None:
+                self.sink(data)
+        self.pipe.close()
@@ -0,0 +1,68 @@
+# src/utils/run_log.py
+import os
+import threading
+from datetime import datetime
+from typing import Optional, Union
+from src.utils.settings import RUN_LOGS_PATH
+
+class RunLogWriter:
+    """
+    Writes each script run to its own log file.
+
+    Open files are kept in a dict keyed by run ID, so routing a write or a
+    log record to its run is a single lookup regardless of how many runs
+    the process has served. Files are closed as soon as the run ends.
+    """
+    def __init__(self, root: str = RUN_LOGS_PATH):
+        self.root = root
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def open(self, run_id: str, project_name: str, script_name: str) -> str:
+        """Create the log file of a run and return its path"""
+        timestamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        log_dir = os.path.join(self.root, project_name, script_name)
+        os.makedirs(log_dir, exist_ok=True)
+        log_path = os.path.join(log_dir, f"run_{timestamp}_{run_id[:8]}.log")
+
+        log_file = open(log_path, 'ab')
+        with self.lock:
+            self.files[run_id] = (log_file, threading.Lock(), log_path)
+        return log_path
+
+    def write(self, run_id: str, data: Union[bytes, str]):
+        """Append data to the log of an open run"""
+        entry = self.files.get(run_id)
+        if entry is None:
+            return
+        log_file, file_lock, _ = entry
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with file_lock:
+            log_file.write(data)
+            log_file.flush()
+
+    def close(self, run_id: str):
+        """Close the log of a finished run"""
+        with self.lock:
+            entry = self.files.pop(run_id, None)
+        if entry is not None:
+            log_file, file_lock, _ = entry
+            with file_lock:
+                log_file.close()
+
+    def path(self, run_id: str) -> Optional[str]:
+        """Log path of an open run"""
+        entry = self.files.get(run_id)
+        return entry[2] if entry else None
+
+    def accepts(self, record) -> bool:
+        """Loguru filter: records bound to an open run"""
+        return record["extra"].get("run_id") in self.files
+
+    def sink(self, message):
+        """Loguru sink: route a formatted record to its run's log"""
+        self.write(message.record["extra"]["run_id"], str(message))
+
+# Create global run log writer instance
+run_log_writer = RunLogWriter()
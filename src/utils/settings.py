@@ -0,0 +1,172 @@
+# src/utils/settings.py
+import os
+
+# Maximum number of scripts executed concurrently by the run manager
+RUN_WORKERS = int(os.getenv("SCRIPTS_STORE_RUN_WORKERS", "4"))
+
+# Maximum concurrent runs per project (0 = only the global limit applies),
+# with per-project overrides as "project=limit,other=limit"
+PROJECT_RUN_QUOTA = int(os.getenv("SCRIPTS_STORE_PROJECT_RUN_QUOTA", "2"))
+PROJECT_RUN_QUOTAS = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.partition("=") for item in os.getenv("SCRIPTS_STORE_PROJECT_RUN_QUOTAS", "").split(",")
+    )
+    if name.strip() and limit.strip()
+}
+
+# Priority classes; lower runs first when workers are saturated
+RUN_PRIORITIES = {"manual": 0, "batch": 1, "cron": 2}
+
+# Number of finished runs kept in memory for status polling
+RUN_HISTORY_SIZE = int(os.getenv("SCRIPTS_STORE_RUN_HISTORY_SIZE", "1000"))
+
+# Root directory holding uploaded script packages
+SCRIPTS_STORE_PATH = os.getenv("SCRIPTS_STORE_PATH", "/opt/scripts-store")
+
+# Root directory of the shared virtualenv cache
+ENVS_PATH = os.getenv("SCRIPTS_STORE_ENVS_PATH", "/opt/scripts-store-envs")
+
+# Interpreter used to create script virtualenvs
+ENV_PYTHON = os.getenv("SCRIPTS_STORE_ENV_PYTHON", "python3")
+
+# Virtualenv cache limits; least recently used environments are evicted first (0 disables a limit).
+# The byte limit covers the environments and the package store's objects together.
+ENV_CACHE_MAX_ENVS = int(os.getenv("SCRIPTS_STORE_ENV_CACHE_MAX_ENVS", "50"))
+ENV_CACHE_MAX_BYTES = int(os.getenv("SCRIPTS_STORE_ENV_CACHE_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Content-addressed store of installed packages shared by cached environments.
+# Must be on the same filesystem as ENVS_PATH so files can be hardlinked.
+PACKAGE_STORE_ENABLED = os.getenv("SCRIPTS_STORE_PACKAGE_STORE", "true").lower() == "true"
+PACKAGE_STORE_PATH = os.getenv("SCRIPTS_STORE_PACKAGE_STORE_PATH", os.path.join(ENVS_PATH, ".store"))
+
+# Bytes of stdout/stderr kept in memory per run; the full output goes to the run log
+OUTPUT_TAIL_BYTES = int(os.getenv("SCRIPTS_STORE_OUTPUT_TAIL_BYTES", str(64 * 1024)))
+
+# Service log directory and per-run log directory
+LOGS_PATH = os.getenv("SCRIPTS_STORE_LOGS_PATH", "/opt/logs")
+RUN_LOGS_PATH = os.getenv("SCRIPTS_STORE_RUN_LOGS_PATH", os.path.join(LOGS_PATH, "scripts-store-logs"))
+
+# Run history rows are written in batches off the execution path
+RUN_RECORDER_BATCH_SIZE = int(os.getenv("SCRIPTS_STORE_RUN_RECORDER_BATCH_SIZE", "100"))
+RUN_RECORDER_FLUSH_SECONDS = float(os.getenv("SCRIPTS_STORE_RUN_RECORDER_FLUSH_SECONDS", "1.0"))
+# Retries of a failed batch write, waiting RETRY_SECONDS and doubling each time,
+# before the runs are written one by one
+RUN_RECORDER_RETRIES = int(os.getenv("SCRIPTS_STORE_RUN_RECORDER_RETRIES", "3"))
+RUN_RECORDER_RETRY_SECONDS = float(os.getenv("SCRIPTS_STORE_RUN_RECORDER_RETRY_SECONDS", "0.5"))
+
+# Database used by the API, the run history and the scheduler jobstore
+DATABASE_URL = os.getenv("SCRIPTS_STORE_DATABASE_URL", "sqlite:///./scripts.db")
+DB_POOL_SIZE = int(os.getenv("SCRIPTS_STORE_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("SCRIPTS_STORE_DB_MAX_OVERFLOW", "20"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SCRIPTS_STORE_SQLITE_BUSY_TIMEOUT_MS", "15000"))
+
+# Where runs execute: "local" (inside the API process) or "queue" (API enqueues,
+# worker processes started with `python -m src.worker` lease and execute them)
+EXECUTION_MODE = os.getenv("SCRIPTS_STORE_EXECUTION_MODE", "local")
+
+# Worker leases: a run whose lease is not renewed in time is picked up again
+WORKER_LEASE_SECONDS = int(os.getenv("SCRIPTS_STORE_WORKER_LEASE_SECONDS", "60"))
+WORKER_POLL_SECONDS = float(os.getenv("SCRIPTS_STORE_WORKER_POLL_SECONDS", "1.0"))
+WORKER_MAX_ATTEMPTS = int(os.getenv("SCRIPTS_STORE_WORKER_MAX_ATTEMPTS", "3"))
+# Port on which workers serve their Prometheus metrics at /metrics (0 = off);
+# workers sharing a host need --metrics-port to pick distinct ports
+WORKER_METRICS_PORT = int(os.getenv("SCRIPTS_STORE_WORKER_METRICS_PORT", "9101"))
+
+# Scheduler leader election: only the lease holder fires cron jobs. A dead
+# leader is replaced once its lease expires.
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCRIPTS_STORE_SCHEDULER_LEASE_SECONDS", "15"))
+
+# Number of jobstore writes grouped into one transaction when restoring jobs
+RESTORE_BATCH_SIZE = int(os.getenv("SCRIPTS_STORE_RESTORE_BATCH_SIZE", "500"))
+
+# Cron fire policies, overridable per script through the schedule endpoint.
+# Overlap, a fire while runs of the script are in flight: "allow" queues another
+# run, "skip" drops the fire if a run is queued or running, "queue_one" drops it
+# only if a run is already waiting. Misfires, fires handled more than
+# SCHEDULE_MISFIRE_GRACE_SECONDS late (e.g. after downtime): "run_all" runs each
+# of them, "coalesce" runs them once, "skip" drops them.
+OVERLAP_POLICIES = ("allow", "skip", "queue_one")
+MISFIRE_POLICIES = ("run_all", "coalesce", "skip")
+SCHEDULE_OVERLAP_POLICY = os.getenv("SCRIPTS_STORE_SCHEDULE_OVERLAP_POLICY", "queue_one")
+SCHEDULE_MISFIRE_POLICY = os.getenv("SCRIPTS_STORE_SCHEDULE_MISFIRE_POLICY", "coalesce")
+SCHEDULE_MISFIRE_GRACE_SECONDS = float(os.getenv("SCRIPTS_STORE_SCHEDULE_MISFIRE_GRACE_SECONDS", "60"))
+# Late fires are submitted at most SCHEDULE_CATCHUP_RATE per second once a burst
+# of SCHEDULE_CATCHUP_BURST has gone out, so a recovered node does not start
+# every missed job at once (0 = no limit)
+SCHEDULE_CATCHUP_RATE = float(os.getenv("SCRIPTS_STORE_SCHEDULE_CATCHUP_RATE", "2"))
+SCHEDULE_CATCHUP_BURST = int(os.getenv("SCRIPTS_STORE_SCHEDULE_CATCHUP_BURST", "20"))
+
+# Upload limits: compressed size, total uncompressed size, number of entries
+# and per-file compression ratio of uploaded packages (0 disables a limit)
+UPLOAD_MAX_BYTES = int(os.getenv("SCRIPTS_STORE_UPLOAD_MAX_BYTES", str(100 * 1024 ** 2)))
+UPLOAD_MAX_UNCOMPRESSED_BYTES = int(os.getenv("SCRIPTS_STORE_UPLOAD_MAX_UNCOMPRESSED_BYTES", str(500 * 1024 ** 2)))
+UPLOAD_MAX_FILES = int(os.getenv("SCRIPTS_STORE_UPLOAD_MAX_FILES", "10000"))
+UPLOAD_MAX_COMPRESSION_RATIO = int(os.getenv("SCRIPTS_STORE_UPLOAD_MAX_COMPRESSION_RATIO", "100"))
+
+# Number of deployment pipelines (validation and registration of uploads) run concurrently
+DEPLOY_WORKERS = int(os.getenv("SCRIPTS_STORE_DEPLOY_WORKERS", "2"))
+# A deployment still unfinished after this long no longer blocks new uploads of its script
+DEPLOY_STALE_SECONDS = int(os.getenv("SCRIPTS_STORE_DEPLOY_STALE_SECONDS", "3600"))
+
+# Reuse the result of an earlier successful validation of identical package contents
+VALIDATION_CACHE_ENABLED = os.getenv("SCRIPTS_STORE_VALIDATION_CACHE", "true").lower() == "true"
+
+# Number of deployed versions per script kept on disk for rollback (0 keeps all)
+SCRIPT_VERSIONS_KEEP = int(os.getenv("SCRIPTS_STORE_SCRIPT_VERSIONS_KEEP", "5"))
+
+# Background environment builds for newly registered versions and, at startup,
+# for all scheduled scripts; workers also rescan scheduled scripts periodically
+PREWARM_ENABLED = os.getenv("SCRIPTS_STORE_PREWARM", "true").lower() == "true"
+PREWARM_WORKERS = int(os.getenv("SCRIPTS_STORE_PREWARM_WORKERS", "2"))
+PREWARM_RESCAN_SECONDS = int(os.getenv("SCRIPTS_STORE_PREWARM_RESCAN_SECONDS", "300"))
+
+# Default per-run limits, overridable per script in the [tool.scripts-store]
+# section of its pyproject.toml (timeout_seconds, memory_mb, cpu_seconds; 0 = unlimited)
+RUN_TIMEOUT_SECONDS = float(os.getenv("SCRIPTS_STORE_RUN_TIMEOUT_SECONDS", "3600"))
+RUN_MEMORY_LIMIT_MB = float(os.getenv("SCRIPTS_STORE_RUN_MEMORY_LIMIT_MB", "0"))
+RUN_CPU_LIMIT_SECONDS = float(os.getenv("SCRIPTS_STORE_RUN_CPU_LIMIT_SECONDS", "0"))
+# Time a timed-out run gets to exit after SIGTERM before it is killed
+RUN_KILL_GRACE_SECONDS = float(os.getenv("SCRIPTS_STORE_RUN_KILL_GRACE_SECONDS", "10"))
+
+# Runs of a batch in flight at once: the default for batch requests and the
+# most a request may ask for; batches larger than BATCH_MAX_RUNS are rejected
+BATCH_MAX_PARALLEL = int(os.getenv("SCRIPTS_STORE_BATCH_MAX_PARALLEL", "4"))
+BATCH_MAX_RUNS = int(os.getenv("SCRIPTS_STORE_BATCH_MAX_RUNS", "500"))
+
+# Warm starts for scripts that set warm_start = true in [tool.scripts-store]:
+# runs fork from a pre-started interpreter per environment with the script's
+# preload modules imported. Idle interpreters are stopped after
+# WARM_POOL_IDLE_SECONDS, the least recently used beyond WARM_POOL_MAX_SERVERS.
+WARM_POOL_ENABLED = os.getenv("SCRIPTS_STORE_WARM_POOL", "true").lower() == "true"
+WARM_POOL_IDLE_SECONDS = int(os.getenv("SCRIPTS_STORE_WARM_POOL_IDLE_SECONDS", "600"))
+WARM_POOL_MAX_SERVERS = int(os.getenv("SCRIPTS_STORE_WARM_POOL_MAX_SERVERS", "20"))
+WARM_POOL_START_TIMEOUT = float(os.getenv("SCRIPTS_STORE_WARM_POOL_START_TIMEOUT", "60"))
+
+# Finished run logs are compressed into independently gzipped blocks of about
+# LOG_ARCHIVE_BLOCK_BYTES, indexed by byte offset and line number
+LOG_ARCHIVE_ENABLED = os.getenv("SCRIPTS_STORE_LOG_ARCHIVE", "true").lower() == "true"
+LOG_ARCHIVE_BLOCK_BYTES = int(os.getenv("SCRIPTS_STORE_LOG_ARCHIVE_BLOCK_BYTES", str(1024 ** 2)))
+
+# Run log retention per project: age in days and total compressed size (0 = keep),
+# with per-project overrides as "project=value,other=value"
+LOG_RETENTION_DAYS = float(os.getenv("SCRIPTS_STORE_LOG_RETENTION_DAYS", "30"))
+LOG_RETENTION_DAYS_BY_PROJECT = {
+    name.strip(): float(value)
+    for name, _, value in (
+        item.partition("=") for item in os.getenv("SCRIPTS_STORE_LOG_RETENTION_DAYS_BY_PROJECT", "").split(",")
+    )
+    if name.strip() and value.strip()
+}
+LOG_RETENTION_MAX_BYTES = int(os.getenv("SCRIPTS_STORE_LOG_RETENTION_MAX_BYTES", str(10 * 1024 ** 3)))
+LOG_RETENTION_MAX_BYTES_BY_PROJECT = {
+    name.strip(): int(value)
+    for name, _, value in (
+        item.partition("=") for item in os.getenv("SCRIPTS_STORE_LOG_RETENTION_MAX_BYTES_BY_PROJECT", "").split(",")
+    )
+    if name.strip() and value.strip()
+}
+LOG_RETENTION_INTERVAL_SECONDS = int(os.getenv("SCRIPTS_STORE_LOG_RETENTION_INTERVAL_SECONDS", "3600"))
+
+# Most bytes of log returned by one request to the run log endpoint
+LOG_RANGE_MAX_BYTES = int(os.getenv("SCRIPTS_STORE_LOG_RANGE_MAX_BYTES", str(1024 ** 2)))
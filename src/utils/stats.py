@@ -0,0 +1,9 @@
+# src/utils/stats.py
+from typing import Optional
+
+def percentile(sorted_values: list, percent: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list, None if it is empty"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(percent / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
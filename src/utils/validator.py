@@ -4,12 +4,16 @@ import toml
 import subprocess
 from loguru import logger
 from typing import Tuple
+from src.static.package_manager import PackageManager
+from src.utils.settings import SCRIPTS_STORE_PATH
 
 class ScriptValidator:
-    def __init__(self, project_name: str, script_name: str):
+    def __init__(self, project_name: str, script_name: str, script_path: str = None):
         self.project_name = project_name
         self.script_name = script_name
-        self.script_path = f"/opt/scripts-store/{project_name}/{script_name}"
+        # Defaults to the live version; deployments validate their own version directory
+        self.script_path = script_path or f"{SCRIPTS_STORE_PATH}/{project_name}/{script_name}"
+        self.package_manager = PackageManager(project_name, script_name, self.script_path)
         self.log = logger.bind(log_type="validate", script_name=script_name)
 
     def validate_structure(self) -> Tuple[bool, str]:
@@ -77,27 +81,34 @@ class ScriptValidator:
         except Exception as e:
             return False, f"pyproject.toml validation error: {str(e)}"
 
+    def install_dependencies(self) -> Tuple[bool, str]:
+        """
+        Install dependencies into the script's cached environment.
+        Packages with unchanged dependency files reuse an existing environment.
+        """
+        self.log.info("Setting up test environment")
+        reused = self.package_manager.virtualenv_exists()
+        env_ready, env_key = self.package_manager.setup_environment()
+        if not env_ready:
+            return False, "Failed to install dependencies"
+        if reused:
+            return True, f"Dependencies unchanged, reusing environment {env_key}"
+        return True, f"Dependencies installed in environment {env_key}"
+
     def run_tests(self) -> Tuple[bool, str]:
         """
         Run unit tests in the tests directory
         """
         try:
-            self.log.info("Setting up test environment")
-            
-            # Install dependencies including dev dependencies
-            install_result = subprocess.run(
-                ['poetry', 'install'],
-                cwd=self.script_path,
-                capture_output=True,
-                text=True
-            )
-            if install_result.returncode != 0:
-                return False, f"Failed to install dependencies: {install_result.stderr}"
+            if not self.package_manager.virtualenv_exists():
+                installed, install_msg = self.install_dependencies()
+                if not installed:
+                    return False, install_msg
 
             self.log.info("Running tests")
-            # Run pytest
+            # Run pytest with the environment's interpreter
             test_result = subprocess.run(
-                ['poetry', 'run', 'python', '-m', 'pytest', 'tests/', '-v'],
+                [self.package_manager.get_interpreter(), '-m', 'pytest', 'tests/', '-v'],
                 cwd=self.script_path,
                 capture_output=True,
                 text=True
@@ -110,23 +121,6 @@ class ScriptValidator:
         except Exception as e:
             return False, f"Test execution error: {str(e)}"
 
-    def validate_all(self) -> Tuple[bool, str]:
-        """
-        Run all validations
-        """
-        # Check structure
-        structure_valid, structure_msg = self.validate_structure()
-        if not structure_valid:
-            return False, structure_msg
-
-        # Check pyproject.toml
-        pyproject_valid, pyproject_msg = self.validate_pyproject()
-        if not pyproject_valid:
-            return False, pyproject_msg
-
-        # Run tests
-        tests_passed, test_msg = self.run_tests()
-        if not tests_passed:
-            return False, test_msg
-
-        return True, "All validations passed successfully"
\ No newline at end of file
+    def release(self):
+        """Return the test environment to the cache"""
+        self.package_manager.release_environment()
@@ -0,0 +1,158 @@
+# src/worker.py
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from src.database.db import init_db
+from src.static.executor import ScriptExecutor
+from src.static.prewarmer import prewarmer
+from src.static.run_manager import run_manager
+from src.static.run_queue import run_queue
+from src.static.log_archive import log_archive
+from src.static.run_recorder import run_recorder
+from src.static.warm_pool import warm_pool
+from src.utils import metrics
+from src.utils.logger_config import setup_logging
+from src.utils.settings import (
+    RUN_WORKERS, WORKER_LEASE_SECONDS, WORKER_POLL_SECONDS, PREWARM_RESCAN_SECONDS,
+    WORKER_METRICS_PORT
+)
+
+class Worker:
+    """
+    Executes runs leased from the shared run queue.
+
+    Any number of workers, on one or several machines, can point at the
+    same database. Each one claims runs up to its free slots, renews the
+    leases of the runs it is executing, and reports their outcome.
+    Workers on one machine may share the environment cache; its file locks
+    keep one worker from evicting an environment another is running in.
+    """
+    def __init__(self, worker_id: str = None, slots: int = RUN_WORKERS):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.slots = slots
+        self.pool = ThreadPoolExecutor(max_workers=slots, thread_name_prefix="worker-run")
+        self.active = set()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.log = logger.bind(log_type="execute")
+
+    def run(self):
+        """Claim and execute runs until stop() is called"""
+        self.log.info(f"Worker {self.worker_id} started with {self.slots} slots")
+        heartbeat_done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(heartbeat_done,), daemon=True)
+        heartbeat.start()
+        log_archive.start()
+
+        last_prewarm = None
+        while not self.stopping.is_set():
+            # Keep environments of scheduled scripts built on this worker, including new versions
+            if last_prewarm is None or time.monotonic() - last_prewarm >= PREWARM_RESCAN_SECONDS:
+                last_prewarm = time.monotonic()
+                try:
+                    prewarmer.prewarm_scheduled()
+                except Exception as e:
+                    self.log.error(f"Error queueing environment prewarm: {str(e)}")
+
+            claimed = []
+            with self.lock:
+                free = self.slots - len(self.active)
+            if free > 0:
+                try:
+                    claimed = run_queue.claim(self.worker_id, free, run_manager.quota)
+                except Exception as e:
+                    self.log.error(f"Error claiming runs: {str(e)}")
+            for run in claimed:
+                with self.lock:
+                    self.active.add(run["run_id"])
+                self.pool.submit(self._execute, run)
+            if not claimed:
+                self.stopping.wait(WORKER_POLL_SECONDS)
+
+        # Finish leased runs before exiting; heartbeats keep their leases alive meanwhile
+        prewarmer.shutdown()
+        self.pool.shutdown(wait=True)
+        warm_pool.shutdown()
+        heartbeat_done.set()
+        heartbeat.join()
+        self.log.info(f"Worker {self.worker_id} stopped")
+
+    def stop(self, *args):
+        """Stop claiming new runs"""
+        self.stopping.set()
+
+    def _execute(self, run: dict):
+        """Execute a leased run and report its outcome"""
+        # Built inside the try so a failing constructor still completes the lease
+        executor = None
+        try:
+            executor = ScriptExecutor(
+                run["script_name"],
+                run["project_name"],
+                run_id=run["run_id"],
+                trigger=run["trigger"],
+                scheduled_at=run["scheduled_at"]
+            )
+            result = executor.execute(run["params"])
+            run_queue.complete(run["run_id"], self.worker_id, result["status"], result=result)
+        except Exception as e:
+            run_queue.complete(
+                run["run_id"], self.worker_id, "failed",
+                result={"log_file": executor.log_path if executor is not None else None},
+                error=str(e)
+            )
+        finally:
+            if executor is not None:
+                executor.cleanup()
+            with self.lock:
+                self.active.discard(run["run_id"])
+
+    def _heartbeat(self, done: threading.Event):
+        """Renew the leases of active runs well before they expire"""
+        while not done.wait(WORKER_LEASE_SECONDS / 3):
+            with self.lock:
+                run_ids = list(self.active)
+            try:
+                held = run_queue.heartbeat(self.worker_id, run_ids)
+                if held < len(run_ids):
+                    self.log.warning(f"Worker {self.worker_id} holds {held} of {len(run_ids)} leases")
+            except Exception as e:
+                self.log.error(f"Error renewing leases: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Script Store worker")
+    parser.add_argument("--slots", type=int, default=RUN_WORKERS, help="Concurrent runs on this worker")
+    parser.add_argument("--worker-id", default=None, help="Worker identifier (default: host-pid-random)")
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT,
+                        help="Port serving Prometheus metrics at /metrics (0 = off)")
+    args = parser.parse_args()
+
+    setup_logging()
+    init_db()
+
+    # Runs execute here in queue mode, so their metrics are scraped from the worker
+    if args.metrics_port:
+        try:
+            metrics.serve(args.metrics_port)
+            logger.info(f"Serving metrics on port {args.metrics_port}")
+        except OSError as e:
+            logger.error(f"Could not serve metrics on port {args.metrics_port}: {str(e)}")
+
+    worker = Worker(worker_id=args.worker_id, slots=args.slots)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    try:
+        worker.run()
+    finally:
+        run_recorder.stop()
+        log_archive.stop()
+        metrics.mark_process_dead()
+
+if __name__ == "__main__":
+    main()
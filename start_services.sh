@@ -1,4 +1,12 @@
 #!/bin/bash
 
-# Start FastAPI application using poetry
-poetry run uvicorn src.main:app --host 0.0.0.0 --port 8000 --workers 1
\ No newline at end of file
+# Start FastAPI application using poetry.
+# Any number of API workers is safe: only the elected leader fires scheduled jobs.
+# With more than one worker use SCRIPTS_STORE_EXECUTION_MODE=queue so run status
+# is shared between them.
+# Metrics of all workers are aggregated through PROMETHEUS_MULTIPROC_DIR, which
+# must start empty.
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/scripts-store-metrics}"
+rm -rf "${PROMETHEUS_MULTIPROC_DIR}"
+mkdir -p "${PROMETHEUS_MULTIPROC_DIR}"
+poetry run uvicorn src.main:app --host 0.0.0.0 --port 8000 --workers "${SCRIPTS_STORE_API_WORKERS:-1}"
\ No newline at end of file
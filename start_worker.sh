@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# Start a worker that executes runs from the shared queue.
+# The API and all workers must use SCRIPTS_STORE_EXECUTION_MODE=queue and the same database.
+SCRIPTS_STORE_EXECUTION_MODE=queue poetry run python -m src.worker "$@"